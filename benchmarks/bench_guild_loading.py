@@ -0,0 +1,75 @@
+"""Leveling startup with many dormant guilds.
+
+Writes one shard per guild to a temporary directory, then compares loading
+every shard up front (the old ``load_levels``) with ``LazyShardedStore``,
+which only reads the guilds that are actually touched.
+
+    python -m benchmarks.bench_guild_loading [guilds] [members_per_guild] [active_guilds]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from utils.persistence import LazyShardedStore, ShardedJSONBackend, WriteBehind, atomic_write_json
+from utils.records import LevelRecord, RecordTable
+
+
+def new_guild_table(members):
+    return RecordTable(LevelRecord.from_dict, members)
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed_ms, peak / 2 ** 20
+
+
+async def run(directory, guild_ids, active):
+    persistence = WriteBehind(ShardedJSONBackend(directory), name='bench')
+
+    def eager():
+        levels = persistence.run_sync(persistence.backend.load, 'levels')
+        return RecordTable(new_guild_table, levels)
+
+    eager_levels, eager_ms, eager_mb = measure(eager)
+    del eager_levels
+
+    def lazy():
+        store = LazyShardedStore(persistence, 'levels', convert=new_guild_table, max_loaded=len(active))
+        for guild_id in active:
+            store[guild_id]
+        return store
+
+    store, lazy_ms, lazy_mb = measure(lazy)
+    await persistence.stop()
+    return eager_ms, eager_mb, lazy_ms, lazy_mb, store
+
+
+def main(guilds=2000, members=200, active_guilds=20):
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        guild_ids = [str(10 ** 17 + i) for i in range(guilds)]
+        for guild_id in guild_ids:
+            atomic_write_json(os.path.join(directory, f"{guild_id}.json"), {
+                str(10 ** 17 + m): {"xp": rng.randint(0, 10 ** 5), "level": rng.randint(0, 60),
+                                    "messages": rng.randint(0, 10 ** 4)}
+                for m in range(members)
+            }, indent=None)
+        active = rng.sample(guild_ids, active_guilds)
+        eager_ms, eager_mb, lazy_ms, lazy_mb, store = asyncio.run(run(directory, guild_ids, active))
+
+    print(f"guilds:        {guilds:,} x {members:,} members, {active_guilds:,} active")
+    print(f"load all:      {eager_ms:,.0f}ms, {eager_mb:,.1f}MB peak")
+    print(f"lazy:          {lazy_ms:,.1f}ms, {lazy_mb:,.2f}MB peak ({store.stats['loads']:,} shards read)")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:4]))
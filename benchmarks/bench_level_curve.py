@@ -0,0 +1,41 @@
+"""Per-message cost of XP -> level conversion at increasing levels.
+
+Compares the old level-by-level walk with ``LevelCurve`` lookups.
+
+    python -m benchmarks.bench_level_curve
+"""
+import timeit
+
+from utils.level_curve import LevelCurve, default_level_xp
+
+
+def walk_level_from_xp(xp):
+    """The original loop from Leveling.get_level_from_xp."""
+    level = 0
+    while xp >= default_level_xp(level):
+        xp -= default_level_xp(level)
+        level += 1
+    return level
+
+
+def walk_total_xp(level):
+    """The original rank computation."""
+    return sum(default_level_xp(i) for i in range(level))
+
+
+def main():
+    curve = LevelCurve()
+    print(f"{'level':>8} {'walk level':>12} {'curve level':>12} {'walk total':>12} {'curve total':>12}")
+    for level in (10, 100, 1000, 5000, 20000):
+        xp = curve.xp_for_level(level) + 1
+        number = 2000 if level <= 1000 else 50
+        walk = timeit.timeit(lambda: walk_level_from_xp(xp), number=number) / number
+        lookup = timeit.timeit(lambda: curve.level_from_xp(xp), number=20000) / 20000
+        walk_sum = timeit.timeit(lambda: walk_total_xp(level), number=number) / number
+        lookup_sum = timeit.timeit(lambda: curve.xp_for_level(level), number=20000) / 20000
+        print(f"{level:>8} {walk * 1e6:>10.2f}us {lookup * 1e6:>10.2f}us "
+              f"{walk_sum * 1e6:>10.2f}us {lookup_sum * 1e6:>10.2f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Buying tickets and drawing a ``!lottery`` winner.
+
+Compares the Fenwick tree against the linear scan over per-player ticket
+counts it replaces, times ``draw()`` itself (which should not grow with the
+number of players), and round-trips a full round through the persisted form.
+
+    python -m benchmarks.bench_lottery [players]
+"""
+import json
+import random
+import sys
+import time
+import timeit
+
+from utils.lottery import Lottery, replay, verify_draw, winning_ticket
+
+
+def linear_owner(entries, ticket):
+    """Walk the counts until the running total passes ``ticket``."""
+    for user_id, count in entries:
+        if ticket < count:
+            return user_id
+        ticket -= count
+    raise IndexError(ticket)
+
+
+def main(players=100_000):
+    rng = random.Random(1)
+    lottery = Lottery()
+    user_ids = [str(10 ** 17 + i) for i in range(players)]
+    purchases = [(rng.choice(user_ids), rng.randint(1, 50_000)) for _ in range(players * 2)]
+
+    def buy():
+        for user_id, count in purchases:
+            lottery.buy(user_id, count, count)
+
+    buy_s = timeit.timeit(buy, number=1)
+    entries = lottery.entries()
+    seeds = [rng.getrandbits(63) for _ in range(1000)]
+    tree_us = timeit.timeit(lambda: [lottery.owner(winning_ticket(s, lottery.total)) for s in seeds],
+                            number=1) / len(seeds) * 1e6
+    scan_us = timeit.timeit(lambda: [linear_owner(entries, winning_ticket(s, lottery.total)) for s in seeds[:50]],
+                            number=1) / 50 * 1e6
+    assert all(lottery.owner(winning_ticket(s, lottery.total)) == linear_owner(entries, winning_ticket(s, lottery.total))
+               for s in seeds[:50])
+
+    restored = timeit.timeit(lambda: Lottery.from_dict(lottery.to_dict()), number=1) * 1000
+    assert Lottery.from_dict(lottery.to_dict()).digest == lottery.digest
+
+    # Each draw starts the next round, so every timed draw gets its own copy of
+    # the round. The finished round's players are held on to while the draw is
+    # timed, and freeing them (once per round, like building them) is timed apart.
+    draw_us, release_ms = [], []
+    for _ in range(5):
+        copy = Lottery.from_dict(lottery.to_dict())
+        finished = (copy._players, copy._index, copy._tickets)
+        start = time.perf_counter()
+        copy.draw(seed=seeds[0])
+        draw_us.append((time.perf_counter() - start) * 1e6)
+        start = time.perf_counter()
+        del finished
+        release_ms.append((time.perf_counter() - start) * 1000)
+    draw = lottery.draw()
+    assert verify_draw(draw) and replay(draw, entries) == draw['winner']
+
+    print(f"players:       {draw['players']:,} ({draw['total']:,} tickets)")
+    print(f"buy:           {buy_s / len(purchases) * 1e6:.2f}us per purchase")
+    print(f"draw (tree):   {tree_us:.2f}us")
+    print(f"draw (scan):   {scan_us:.2f}us")
+    print(f"draw():        {min(draw_us):.1f}us ({len(json.dumps(draw))} byte history record)")
+    print(f"end of round:  {min(release_ms):.1f}ms freeing the finished round")
+    print(f"persist+load:  {restored:.1f}ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
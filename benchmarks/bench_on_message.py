@@ -0,0 +1,102 @@
+"""Overhead of ``Leveling.on_message`` per message that earns XP.
+
+Runs the real listener (cooldown, anti-farming filter, multipliers, XP
+award) against stand-in messages, with no multipliers configured and with
+channel, role and boost multipliers. Also times the compiled multiplier
+lookup alone against resolving the stored config on every message.
+
+Runs in a temporary directory, so the bot's data files aren't touched.
+
+    python -m benchmarks.bench_on_message [messages]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+from types import SimpleNamespace
+
+from cogs.leveling.leveling import Leveling
+from utils.xp_multipliers import XPMultipliers
+
+GUILD_ID = 1
+
+
+class Channel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+    async def send(self, *args, **kwargs):
+        pass
+
+
+def resolve_from_config(config: dict, channel, member, now: float) -> float:
+    """What each message would cost without compiling: string keys and a scan of the member's roles."""
+    multiplier = float(config.get('channels', {}).get(str(channel.id), 1.0))
+    roles = config.get('roles', {})
+    held = [float(roles[str(role.id)]) for role in member.roles if str(role.id) in roles]
+    if held:
+        multiplier *= max(held)
+    boost = config.get('boost')
+    if boost and now < boost['ends']:
+        multiplier *= boost['multiplier']
+    return multiplier
+
+
+def make_config(rng: random.Random) -> dict:
+    return {
+        'channels': {str(c): rng.choice([0.0, 0.5, 2.0]) for c in range(0, 200, 4)},
+        'roles': {str(r): rng.choice([1.25, 1.5, 2.0]) for r in range(1000, 1020)},
+        'boost': {'multiplier': 2.0, 'ends': time.time() + 3600},
+    }
+
+
+def main(count=50_000):
+    rng = random.Random(1)
+    os.chdir(tempfile.mkdtemp())
+    bot = SimpleNamespace(get_guild=lambda guild_id: None, get_channel=lambda channel_id: None, guilds=[])
+    guild = SimpleNamespace(id=GUILD_ID)
+    channels = [Channel(c) for c in range(200)]
+    members = [SimpleNamespace(id=10 ** 17 + i, bot=False, mention=f'<@{i}>',
+                               roles=[SimpleNamespace(id=rng.randrange(1000, 1100)) for _ in range(rng.randint(1, 8))])
+               for i in range(5000)]
+    messages = [SimpleNamespace(author=rng.choice(members), guild=guild, channel=rng.choice(channels),
+                                content=f"message {i} about the {rng.choice(['game', 'raid', 'match'])} tonight")
+                for i in range(count)]
+    config = make_config(rng)
+
+    async def run(configured: bool) -> float:
+        cog = Leveling(bot)
+        cog.xp_cooldown.configure('xp', 0)  # Every message is off cooldown
+        if configured:
+            cog.xp_multipliers[str(GUILD_ID)] = config
+            cog.compiled_multipliers[str(GUILD_ID)] = XPMultipliers(config)
+        start = time.perf_counter()
+        for message in messages:
+            await cog.on_message(message)
+        return (time.perf_counter() - start) / count * 1e6
+
+    plain_us = asyncio.run(run(False))
+    multiplied_us = asyncio.run(run(True))
+
+    compiled = XPMultipliers(config)
+    now = time.time()
+    sample = messages[:10_000]
+    compiled_us = timeit.timeit(lambda: [compiled.for_message(m.channel, m.author, now) for m in sample],
+                                number=5) / (5 * len(sample)) * 1e6
+    raw_us = timeit.timeit(lambda: [resolve_from_config(config, m.channel, m.author, now) for m in sample],
+                           number=5) / (5 * len(sample)) * 1e6
+    assert all(compiled.for_message(m.channel, m.author, now) == resolve_from_config(config, m.channel, m.author, now)
+               for m in sample)
+
+    print(f"messages:          {count:,} from {len(members):,} members")
+    print(f"on_message:        {plain_us:.2f}us (no multipliers)")
+    print(f"on_message:        {multiplied_us:.2f}us (channel, role and boost multipliers)")
+    print(f"lookup (compiled): {compiled_us:.3f}us")
+    print(f"lookup (config):   {raw_us:.3f}us")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
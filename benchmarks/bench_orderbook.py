@@ -0,0 +1,64 @@
+"""Matching throughput of the ``!market`` order book.
+
+Submits random limit orders around a drifting mid price to one ``OrderBook``,
+cancelling a share of the resting orders along the way, then round-trips the
+open orders through the persisted form.
+
+    python -m benchmarks.bench_orderbook [orders]
+"""
+import random
+import sys
+import time
+
+from utils.orderbook import BUY, SELL, Order, OrderBook
+
+
+def make_orders(count, seed=1):
+    rng = random.Random(seed)
+    mid = 300
+    orders = []
+    for order_id in range(1, count + 1):
+        mid = max(50, mid + rng.randint(-1, 1))
+        side = BUY if rng.random() < 0.5 else SELL
+        # Most orders rest near the mid; some cross the spread
+        offset = int(abs(rng.gauss(0, 15)))
+        price = mid - offset if side == BUY else mid + offset
+        if rng.random() < 0.2:
+            price = mid + 20 if side == BUY else mid - 20
+        orders.append(Order(order_id, str(rng.randrange(5000)), side, max(price, 1), rng.randint(1, 10)))
+    return orders
+
+
+def main(count=100_000, cancel_share=0.1):
+    orders = make_orders(count)
+    rng = random.Random(2)
+    book = OrderBook('doctor')
+
+    fills = 0
+    traded = 0
+    cancels = 0
+    start = time.perf_counter()
+    for order in orders:
+        for fill in book.submit(order):
+            fills += 1
+            traded += fill.qty
+        if book.orders and rng.random() < cancel_share:
+            book.cancel(rng.choice((order.order_id, order.order_id - rng.randrange(1, 1000))))
+            cancels += 1
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    restored = OrderBook.from_dict('doctor', book.to_dict())
+    round_trip = time.perf_counter() - start
+    assert restored.depth(5) == book.depth(5)
+
+    bid, ask = book.best_bid(), book.best_ask()
+    print(f"orders:        {count:,} ({cancels:,} cancel attempts)")
+    print(f"matching:      {count / elapsed:,.0f} orders/s ({elapsed * 1000:.0f}ms total)")
+    print(f"fills:         {fills:,} ({traded:,} items traded)")
+    print(f"open orders:   {len(book):,}, spread ${bid.price if bid else 0}-${ask.price if ask else 0}")
+    print(f"persist+load:  {round_trip * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
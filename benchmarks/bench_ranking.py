@@ -0,0 +1,44 @@
+"""Rank lookups and leaderboard pages for a 100k-member guild.
+
+Compares a full sort per command with ``RankIndex``.
+
+    python -m benchmarks.bench_ranking
+"""
+import random
+import timeit
+
+from utils.ranking import RankIndex
+
+
+def main(members=100_000):
+    rng = random.Random(1)
+    levels = {str(10 ** 17 + i): {"xp": rng.randint(0, 500_000)} for i in range(members)}
+    user_ids = list(levels)
+
+    build = timeit.timeit(lambda: RankIndex((u, d["xp"]) for u, d in levels.items()), number=1)
+    index = RankIndex((u, d["xp"]) for u, d in levels.items())
+
+    def full_sort_page():
+        return sorted(levels.items(), key=lambda x: x[1]["xp"], reverse=True)[5000:5010]
+
+    def update():
+        user_id = rng.choice(user_ids)
+        levels[user_id]["xp"] += 15
+        index.update(user_id, levels[user_id]["xp"])
+
+    n = 20_000
+    sort_ms = timeit.timeit(full_sort_page, number=5) / 5 * 1000
+    rank_us = timeit.timeit(lambda: index.rank(rng.choice(user_ids)), number=n) / n * 1e6
+    page_us = timeit.timeit(lambda: index.page(rng.randrange(members - 10), 10), number=n) / n * 1e6
+    update_us = timeit.timeit(update, number=n) / n * 1e6
+
+    print(f"members:            {members:,}")
+    print(f"index build (once): {build * 1000:.1f}ms")
+    print(f"full sort per page: {sort_ms:.1f}ms")
+    print(f"index rank:         {rank_us:.2f}us")
+    print(f"index page of 10:   {page_us:.2f}us")
+    print(f"index update:       {update_us:.2f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Memory used by bank, stats and level data for synthetic users.
+
+Compares the plain dict-of-dicts layout with ``RecordTable`` of slotted
+records, loaded the way the cogs load them: bank and stats tables are built
+over the parsed dicts and then converted by ``convert_all`` on a worker
+thread (``Economy.cog_load``), and a guild's level table is converted as it
+is built (``Leveling.new_guild_table``). Also reports the bank and stats
+tables straight after loading, before ``convert_all`` has run. Defaults to
+1M users; pass a smaller count as the first argument for a quick run.
+
+    python -m benchmarks.bench_record_memory [users]
+"""
+import asyncio
+import gc
+import random
+import sys
+import tracemalloc
+
+from cogs.leveling.leveling import Leveling
+from utils.records import BankRecord, RecordTable, StatsRecord
+
+JOBS = ('fireman', 'police', 'doctor', 'nurse', 'teacher', 'chef')
+
+
+def synthetic_rows(users, seed=1):
+    rng = random.Random(seed)
+    for i in range(users):
+        user_id = str(10 ** 17 + i)
+        bank = {"wallet": rng.randint(0, 10 ** 6), "bank": rng.randint(0, 10 ** 6)}
+        stats = {"work_count": rng.randint(0, 500), "gamble_count": rng.randint(0, 500),
+                 "gamble_wins": rng.randint(0, 250)}
+        for job in JOBS:
+            stats[f"{job}_count"] = rng.randint(0, 100)
+        level = {"xp": rng.randint(0, 10 ** 5), "level": rng.randint(0, 60), "messages": rng.randint(0, 10 ** 4)}
+        yield user_id, bank, stats, level
+
+
+def parsed_stores(users):
+    """The dicts ``json.load`` hands the loaders."""
+    bank, stats, levels = {}, {}, {}
+    for user_id, b, s, lv in synthetic_rows(users):
+        bank[user_id], stats[user_id], levels[user_id] = b, s, lv
+    return bank, stats, levels
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    gc.collect()
+    return size
+
+
+async def run_in_thread(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+def main(users=1_000_000):
+    def build_loaded():
+        bank, stats, levels = parsed_stores(users)
+        return (RecordTable(BankRecord.from_dict, bank), RecordTable(StatsRecord.from_dict, stats),
+                Leveling.new_guild_table(levels))
+
+    def build_converted():
+        bank, stats, levels = build_loaded()
+
+        async def convert():
+            for table in (bank, stats):
+                await table.convert_all(run_in_thread)
+
+        asyncio.run(convert())
+        return bank, stats, levels
+
+    dict_bytes = measure(lambda: parsed_stores(users))
+    loaded_bytes = measure(build_loaded)
+    record_bytes = measure(build_converted)
+    print(f"users:             {users:,}")
+    print(f"dict layout:       {dict_bytes / 2 ** 20:8.1f} MiB ({dict_bytes / users:6.0f} B/user)")
+    print(f"records (loading): {loaded_bytes / 2 ** 20:8.1f} MiB ({loaded_bytes / users:6.0f} B/user)"
+          f"  bank and stats not yet converted")
+    print(f"records (steady):  {record_bytes / 2 ** 20:8.1f} MiB ({record_bytes / users:6.0f} B/user)")
+    print(f"saved:             {(1 - record_bytes / dict_bytes) * 100:.0f}%")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,63 @@
+"""One tick of the simulated stock market at scale.
+
+Lists 1,000 symbols, spreads positions over 100k holders and times the
+vectorized tick (random walk, 1m/1h candles and revaluing every portfolio),
+the batch leaderboard sort and a single ``!portfolio`` lookup.
+
+    python -m benchmarks.bench_stocks [symbols] [holders]
+"""
+import sys
+import time
+import timeit
+
+import numpy as np
+
+from utils.stocks import Exchange
+
+
+def make_exchange(symbols, holders, positions_per_holder=5, seed=1):
+    rng = np.random.default_rng(seed)
+    listings = {
+        f"S{i:04d}": {'price': float(p), 'drift': float(d), 'volatility': float(v)}
+        for i, (p, d, v) in enumerate(zip(rng.uniform(5, 500, symbols), rng.normal(0, 0.001, symbols),
+                                          rng.uniform(0.005, 0.05, symbols)))
+    }
+    exchange = Exchange(listings, now=time.time())
+    names = list(listings)
+    portfolios = {}
+    for holder in range(holders):
+        picks = rng.choice(symbols, positions_per_holder, replace=False)
+        portfolios[str(10 ** 17 + holder)] = {names[s]: int(q) for s, q in zip(picks, rng.integers(1, 1000, len(picks)))}
+    exchange.load_portfolios(portfolios)
+    return exchange, rng
+
+
+def main(symbols=1000, holders=100_000):
+    start = time.perf_counter()
+    exchange, rng = make_exchange(symbols, holders)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    now = [time.time()]
+
+    def tick():
+        now[0] += 15
+        exchange.tick(now[0], 15, rng)
+
+    n = 200
+    tick_ms = timeit.timeit(tick, number=n) / n * 1000
+    rank_ms = timeit.timeit(lambda: (exchange.revalue(), exchange.ranking()), number=20) / 20 * 1000
+    user_id = exchange.holdings.holders[holders // 2]
+    portfolio_us = timeit.timeit(lambda: exchange.portfolio(user_id), number=1000) / 1000 * 1e6
+
+    expected = sum(value for _, _, value in exchange.portfolio(user_id))
+    assert abs(exchange.value(user_id) - expected) < 1e-6 * max(expected, 1)
+
+    print(f"symbols:       {symbols:,}, holders {holders:,} ({exchange.holdings.size:,} positions)")
+    print(f"load:          {load_ms:.0f}ms")
+    print(f"tick:          {tick_ms:.2f}ms (walk + candles + revalue)")
+    print(f"leaderboard:   {rank_ms:.2f}ms (revalue + sort)")
+    print(f"portfolio:     {portfolio_us:.1f}us")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,58 @@
+"""Simulating a pet tournament bracket.
+
+Plays the same 1,024-pet bracket as one battle at a time with
+``rules.pet_power`` and as vectorized rounds with ``simulate_bracket``.
+
+    python -m benchmarks.bench_tournament [pets]
+"""
+import random
+import sys
+import timeit
+
+import numpy as np
+
+from utils import economy_rules as rules
+from utils.tournament import settlement, simulate_bracket
+
+
+def per_match(entrants, strengths, rng):
+    """One ``pet_power`` roll pair per match, as ``!challenge`` does."""
+    order = list(range(len(entrants)))
+    rng.shuffle(order)
+    while len(order) > 1:
+        next_round = []
+        for i in range(0, len(order) - 1, 2):
+            left, right = order[i], order[i + 1]
+            left_power = rules.pet_power(strengths[left], rng)
+            right_power = rules.pet_power(strengths[right], rng)
+            next_round.append(left if left_power > right_power else right)
+        if len(order) % 2:
+            next_round.append(order[-1])
+        order = next_round
+    return entrants[order[0]]
+
+
+def main(pets=1024):
+    rng = random.Random(1)
+    entrants = [str(10 ** 17 + i) for i in range(pets)]
+    strengths = [rng.randint(50, 100) for _ in range(pets)]
+    bets = {str(i): (rng.choice(entrants), rng.randint(100, 1000)) for i in range(pets)}
+    np_rng = np.random.default_rng(1)
+
+    n = 200
+    scalar_ms = timeit.timeit(lambda: per_match(entrants, strengths, rng), number=n) / n * 1000
+    vector_ms = timeit.timeit(lambda: simulate_bracket(entrants, strengths, np_rng), number=n) / n * 1000
+    bracket = simulate_bracket(entrants, strengths, np_rng)
+    settle_ms = timeit.timeit(lambda: settlement(bracket, 500, bets), number=n) / n * 1000
+    lines_ms = timeit.timeit(lambda: bracket.match_lines({}), number=20) / 20 * 1000
+    assert sum(settlement(bracket, 500, bets).values()) == 0
+
+    print(f"pets:                {pets:,} ({bracket.matches:,} matches, {len(bracket.rounds)} rounds)")
+    print(f"one match at a time: {scalar_ms:.2f}ms")
+    print(f"vectorized rounds:   {vector_ms:.2f}ms")
+    print(f"settlement:          {settle_ms:.2f}ms ({len(bets):,} bets)")
+    print(f"bracket text:        {lines_ms:.2f}ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1024)
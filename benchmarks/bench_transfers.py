@@ -0,0 +1,122 @@
+"""Throughput of concurrent wallet transfers.
+
+Runs the same random transfers three ways and checks that no money is
+created or destroyed: as unchecked read-modify-write coroutines, through
+``AccountTransactions.transfer`` (how two-party commands pay), and as
+``with transactions.begin()`` blocks that await between reading a balance
+and staging the transfer. Each command awaits once, like a command replying
+before it pays. Each is timed on its own, and again with the journal write
+every balance change pays in the Economy cog (``save_bank``): once per
+command on the unchecked path, from ``on_commit`` on the others.
+
+    python -m benchmarks.bench_transfers
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from utils.journal import BalanceJournal
+from utils.records import BankRecord, RecordTable
+from utils.transactions import AccountTransactions, TransactionError
+
+
+def make_bank(accounts):
+    return RecordTable(BankRecord.from_dict, {str(i): {"wallet": 1000, "bank": 0} for i in range(accounts)})
+
+
+def make_transfers(count, accounts, seed=1):
+    rng = random.Random(seed)
+    return [(str(rng.randrange(accounts)), str(rng.randrange(accounts)), rng.randint(1, 500))
+            for _ in range(count)]
+
+
+def make_save(bank, directory):
+    """``Economy.save_bank``: one journal append per call, however many accounts."""
+    journal = BalanceJournal(os.path.join(directory, f'bank-{time.perf_counter_ns()}.journal'))
+    journal.open()
+
+    def save(*user_ids):
+        journal.append_many((user_id, bank[user_id]["wallet"], bank[user_id]["bank"]) for user_id in user_ids)
+
+    return save
+
+
+async def run_unchecked(bank, transfers, concurrency, save=None):
+    async def transfer(source, target, amount):
+        if bank[source]["wallet"] >= amount:
+            await asyncio.sleep(0)  # A command awaiting between check and write
+            bank[source]["wallet"] -= amount
+            bank[target]["wallet"] += amount
+            if save is not None:
+                save(source, target)
+
+    for i in range(0, len(transfers), concurrency):
+        await asyncio.gather(*(transfer(*t) for t in transfers[i:i + concurrency]))
+
+
+async def run_transfer(bank, transfers, concurrency, save=None):
+    transactions = AccountTransactions(bank, on_commit=save or (lambda *ids: None))
+
+    async def transfer(source, target, amount):
+        if bank[source]["wallet"] >= amount:
+            await asyncio.sleep(0)  # A command awaiting before it pays
+            try:
+                transactions.transfer(source, target, amount)
+            except TransactionError:
+                pass
+
+    for i in range(0, len(transfers), concurrency):
+        await asyncio.gather(*(transfer(*t) for t in transfers[i:i + concurrency]))
+    return transactions.commits
+
+
+async def run_blocks(bank, transfers, concurrency, save=None):
+    transactions = AccountTransactions(bank, on_commit=save or (lambda *ids: None))
+
+    async def transfer(source, target, amount):
+        try:
+            with transactions.begin() as txn:
+                if txn.balance(source) >= amount:
+                    await asyncio.sleep(0)  # A command awaiting inside the transaction
+                    txn.transfer(source, target, amount)
+        except TransactionError:
+            pass
+
+    for i in range(0, len(transfers), concurrency):
+        await asyncio.gather(*(transfer(*t) for t in transfers[i:i + concurrency]))
+    return transactions.commits
+
+
+def timed(run, bank, transfers, concurrency, save=None):
+    start = time.perf_counter()
+    result = asyncio.run(run(bank, transfers, concurrency, save))
+    elapsed = time.perf_counter() - start
+    total = sum(bank[key]["wallet"] for key in bank)
+    negative = sum(1 for key in bank if bank[key]["wallet"] < 0)
+    return len(transfers) / elapsed, total, negative, result
+
+
+def main(count=100_000, accounts=10_000, concurrency=500):
+    transfers = make_transfers(count, accounts)
+    expected = accounts * 1000
+    directory = tempfile.mkdtemp()
+    print(f"transfers: {count:,} across {accounts:,} accounts, {concurrency} concurrent")
+    for label, run, persisted in (("unchecked", run_unchecked, False),
+                                  ("transfer()", run_transfer, False),
+                                  ("begin() blocks", run_blocks, False),
+                                  ("unchecked + save_bank", run_unchecked, True),
+                                  ("transfer() + save_bank", run_transfer, True),
+                                  ("begin() blocks + save_bank", run_blocks, True)):
+        bank = make_bank(accounts)
+        save = make_save(bank, directory) if persisted else None
+        rate, total, negative, commits = timed(run, bank, transfers, concurrency, save)
+        line = f"{label + ':':<28}{rate:>10,.0f}/s  money {total - expected:+,}  negative wallets {negative}"
+        if commits is not None:
+            line += f"  commits {commits:,}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Voice XP accounting with thousands of members in voice.
+
+Replays random join/move/mute/leave transitions through ``VoiceSessions``
+and times the periodic sweep that credits everyone still connected.
+
+    python -m benchmarks.bench_voice_xp [members] [events]
+"""
+import random
+import sys
+import time
+
+from utils.voice_xp import VoiceSessions
+
+
+def main(members=5000, events=200_000):
+    rng = random.Random(1)
+    sessions = VoiceSessions(seconds_per_point=12)
+    keys = [('1', str(10 ** 17 + i)) for i in range(members)]
+    now = 0.0
+    credited = 0
+
+    start = time.perf_counter()
+    for _ in range(events):
+        now += rng.expovariate(20)
+        key = rng.choice(keys)
+        if rng.random() < 0.7:
+            sessions.open(key, rng.randrange(20), now)  # Join, move or unmute
+        else:
+            credit = sessions.close(key, now)  # Leave, mute or AFK
+            if credit:
+                credited += credit[0]
+    events_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    swept = sessions.sweep(now + 300)
+    sweep_ms = (time.perf_counter() - start) * 1000
+
+    print(f"members:       {members:,} ({len(sessions):,} in voice at the end)")
+    print(f"transitions:   {events / events_s:,.0f}/s ({events_s / events * 1e6:.2f}us each)")
+    print(f"sweep:         {sweep_ms:.2f}ms for {len(swept):,} sessions")
+    print(f"XP credited:   {credited + sum(points for _, (points, _, _) in swept):,}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,49 @@
+"""``!baltop`` and ``!balance`` rank lookups over 1M accounts.
+
+Compares sorting every account per command with the incremental wealth
+``RankIndex`` the Economy cog keeps.
+
+    python -m benchmarks.bench_wealth_index [accounts]
+"""
+import random
+import sys
+import timeit
+
+from utils.ranking import RankIndex
+
+
+def main(accounts=1_000_000):
+    rng = random.Random(1)
+    bank = {str(10 ** 17 + i): {"wallet": rng.randint(0, 10 ** 6), "bank": rng.randint(0, 10 ** 7)}
+            for i in range(accounts)}
+    user_ids = list(bank)
+
+    build = timeit.timeit(
+        lambda: RankIndex((u, a["wallet"] + a["bank"]) for u, a in bank.items()), number=1
+    )
+    index = RankIndex((u, a["wallet"] + a["bank"]) for u, a in bank.items())
+
+    def sort_page():
+        return sorted(bank.items(), key=lambda x: x[1]["wallet"] + x[1]["bank"], reverse=True)[:10]
+
+    def mutate():
+        user_id = rng.choice(user_ids)
+        bank[user_id]["wallet"] += rng.randint(-100, 100)
+        index.update(user_id, bank[user_id]["wallet"] + bank[user_id]["bank"])
+
+    n = 20_000
+    sort_s = timeit.timeit(sort_page, number=1)
+    rank_us = timeit.timeit(lambda: index.rank(rng.choice(user_ids)), number=n) / n * 1e6
+    page_us = timeit.timeit(lambda: index.page(rng.randrange(accounts - 10), 10), number=n) / n * 1e6
+    update_us = timeit.timeit(mutate, number=n) / n * 1e6
+
+    print(f"accounts:           {accounts:,}")
+    print(f"index build (once): {build:.2f}s")
+    print(f"full sort per page: {sort_s * 1000:.0f}ms")
+    print(f"index rank:         {rank_us:.2f}us")
+    print(f"index page of 10:   {page_us:.2f}us")
+    print(f"balance mutation:   {update_us:.2f}us")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,227 @@
+"""Offline economy simulator for balancing work/gamble/rob/bankrob.
+
+Synthetic players issue commands in batches. Each batch is resolved as a
+vectorized Monte Carlo step over NumPy columns, using the formulas and odds
+in ``utils.economy_rules`` (the same ones the Economy cog runs). Heists are
+rare enough to go through ``rules.heist_outcome`` one at a time.
+
+Every step writes a CSV row with money supply, Gini coefficient and command
+throughput. With ``--storage json`` or ``--storage sqlite`` the touched
+accounts are also flushed through ``WriteBehind`` after each step, so the
+``flush_ms`` column compares storage backends under the same load.
+
+    python -m benchmarks.economy_sim --players 100000 --steps 50 --out sim.csv
+    python -m benchmarks.economy_sim --storage sqlite
+
+Commands within one step see balances from the start of the step, and
+wallets are clamped at zero afterwards; that approximation is what lets a
+step run as a handful of array operations.
+"""
+import argparse
+import asyncio
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils import economy_rules as rules
+from utils import ledger
+from utils.persistence import JSONFileBackend, WriteBehind
+from utils.records import BankRecord, RecordTable
+from utils.sqlite_backend import SQLiteBackend
+
+COMMAND_MIX = {'work': 0.45, 'gamble': 0.3, 'rob': 0.15, 'deposit': 0.1}
+JOB_NAMES = list(rules.JOBS)
+
+
+def gini(wealth: np.ndarray) -> float:
+    total = wealth.sum()
+    if total <= 0:
+        return 0.0
+    ordered = np.sort(wealth).astype(np.float64)
+    n = len(ordered)
+    ranks = np.arange(1, n + 1)
+    return float((2 * (ranks * ordered).sum()) / (n * ordered.sum()) - (n + 1) / n)
+
+
+class EconomySimulation:
+    """Column-oriented state for ``players`` synthetic accounts."""
+
+    def __init__(self, players: int, seed: int = 1):
+        self.players = players
+        self.rng = np.random.default_rng(seed)
+        self.scalar_rng = random.Random(seed)
+        self.wallet = np.zeros(players, dtype=np.int64)
+        self.bank = np.zeros(players, dtype=np.int64)
+        self.work_count = np.zeros(players, dtype=np.int64)
+        self.job_count = np.zeros((players, len(JOB_NAMES)), dtype=np.int64)
+        self.gamble_count = np.zeros(players, dtype=np.int64)
+        self.heists = 0
+
+        # Win chance is capped, so a short table covers every level
+        levels = 1
+        while rules.gamble_win_chance(levels + 1) > rules.gamble_win_chance(levels):
+            levels += 1
+        self.win_chance = np.array([0] + [rules.gamble_win_chance(level) for level in range(1, levels + 1)]) / 100
+
+    def money_supply(self) -> int:
+        return int(self.wallet.sum() + self.bank.sum())
+
+    def step(self, commands: int):
+        """Resolve one batch of commands; returns the indices of touched players."""
+        rng = self.rng
+        actors = rng.integers(0, self.players, commands)
+        kinds = rng.choice(len(COMMAND_MIX), size=commands, p=list(COMMAND_MIX.values()))
+        wallet_delta = np.zeros(self.players, dtype=np.int64)
+        bank_delta = np.zeros(self.players, dtype=np.int64)
+        touched = [actors]
+
+        # work: half the players pick a job, the rest do generic work
+        workers = actors[kinds == 0]
+        jobs = rng.integers(-1, len(JOB_NAMES), len(workers))
+        pay = rng.integers(rules.GENERIC_WORK_PAY[0], rules.GENERIC_WORK_PAY[1] + 1, len(workers))
+        for job_index, job in enumerate(JOB_NAMES):
+            mask = jobs == job_index
+            who = workers[mask]
+            low, high = rules.salary_range(job, rules.job_level(self.job_count[who, job_index]))
+            pay[mask] = rng.integers(low, high + 1)
+            np.add.at(self.job_count, (who, job_index), 1)
+        pay = np.where(self.work_count[workers] >= rules.ADVANCE_WORK_COUNT, pay * 2, pay)
+        np.add.at(wallet_delta, workers, pay)
+        np.add.at(self.work_count, workers, 1)
+
+        # gamble: a random slice of the wallet, all-in a fifth of the time
+        gamblers = actors[kinds == 1]
+        fraction = np.where(rng.random(len(gamblers)) < 0.2, 1.0, rng.uniform(0.05, 0.5, len(gamblers)))
+        bets = (self.wallet[gamblers] * fraction).astype(np.int64)
+        levels = np.minimum(rules.gamble_level(self.gamble_count[gamblers]), len(self.win_chance) - 1)
+        wins = rng.random(len(gamblers)) < self.win_chance[levels]
+        np.add.at(wallet_delta, gamblers, np.where(wins, bets, -bets))
+        np.add.at(self.gamble_count, gamblers, 1)
+
+        # rob: a random target with enough in their wallet
+        thieves = actors[kinds == 2]
+        targets = rng.integers(0, self.players, len(thieves))
+        valid = (targets != thieves) & (self.wallet[targets] >= rules.ROB_MIN_TARGET_WALLET)
+        thieves, targets = thieves[valid], targets[valid]
+        success = rng.random(len(thieves)) < rules.ROB_SUCCESS_CHANCE
+        max_stolen = np.minimum(self.wallet[targets], rules.ROB_MAX_STOLEN)
+        stolen = np.where(success, rng.integers(1, max_stolen + 1), 0)
+        fines = np.where(success, 0, np.minimum(rng.integers(rules.ROB_FINE[0], rules.ROB_FINE[1] + 1, len(thieves)),
+                                                 self.wallet[thieves]))
+        np.add.at(wallet_delta, thieves, stolen - fines)
+        np.add.at(wallet_delta, targets, -stolen)
+        touched.append(targets)
+
+        # deposit: move part of the wallet into the bank
+        depositors = actors[kinds == 3]
+        amounts = (self.wallet[depositors] * rng.uniform(0.2, 1.0, len(depositors))).astype(np.int64)
+        np.add.at(wallet_delta, depositors, -amounts)
+        np.add.at(bank_delta, depositors, amounts)
+
+        self.wallet = np.clip(self.wallet + wallet_delta, 0, ledger.MAX_BALANCE)
+        self.bank = np.clip(self.bank + bank_delta, 0, ledger.MAX_BALANCE)
+
+        touched.extend(self.heist_round(max(1, commands // 10_000)))
+        return np.unique(np.concatenate(touched))
+
+    def heist_round(self, attempts: int):
+        """Run ``attempts`` heists through the scalar heist rules."""
+        touched = []
+        can_join = np.flatnonzero(self.wallet >= rules.HEIST_JOIN_COST)
+        targets = np.flatnonzero(self.bank >= rules.HEIST_MIN_TARGET_BANK)
+        if len(can_join) < rules.HEIST_CREW_SIZE or not len(targets):
+            return touched
+        for _ in range(attempts):
+            target = int(self.rng.choice(targets))
+            crew = self.rng.choice(can_join, rules.HEIST_CREW_SIZE, replace=False)
+            crew = crew[(crew != target) & (self.wallet[crew] >= rules.HEIST_JOIN_COST)]
+            if len(crew) < rules.HEIST_CREW_SIZE:
+                continue
+            success, total_loot, share = rules.heist_outcome(int(self.bank[target]), len(crew), self.scalar_rng)
+            self.wallet[crew] += share - rules.HEIST_JOIN_COST
+            self.bank[target] -= total_loot
+            self.heists += 1
+            touched.append(np.append(crew, target))
+        return touched
+
+
+def make_storage(kind: str, directory: str):
+    path = os.path.join(directory, 'bank')
+    if kind == 'json':
+        return JSONFileBackend({'bank': path + '.json'})
+    return SQLiteBackend(path + '.db', ['bank'])
+
+
+async def run(args, out):
+    sim = EconomySimulation(args.players, args.seed)
+    writer = csv.writer(out)
+    writer.writerow(['step', 'commands', 'money_supply', 'gini', 'commands_per_sec', 'flush_ms'])
+
+    storage = None
+    with tempfile.TemporaryDirectory() as directory:
+        if args.storage != 'none':
+            storage = WriteBehind(make_storage(args.storage, directory), name='sim')
+            accounts = storage.load('bank', wrap=lambda data: RecordTable(BankRecord.from_dict, data))
+
+        total_commands = 0
+        total_time = 0.0
+        flush_times = []
+        for step in range(1, args.steps + 1):
+            start = time.perf_counter()
+            touched = sim.step(args.commands)
+            elapsed = time.perf_counter() - start
+            total_commands += args.commands
+            total_time += elapsed
+
+            flush_ms = 0.0
+            if storage is not None:
+                ids = touched.tolist()
+                wallets, banks = sim.wallet[touched].tolist(), sim.bank[touched].tolist()
+                for index, wallet, bank in zip(ids, wallets, banks):
+                    accounts[str(index)] = {"wallet": wallet, "bank": bank}
+                storage.mark_dirty('bank', *map(str, ids))
+                flush_start = time.perf_counter()
+                await storage.flush()
+                flush_ms = (time.perf_counter() - flush_start) * 1000
+                flush_times.append(flush_ms)
+
+            wealth = sim.wallet + sim.bank
+            writer.writerow([step, total_commands, sim.money_supply(), f"{gini(wealth):.4f}",
+                             f"{args.commands / elapsed:.0f}", f"{flush_ms:.1f}"])
+
+        if storage is not None:
+            await storage.stop()
+
+    summary = (f"{total_commands:,} commands, {sim.heists:,} heists, "
+               f"{total_commands / total_time:,.0f} commands/s, "
+               f"money supply ${sim.money_supply():,}, gini {gini(sim.wallet + sim.bank):.3f}")
+    if flush_times:
+        summary += (f", {args.storage} flush avg {sum(flush_times) / len(flush_times):.1f}ms"
+                    f" / max {max(flush_times):.1f}ms")
+    print(summary, file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=100_000)
+    parser.add_argument('--steps', type=int, default=50)
+    parser.add_argument('--commands', type=int, default=100_000, help='commands per step')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--storage', choices=['none', 'json', 'sqlite'], default='none')
+    parser.add_argument('--out', help='CSV output file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    if args.out:
+        with open(args.out, 'w', newline='') as out:
+            asyncio.run(run(args, out))
+    else:
+        asyncio.run(run(args, sys.stdout))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,31 @@
 import discord
 from discord.ext import commands
-import json
+import numpy as np
+import logging
 import random
 import asyncio
 import os
-from datetime import datetime, timedelta
+import time
+from typing import Optional, Union
+from utils import economy_rules as rules
+from utils import ledger
+from utils.cooldowns import get_cooldown_store
+from utils.interest import apply_interest, compute_interest
+from utils.journal import BalanceJournal
+from utils.lottery import Lottery, verify_draw
+from utils.persistence import JSONFileBackend, WriteBehind
+from utils.orderbook import BUY, SELL, Order, OrderBook
+from utils.ranking import RankIndex
+from utils.reactions import get_reaction_dispatcher
+from utils.records import BankRecord, HeistRecord, RecordTable, StatsRecord
+from utils.sqlite_backend import SQLiteBackend
+from utils.stocks import Exchange, merge_listings
+from utils.timers import get_timer_heap
+from utils.targets import ActiveSince, resolve_targets
+from utils.tournament import TournamentSignup, settlement, simulate_bracket
+from utils.transactions import AccountTransactions, TransactionError
+
+logger = logging.getLogger(__name__)
 
 class Economy(commands.Cog):
     """A cog for economy-related commands"""
@@ -15,96 +36,315 @@ class Economy(commands.Cog):
         self.stats_file = 'stats.json'
         self.items_file = 'items.json'
         self.pets_file = 'pets.json'
+        self.market_file = 'market.json'
+        self.heists_file = 'heists.json'
+        self.heist_cooldowns_file = 'heist_cooldowns.json'
+        self.lottery_file = 'lottery.json'
+        self.stocks_file = 'stocks.json'
+        self.portfolios_file = 'portfolios.json'
+        self.journal_file = 'bank.journal'
         
         # Real life jobs with base ranges
-        self.jobs = {
-            'fireman': {'base_salary': (200, 500)},
-            'police': {'base_salary': (200, 500)},
-            'doctor': {'base_salary': (200, 500)},
-            'nurse': {'base_salary': (200, 500)},
-            'teacher': {'base_salary': (200, 500)},
-            'chef': {'base_salary': (200, 500)}
-        }
+        self.jobs = rules.JOBS
         
-        # Load data files
+        # Mutations are flushed in the background instead of on every command
+        self.persistence = WriteBehind(
+            self.create_storage_backend(),
+            interval=float(os.getenv('ECONOMY_FLUSH_INTERVAL', 5)),
+            max_dirty=int(os.getenv('ECONOMY_FLUSH_THRESHOLD', 200)),
+            name='economy'
+        )
+
+        # Balance changes go to an append-only journal; the bank snapshot is
+        # only rewritten when the journal is compacted
+        self.journal = BalanceJournal(
+            self.journal_file,
+            compact_every=int(os.getenv('ECONOMY_JOURNAL_COMPACT_EVERY', 1000))
+        )
+        self.persistence.set_flush_hooks('bank', before=self.journal.rotate, after=self.journal.discard_rotated)
+
+        # Load data files. Records are upgraded lazily on first access, so
+        # startup does no per-user work beyond reading the stores.
+        load_start = time.perf_counter()
         self.bank = self.load_bank()
+        self.journal.replay(self.bank)
+        self.journal.open()
         self.stats = self.load_stats()
         self.items = self.load_items()
         self.pets = self.load_pets()
-        self.cooldowns = {}
-        
-        # Initialize default stats for all users
-        for user_id in self.stats:
-            if 'gamble_count' not in self.stats[user_id]:
-                self.stats[user_id]['gamble_count'] = 0
-            if 'work_count' not in self.stats[user_id]:
-                self.stats[user_id]['work_count'] = 0
-            if 'gamble_wins' not in self.stats[user_id]:
-                self.stats[user_id]['gamble_wins'] = 0
-            for job in self.jobs:
-                if f'{job}_count' not in self.stats[user_id]:
-                    self.stats[user_id][f'{job}_count'] = 0
-        self.save_stats()
-        
+        self.market_books = self.load_market()
+        # Order ids double as time priority, so they keep increasing across restarts
+        self.next_order_id = max((book.last_id for book in self.market_books.values()), default=0) + 1
+        # Accounts ranked by wallet + bank: sorted on the writer thread in cog_load,
+        # then kept current by save_bank. Batches touching most accounts are
+        # re-sorted there too, with the balances saved meanwhile applied on top.
+        self.wealth_index = None
+        self.wealth_rebuild = None  # The task re-sorting it, if one is running
+        self.wealth_changed = None  # Accounts saved while it runs
+        self.wealth_stale = False  # Everything changed again while it ran
+        self.wealth_resort_limit = 10_000  # Smaller indexes are simply re-sorted in place
+        # Pet tournaments: open signups and the last bracket played, per guild
+        self.tournaments = {}
+        self.brackets = {}
+        self.lotteries = self.load_lotteries()
+        # Stock exchange: prices live in NumPy arrays, holdings are persisted
+        # per user as {symbol: shares} and indexed column-wise for valuation
+        self.stock_prices = self.persistence.load('stocks')
+        self.portfolios = self.persistence.load('portfolios')
+        self.exchange = Exchange(merge_listings(rules.STOCKS, self.stock_prices), now=time.time())
+        self.exchange.load_portfolios(self.portfolios)
+        self.persistence.set_flush_hooks('stocks', before=self.snapshot_stock_prices)
+        # Balance changes are checked against the ledger limits and persisted with one write per command
+        self.transactions = AccountTransactions(self.bank, on_commit=self.save_bank)
+        self.load_time_ms = (time.perf_counter() - load_start) * 1000
+        print(f"  Economy data loaded in {self.load_time_ms:.1f}ms")
+
+        # Hourly bank interest and wealth tax
+        self.interest_interval = float(os.getenv('ECONOMY_INTEREST_INTERVAL', 3600))
+        self.interest_rate = float(os.getenv('ECONOMY_INTEREST_RATE', 0.001))
+        self.wealth_tax_rate = float(os.getenv('ECONOMY_WEALTH_TAX_RATE', 0.01))
+        self.wealth_tax_threshold = int(os.getenv('ECONOMY_WEALTH_TAX_THRESHOLD', 1_000_000))
+        self.interest_task = None
+        self.last_interest = None
+        self.stock_tick = float(os.getenv('ECONOMY_STOCK_TICK', 15))
+        self.stock_rng = np.random.default_rng()
+        self.stock_task = None
+
+        self.cooldowns = get_cooldown_store(bot)
+        self.cooldowns.configure('work', 3600)
+        self.cooldowns.configure('rob', 7200)
+        self.cooldowns.configure('bankrob', rules.HEIST_COOLDOWN)
+
+        # Heists in progress, keyed by announcement message id, and guild heist
+        # cooldowns as unix expiry times; both are re-armed in cog_load
+        self.heists = self.persistence.load('heists', wrap=lambda data: RecordTable(HeistRecord.from_dict, data))
+        self.heist_cooldowns = self.persistence.load('heist_cooldowns')
+        self.reactions = get_reaction_dispatcher(bot)
+        self.timers = get_timer_heap(bot)
+
+    def create_storage_backend(self):
+        """Pick the storage backend from ECONOMY_STORAGE ('json' or 'sqlite')"""
+        json_paths = {
+            'bank': self.bank_file,
+            'stats': self.stats_file,
+            'items': self.items_file,
+            'pets': self.pets_file,
+            'market': self.market_file,
+            'heists': self.heists_file,
+            'heist_cooldowns': self.heist_cooldowns_file,
+            'lottery': self.lottery_file,
+            'stocks': self.stocks_file,
+            'portfolios': self.portfolios_file,
+        }
+        if os.getenv('ECONOMY_STORAGE', 'json').lower() == 'sqlite':
+            # A fresh database is seeded from the existing JSON files
+            return SQLiteBackend(os.getenv('ECONOMY_DB', 'economy.db'), json_paths, json_paths=json_paths)
+        return JSONFileBackend(json_paths)
+
+    async def cog_load(self):
+        self.persistence.start()
+        # Loading kept the stored dicts; turn them into records on the writer thread
+        # before the interest job reads every balance
+        for table in (self.bank, self.stats):
+            await table.convert_all(self.persistence.run)
+        self.schedule_wealth_rebuild()
+        await self.wealth_rebuild
+        self.interest_task = asyncio.create_task(self.interest_loop())
+        self.stock_task = asyncio.create_task(self.stock_loop())
+        self.resume_heists()
+
+    async def cog_unload(self):
+        if self.interest_task is not None:
+            self.interest_task.cancel()
+        if self.stock_task is not None:
+            self.stock_task.cancel()
+        if self.wealth_rebuild is not None:
+            self.wealth_rebuild.cancel()
+        self.persistence.mark_dirty('stocks')
+        # Heists stay persisted and are picked up again on the next load
+        for message_id in list(self.heists):
+            self.untrack_heist(message_id)
+        # Compact the journal and flush anything still pending before the cog goes away
+        if self.journal.dirty:
+            self.persistence.mark_dirty('bank')
+        await self.persistence.stop()
+        self.journal.close()
+
     def load_bank(self):
-        """Load bank data from JSON file"""
-        try:
-            with open(self.bank_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            with open(self.bank_file, 'w') as f:
-                json.dump({}, f)
-            return {}
+        """Load bank data from storage"""
+        return self.persistence.load('bank', wrap=lambda data: RecordTable(BankRecord.from_dict, data))
 
     def load_stats(self):
-        """Load stats data from JSON file"""
-        try:
-            with open(self.stats_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            with open(self.stats_file, 'w') as f:
-                json.dump({}, f)
-            return {}
+        """Load stats data from storage"""
+        return self.persistence.load('stats', wrap=lambda data: RecordTable(StatsRecord.from_dict, data))
 
     def load_items(self):
-        """Load items data from JSON file"""
-        try:
-            with open(self.items_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            with open(self.items_file, 'w') as f:
-                json.dump({}, f)
-            return {}
+        """Load items data from storage"""
+        return self.persistence.load('items')
 
     def load_pets(self):
-        """Load pets data from JSON file"""
-        try:
-            with open(self.pets_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            with open(self.pets_file, 'w') as f:
-                json.dump({}, f)
-            return {}
-
-    def save_bank(self):
-        """Save bank data to JSON file"""
-        with open(self.bank_file, 'w') as f:
-            json.dump(self.bank, f, indent=4)
-
-    def save_stats(self):
-        """Save stats data to JSON file"""
-        with open(self.stats_file, 'w') as f:
-            json.dump(self.stats, f, indent=4)
-
-    def save_items(self):
-        """Save items data to JSON file"""
-        with open(self.items_file, 'w') as f:
-            json.dump(self.items, f, indent=4)
-
-    def save_pets(self):
-        """Save pets data to JSON file"""
-        with open(self.pets_file, 'w') as f:
-            json.dump(self.pets, f, indent=4)
+        """Load pets data from storage"""
+        return self.persistence.load('pets')
+
+    def load_market(self):
+        """Load open market orders from storage, one order book per item"""
+        return self.persistence.load(
+            'market', wrap=lambda data: {item: OrderBook.from_dict(item, book) for item, book in data.items()}
+        )
+
+    def load_lotteries(self):
+        """Load each guild's running lottery and its past draws from storage"""
+        return self.persistence.load(
+            'lottery', wrap=lambda data: {guild_id: Lottery.from_dict(lottery) for guild_id, lottery in data.items()}
+        )
+
+    def save_bank(self, *user_ids):
+        """Journal balance changes for the given users (or queue a full bank flush)"""
+        if not user_ids:
+            self.persistence.mark_dirty('bank')
+            # Any balance may have changed; re-rank everyone off the loop
+            self.schedule_wealth_rebuild()
+            return
+        entries = []
+        raw_get = dict.get  # Skip RecordTable's lazy upgrade; records and raw dicts both index the same
+        for user_id in user_ids:
+            account = raw_get(self.bank, user_id)
+            if account is not None:
+                entries.append((user_id, account['wallet'], account['bank']))
+        self.update_wealth_index(entries)
+        # One journal write however many accounts changed
+        self.journal.append_many(entries)
+        if self.journal.needs_compaction:
+            self.persistence.mark_dirty('bank', *user_ids)
+            self.persistence.request_flush()
+
+    def save_stats(self, *user_ids):
+        """Queue stats data for the given users (or everyone) for the next background flush"""
+        self.persistence.mark_dirty('stats', *user_ids)
+
+    def save_items(self, *user_ids):
+        """Queue items data for the given users (or everyone) for the next background flush"""
+        self.persistence.mark_dirty('items', *user_ids)
+
+    def save_pets(self, *user_ids):
+        """Queue pets data for the given users (or everyone) for the next background flush"""
+        self.persistence.mark_dirty('pets', *user_ids)
+
+    def save_heists(self, *message_ids):
+        """Queue heist records for the next background flush"""
+        self.persistence.mark_dirty('heists', *message_ids)
+        self.persistence.request_flush()  # Heists are few and should survive a crash
+
+    def save_market(self, *items):
+        """Queue the order books for the given items for the next background flush"""
+        self.persistence.mark_dirty('market', *items)
+
+    def save_lottery(self, *guild_ids):
+        """Queue the lotteries for the given guilds for the next background flush"""
+        self.persistence.mark_dirty('lottery', *guild_ids)
+
+    def save_portfolio(self, *user_ids):
+        """Queue the given users' stock holdings for the next background flush"""
+        self.persistence.mark_dirty('portfolios', *user_ids)
+
+    def snapshot_stock_prices(self, keys):
+        """Copy the live prices into the stocks store just before it is written"""
+        self.stock_prices.update(self.exchange.listings())
+        return keys
+
+    async def stock_loop(self):
+        while True:
+            await asyncio.sleep(self.stock_tick)
+            try:
+                self.exchange.tick(time.time(), self.stock_tick, self.stock_rng)
+            except Exception:
+                logger.exception("Stock tick failed")
+                continue
+            self.persistence.mark_dirty('stocks')
+
+    async def interest_loop(self):
+        while True:
+            await asyncio.sleep(self.interest_interval)
+            try:
+                await self.run_interest()
+            except Exception:
+                logger.exception("Interest run failed")
+
+    async def run_interest(self):
+        """Apply one round of bank interest and wealth tax to every account"""
+        rows = list(self.bank.items())
+        loop = asyncio.get_running_loop()
+        # The vectorized computation runs on a worker thread; only the deltas
+        # are applied back here, in one pass, and persisted with one write
+        result = await loop.run_in_executor(
+            None, compute_interest, rows,
+            self.interest_rate, self.wealth_tax_rate, self.wealth_tax_threshold
+        )
+        apply_interest(self.bank, result)
+        if result.touched:
+            # Journaled per account, so the wealth index and the next snapshot
+            # only deal with the accounts that changed
+            self.save_bank(*result.user_ids)
+        self.last_interest = result
+        logger.info("Interest run: %s/%s accounts, +$%s interest, -$%s tax, %.1fms",
+                    f"{result.touched:,}", f"{result.accounts:,}", f"{result.created:,}", f"{result.destroyed:,}",
+                    result.compute_ms + result.apply_ms)
+        return result
+
+    def get_wealth_index(self):
+        """Accounts ordered by wallet + bank, sorted in cog_load and then kept up to date"""
+        if self.wealth_index is None:
+            # Only before cog_load has run
+            self.wealth_index = self.build_wealth_index(list(self.bank.items()))
+        return self.wealth_index
+
+    @staticmethod
+    def build_wealth_index(rows):
+        return RankIndex((user_id, account['wallet'] + account['bank']) for user_id, account in rows)
+
+    def update_wealth_index(self, entries):
+        """Move the saved ``(user_id, wallet, bank)`` entries to their new wealth rank"""
+        if self.wealth_changed is not None:
+            self.wealth_changed.update(user_id for user_id, _, _ in entries)
+        index = self.wealth_index
+        if index is None:
+            return
+        if len(entries) * 4 < len(index) or len(index) < self.wealth_resort_limit:
+            index.update_many((user_id, wallet + bank) for user_id, wallet, bank in entries)
+        else:
+            # RankIndex would re-sort every account here, stalling the loop
+            self.schedule_wealth_rebuild()
+
+    def schedule_wealth_rebuild(self):
+        """Re-sort the wealth index on the writer thread, or again once the running re-sort ends"""
+        if self.wealth_rebuild is None or self.wealth_rebuild.done():
+            self.wealth_rebuild = asyncio.create_task(self.rebuild_wealth_index())
+        else:
+            self.wealth_stale = True
+
+    async def rebuild_wealth_index(self):
+        """Sort every account into a new wealth index off the loop and swap it in.
+
+        The old index keeps answering ``!balance`` and ``!baltop`` meanwhile.
+        Accounts saved during the sort are re-read and moved in the new index
+        before the swap.
+        """
+        while True:
+            self.wealth_stale = False
+            self.wealth_changed = set()
+            try:
+                index = await self.persistence.run(self.build_wealth_index, list(self.bank.items()))
+            finally:
+                changed, self.wealth_changed = self.wealth_changed, None
+            moved = []
+            for user_id in changed:
+                account = self.bank.get(user_id)
+                if account is not None:
+                    moved.append((user_id, account['wallet'] + account['bank']))
+            index.update_many(moved)
+            self.wealth_index = index
+            if not self.wealth_stale:
+                return
 
     def get_balance(self, user_id):
         return self.bank.get(str(user_id), {"wallet": 0, "bank": 0})
@@ -114,40 +354,29 @@ class Economy(commands.Cog):
         if user_id not in self.stats:
             return 1
         job_count = self.stats[user_id].get(f'{job}_count', 0)
-        return (job_count // 15) + 1  # Level up every 15 jobs
+        return rules.job_level(job_count)
 
     def get_gamble_level(self, user_id):
         """Get gambling level based on number of gambles"""
         if user_id not in self.stats:
             return 1
         gamble_count = self.stats[user_id].get('gamble_count', 0)
-        return (gamble_count // 8) + 1  # Level up every 8 gambles
+        return rules.gamble_level(gamble_count)
 
     def get_gamble_win_chance(self, level):
         """Get gambling win chance based on level"""
-        base_chance = 50
-        increase_per_level = 1
-        max_chance = 60
-        chance = min(base_chance + (level - 1) * increase_per_level, max_chance)
-        return chance
+        return rules.gamble_win_chance(level)
 
     def get_salary_range(self, job, level):
         """Get salary range based on job and level"""
-        base_min, base_max = self.jobs[job]['base_salary']
-        level_bonus = (level - 1) * 100  # Increase by 100 for each level
-        return (base_min + level_bonus, base_max + level_bonus)
+        return rules.salary_range(job, level)
 
     def initialize_user_stats(self, user_id):
         """Initialize stats for a new user"""
         if user_id not in self.stats:
-            self.stats[user_id] = {
-                'gamble_count': 0,
-                'work_count': 0,
-                'gamble_wins': 0
-            }
-            for job in self.jobs:
-                self.stats[user_id][f'{job}_count'] = 0
-            self.save_stats()
+            # Every counter, including per-job ones, defaults to zero
+            self.stats[user_id] = StatsRecord()
+            self.save_stats(user_id)
         return self.stats[user_id]
 
     @commands.command(name='balance', aliases=['bal'])
@@ -158,11 +387,13 @@ class Economy(commands.Cog):
 
         if user_id not in self.bank:
             self.bank[user_id] = {"wallet": 0, "bank": 0}
-            self.save_bank()
+            self.save_bank(user_id)
 
         wallet = self.bank[user_id]["wallet"]
         bank = self.bank[user_id]["bank"]
         total = wallet + bank
+        wealth_index = self.get_wealth_index()
+        position = wealth_index.rank(user_id)
 
         embed = discord.Embed(
             title=f"💰 {member.name}'s Balance",
@@ -170,48 +401,60 @@ class Economy(commands.Cog):
         )
         embed.add_field(name="Wallet", value=f"${wallet:,}", inline=True)
         embed.add_field(name="Bank", value=f"${bank:,}", inline=True)
-        embed.add_field(name="Total", value=f"${total:,}", inline=False)
+        embed.add_field(name="Total", value=f"${total:,}", inline=True)
+        embed.add_field(name="Wealth Rank", value=f"#{position:,} of {len(wealth_index):,}", inline=True)
         embed.set_thumbnail(url=member.avatar.url if member.avatar else member.default_avatar.url)
         
         await ctx.send(embed=embed)
 
+    @commands.command(name='baltop', help='Show the richest users')
+    async def baltop(self, ctx, page: int = 1):
+        """Show the global balance leaderboard"""
+        wealth_index = self.get_wealth_index()
+        if not len(wealth_index):
+            await ctx.send("No one has any money yet!")
+            return
+
+        per_page = 10
+        total_pages = (len(wealth_index) + per_page - 1) // per_page
+        page = max(1, min(page, total_pages))
+        start = (page - 1) * per_page
+
+        embed = discord.Embed(title="💰 Richest Users", color=discord.Color.gold())
+        for i, (user_id, total) in enumerate(wealth_index.page(start, per_page), start + 1):
+            user = self.bot.get_user(int(user_id))
+            name = user.name if user else f"Unknown ({user_id})"
+            embed.add_field(name=f"{i}. {name}", value=f"${total:,}", inline=False)
+        embed.set_footer(text=f"Page {page}/{total_pages}")
+
+        await ctx.send(embed=embed)
+
     @commands.command(name='work', help='Work to earn money')
     async def work(self, ctx, job=None):
         user_id = str(ctx.author.id)
         user_stats = self.initialize_user_stats(user_id)
         
-        # Check if advance work is unlocked
-        has_advance = user_stats['work_count'] >= 150
-        
         # Check cooldown
-        if user_id in self.cooldowns.get('work', {}):
-            remaining = self.cooldowns['work'][user_id] - datetime.now()
-            if remaining.total_seconds() > 0:
-                await ctx.send(f"You must wait {int(remaining.total_seconds())} seconds before working again!")
-                return
+        remaining = self.cooldowns.remaining('work', ctx.author.id)
+        if remaining > 0:
+            await ctx.send(f"You must wait {int(remaining)} seconds before working again!")
+            return
 
         if job and job not in self.jobs:
             await ctx.send(f"Invalid job! Available jobs: {', '.join(self.jobs.keys())}")
             return
 
-        # Generate random amount based on job
-        if job:
-            job_level = self.get_job_level(user_id, job)
-            min_salary, max_salary = self.get_salary_range(job, job_level)
-            amount = random.randint(min_salary, max_salary)
-            # Chance to get job-specific item
-            if random.random() < 0.1:  # 10% chance
-                if user_id not in self.items:
-                    self.items[user_id] = {}
-                self.items[user_id][job] = self.items[user_id].get(job, 0) + 1
-                self.save_items()
-                await ctx.send(f"You found a {job}!")
-        else:
-            amount = random.randint(100, 1000)
+        # Generate random amount based on job level (doubled once advance work is unlocked)
+        job_count = user_stats[f'{job}_count'] if job else 0
+        amount = rules.work_pay(job, job_count, user_stats['work_count'])
 
-        # Apply advance work bonus
-        if has_advance:
-            amount *= 2
+        # Chance to get job-specific item
+        if job and random.random() < rules.ITEM_DROP_CHANCE:
+            if user_id not in self.items:
+                self.items[user_id] = {}
+            self.items[user_id][job] = self.items[user_id].get(job, 0) + 1
+            self.save_items(user_id)
+            await ctx.send(f"You found a {job}!")
 
         # Add to wallet
         if user_id not in self.bank:
@@ -222,15 +465,13 @@ class Economy(commands.Cog):
         user_stats['work_count'] += 1
         if job:
             user_stats[f'{job}_count'] += 1
-        self.save_stats()
+        self.save_stats(user_id)
         
         # Set cooldown (30 minutes for real jobs, 1 hour for regular work)
-        if 'work' not in self.cooldowns:
-            self.cooldowns['work'] = {}
-        self.cooldowns['work'][user_id] = datetime.now() + timedelta(minutes=30 if job else 60)
+        self.cooldowns.trigger('work', ctx.author.id, ttl=1800 if job else 3600)
         
         # Save changes
-        self.save_bank()
+        self.save_bank(user_id)
         
         if job:
             await ctx.send(f"You worked as a {job} and earned ${amount}!")
@@ -263,9 +504,13 @@ class Economy(commands.Cog):
             await ctx.send("You don't have enough money in your wallet!")
             return
 
+        if amount > ledger.headroom(balance['bank']):
+            await ctx.send(f"Your bank can't hold more than ${ledger.MAX_BALANCE:,}!")
+            return
+
         self.bank[user_id]['wallet'] -= amount
         self.bank[user_id]['bank'] += amount
-        self.save_bank()
+        self.save_bank(user_id)
 
         await ctx.send(f"Successfully deposited ${amount:,} into your bank!")
 
@@ -291,9 +536,13 @@ class Economy(commands.Cog):
             await ctx.send("You don't have enough money in your bank!")
             return
 
+        if amount > ledger.headroom(balance['wallet']):
+            await ctx.send(f"Your wallet can't hold more than ${ledger.MAX_BALANCE:,}!")
+            return
+
         self.bank[user_id]['bank'] -= amount
         self.bank[user_id]['wallet'] += amount
-        self.save_bank()
+        self.save_bank(user_id)
 
         await ctx.send(f"Successfully withdrew ${amount:,} from your bank!")
 
@@ -311,34 +560,37 @@ class Economy(commands.Cog):
             return
 
         # Check cooldown
-        if thief_id in self.cooldowns.get('rob', {}):
-            remaining = self.cooldowns['rob'][thief_id] - datetime.now()
-            if remaining.total_seconds() > 0:
-                await ctx.send(f"You must wait {int(remaining.total_seconds())} seconds before robbing again!")
-                return
+        remaining = self.cooldowns.remaining('rob', ctx.author.id)
+        if remaining > 0:
+            await ctx.send(f"You must wait {int(remaining)} seconds before robbing again!")
+            return
 
-        target_balance = self.get_balance(target_id)
-        if target_balance['wallet'] < 100:
-            await ctx.send("This user doesn't have enough money to rob!")
+        # Nothing is awaited between reading the wallets and moving the money
+        try:
+            target_wallet = self.get_balance(target_id)['wallet']
+            if target_wallet < rules.ROB_MIN_TARGET_WALLET:
+                result = None
+            else:
+                # 40% chance of successful robbery
+                stolen, fine = rules.rob_outcome(target_wallet)
+                if stolen:
+                    self.transactions.transfer(target_id, thief_id, stolen)
+                    result = f"You successfully robbed ${stolen:,} from {target.name}!"
+                else:
+                    # The fine can't push the thief's wallet below zero
+                    self.transactions.debit(thief_id, min(fine, self.get_balance(thief_id)['wallet']))
+                    result = f"You were caught and fined ${fine:,}!"
+        except TransactionError:
+            await ctx.send(f"Your wallet can't hold more than ${ledger.MAX_BALANCE:,}!")
             return
 
-        # 40% chance of successful robbery
-        if random.random() < 0.4:
-            stolen = random.randint(1, min(target_balance['wallet'], 1000))
-            self.bank[target_id]['wallet'] -= stolen
-            self.bank[thief_id]['wallet'] = self.bank.get(thief_id, {"wallet": 0, "bank": 0})['wallet'] + stolen
-            await ctx.send(f"You successfully robbed ${stolen:,} from {target.name}!")
-        else:
-            fine = random.randint(200, 1000)
-            self.bank[thief_id]['wallet'] = max(0, self.bank.get(thief_id, {"wallet": 0, "bank": 0})['wallet'] - fine)
-            await ctx.send(f"You were caught and fined ${fine:,}!")
+        if result is None:
+            await ctx.send("This user doesn't have enough money to rob!")
+            return
 
         # Set cooldown
-        if 'rob' not in self.cooldowns:
-            self.cooldowns['rob'] = {}
-        self.cooldowns['rob'][thief_id] = datetime.now() + timedelta(hours=2)
-        
-        self.save_bank()
+        self.cooldowns.trigger('rob', ctx.author.id)
+        await ctx.send(result)
 
     @commands.command(name='gamble', help='Gamble your money (use "all" to gamble everything in wallet)')
     async def gamble(self, ctx, amount: str):
@@ -348,12 +600,12 @@ class Economy(commands.Cog):
         # Initialize user if they don't exist
         if user_id not in self.bank:
             self.bank[user_id] = {"wallet": 0, "bank": 0}
-            self.save_bank()
+            self.save_bank(user_id)
 
         # Initialize stats if needed
         if user_id not in self.stats:
             self.stats[user_id] = {"work_count": 0, "gamble_count": 0}
-            self.save_stats()
+            self.save_stats(user_id)
 
         # Handle 'all' parameter
         if amount.lower() == 'all':
@@ -377,15 +629,15 @@ class Economy(commands.Cog):
             return
 
         # Calculate win chance based on gambling level
-        gamble_level = self.stats[user_id]["gamble_count"] // 8  # Level up every 8 gambles
-        win_chance = min(0.60, 0.50 + (gamble_level * 0.01))  # Max 60% win chance
+        gamble_level = self.stats[user_id]["gamble_count"] // rules.GAMBLES_PER_LEVEL
+        win_chance = self.get_gamble_win_chance(gamble_level + 1) / 100  # Max 60% win chance
 
         # Gamble logic
         if random.random() < win_chance:
             # Win
             winnings = bet_amount * 2
             self.bank[user_id]["wallet"] += bet_amount  # They get their bet back plus equal amount
-            self.save_bank()
+            self.save_bank(user_id)
             
             embed = discord.Embed(
                 title="🎰 Gambling Results",
@@ -399,7 +651,7 @@ class Economy(commands.Cog):
         else:
             # Lose
             self.bank[user_id]["wallet"] -= bet_amount
-            self.save_bank()
+            self.save_bank(user_id)
             
             embed = discord.Embed(
                 title="🎰 Gambling Results",
@@ -413,7 +665,7 @@ class Economy(commands.Cog):
 
         # Update gamble count
         self.stats[user_id]["gamble_count"] += 1
-        self.save_stats()
+        self.save_stats(user_id)
         
         await ctx.send(embed=embed)
 
@@ -424,21 +676,35 @@ class Economy(commands.Cog):
         elif isinstance(error, commands.BadArgument):
             await ctx.send("❌ Please enter a valid number or 'all'!")
 
-    @commands.command(name='market', help='View or buy/sell items')
-    async def market(self, ctx, action=None, item=None, price: int=None):
+    @commands.command(name='market', help='Trade job items: market [buy|sell <item> <qty> <price> | cancel <id> | depth <item> | orders]')
+    async def market(self, ctx, action=None, item=None, qty: int = None, price: int = None):
         user_id = str(ctx.author.id)
         
         if not action:
-            # Display market items
+            # Display the best bid and ask for every item
             embed = discord.Embed(title="🏪 Market", color=discord.Color.blue())
             for job in self.jobs:
-                embed.add_field(name=self.jobs[job]['base_salary'], 
-                              value=f"Job: {job}\nValue: $100-500", 
-                              inline=False)
+                book = self.market_books.get(job)
+                bid = book.best_bid() if book else None
+                ask = book.best_ask() if book else None
+                embed.add_field(
+                    name=job.title(),
+                    value=f"Bid: {f'${bid.price:,}' if bid else '-'}\nAsk: {f'${ask.price:,}' if ask else '-'}",
+                    inline=True
+                )
+            embed.set_footer(text="!market buy/sell <item> <qty> <price> • !market depth <item> • !market orders")
             await ctx.send(embed=embed)
             return
 
-        if action.lower() == 'sell' and item:
+        action = action.lower()
+        if action == 'depth' and item:
+            await self.show_depth(ctx, item.lower())
+        elif action == 'orders':
+            await self.show_orders(ctx, user_id)
+        elif action == 'cancel' and item:
+            await self.cancel_order(ctx, user_id, item)
+        elif action == 'sell' and item and qty is None:
+            # Quick sale of one item to the shop
             if user_id not in self.items or item not in self.items[user_id] or self.items[user_id][item] <= 0:
                 await ctx.send("You don't have this item!")
                 return
@@ -446,9 +712,156 @@ class Economy(commands.Cog):
             sell_price = random.randint(100, 500)
             self.items[user_id][item] -= 1
             self.bank[user_id]['wallet'] += sell_price
-            self.save_items()
-            self.save_bank()
+            self.save_items(user_id)
+            self.save_bank(user_id)
             await ctx.send(f"You sold {item} for ${sell_price}!")
+        elif action in (BUY, SELL) and item and qty is not None and price is not None:
+            await self.place_order(ctx, user_id, action, item.lower(), qty, price)
+        else:
+            await ctx.send("Usage: `!market buy/sell <item> <qty> <price>`, `!market cancel <id>`, "
+                           "`!market depth <item>` or `!market orders`")
+
+    def get_book(self, item):
+        if item not in self.market_books:
+            self.market_books[item] = OrderBook(item)
+        return self.market_books[item]
+
+    async def place_order(self, ctx, user_id, side, item, qty, price):
+        """Escrow a limit order's money or items, match it, and settle the fills"""
+        if item not in self.jobs:
+            await ctx.send(f"Unknown item! Items: {', '.join(self.jobs)}")
+            return
+        if qty <= 0 or price <= 0:
+            await ctx.send("Quantity and price must be positive!")
+            return
+        if qty * price > ledger.MAX_BALANCE:
+            await ctx.send("That order is too large!")
+            return
+
+        # Buyers escrow quantity * limit price, sellers escrow the items
+        if side == BUY:
+            try:
+                self.transactions.debit(user_id, qty * price)
+            except TransactionError:
+                await ctx.send(f"You need ${qty * price:,} in your wallet to place this order!")
+                return
+        else:
+            held = self.items.get(user_id, {}).get(item, 0)
+            if held < qty:
+                await ctx.send(f"You only have {held} {item}!")
+                return
+            self.items[user_id][item] -= qty
+            self.save_items(user_id)
+
+        # Matching and settlement don't await, so no other command sees a half-settled book
+        order = Order(self.next_order_id, user_id, side, price, qty)
+        self.next_order_id += 1
+        book = self.get_book(item)
+        fills = book.submit(order)
+        try:
+            self.settle_fills(item, order, fills)
+        except TransactionError:
+            # A payment would push a wallet past the limit: undo the match and hand the escrow back
+            book.revert(order, fills)
+            self.release_escrow(user_id, item, order)
+            await ctx.send(f"❌ This trade would take a wallet past ${ledger.MAX_BALANCE:,}! The order was cancelled.")
+            return
+        self.save_market(item)
+
+        embed = discord.Embed(title="📈 Order Placed", color=discord.Color.blue())
+        embed.add_field(name="Order", value=f"#{order.order_id}: {side} {qty} {item} @ ${price:,}", inline=False)
+        if fills:
+            filled = sum(fill.qty for fill in fills)
+            value = sum(fill.qty * fill.price for fill in fills)
+            embed.add_field(name="Filled", value=f"{filled:,} for ${value:,} (avg ${value / filled:,.2f})", inline=True)
+        embed.add_field(name="Open", value=f"{order.qty:,}", inline=True)
+        await ctx.send(embed=embed)
+
+    def settle_fills(self, item, order, fills):
+        """Pay sellers, deliver items to buyers and refund buyers' price improvement.
+
+        All payments for the order commit together; if one would overflow a
+        wallet, ``TransactionError`` is raised and nothing is paid or delivered.
+        """
+        if not fills:
+            return
+        with self.transactions.begin() as txn:
+            for fill in fills:
+                if order.side == BUY:
+                    # The buyer escrowed at their limit; trades happen at the resting price
+                    refund = (order.price - fill.price) * fill.qty
+                    if refund:
+                        txn.credit(order.user_id, refund)
+                    txn.credit(fill.maker_user, fill.price * fill.qty)
+                else:
+                    txn.credit(order.user_id, fill.price * fill.qty)
+        for fill in fills:
+            buyer = order.user_id if order.side == BUY else fill.maker_user
+            buyer_items = self.items.setdefault(buyer, {})
+            buyer_items[item] = buyer_items.get(item, 0) + fill.qty
+        self.save_items(*({order.user_id} | {fill.maker_user for fill in fills}))
+
+    def release_escrow(self, user_id, item, order):
+        """Return an order's open escrow to its owner and describe what was returned.
+
+        Raises ``TransactionError`` if the money wouldn't fit in the wallet.
+        """
+        if order.side == BUY:
+            self.transactions.credit(user_id, order.qty * order.price)
+            return f"${order.qty * order.price:,}"
+        user_items = self.items.setdefault(user_id, {})
+        user_items[item] = user_items.get(item, 0) + order.qty
+        self.save_items(user_id)
+        return f"{order.qty} {item}"
+
+    async def cancel_order(self, ctx, user_id, order_id):
+        """Cancel an open order and return its escrowed money or items"""
+        try:
+            order_id = int(order_id.lstrip('#'))
+        except ValueError:
+            await ctx.send("Please enter a valid order id!")
+            return
+        for item, book in self.market_books.items():
+            order = book.orders.get(order_id)
+            if order is None:
+                continue
+            if order.user_id != user_id:
+                break
+            try:
+                refund = self.release_escrow(user_id, item, order)
+            except TransactionError:
+                await ctx.send(f"Your wallet can't hold the ${order.qty * order.price:,} refund! The order stays open.")
+                return
+            book.cancel(order_id)
+            self.save_market(item)
+            await ctx.send(f"Cancelled order #{order_id}, {refund} returned.")
+            return
+        await ctx.send("You don't have an open order with that id!")
+
+    async def show_depth(self, ctx, item):
+        """Show the top price levels on both sides of an item's book"""
+        book = self.market_books.get(item)
+        if item not in self.jobs:
+            await ctx.send(f"Unknown item! Items: {', '.join(self.jobs)}")
+            return
+        bids, asks = book.depth(10) if book else ([], [])
+        embed = discord.Embed(title=f"📊 {item.title()} Order Book", color=discord.Color.blue())
+        embed.add_field(name="Bids", value="\n".join(f"{qty:,} @ ${price:,}" for price, qty in bids) or "-", inline=True)
+        embed.add_field(name="Asks", value="\n".join(f"{qty:,} @ ${price:,}" for price, qty in asks) or "-", inline=True)
+        await ctx.send(embed=embed)
+
+    async def show_orders(self, ctx, user_id):
+        """List a user's open orders"""
+        lines = [
+            f"#{order.order_id}: {order.side} {order.qty} {item} @ ${order.price:,}"
+            for item, book in self.market_books.items()
+            for order in book.orders.values() if order.user_id == user_id
+        ]
+        embed = discord.Embed(title="📋 Your Open Orders", color=discord.Color.blue())
+        embed.description = "\n".join(lines[:20]) or "You have no open orders."
+        if len(lines) > 20:
+            embed.set_footer(text=f"Showing 20 of {len(lines)}")
+        await ctx.send(embed=embed)
 
     @commands.command(name='challenge', help='Challenge another user to a pet battle')
     async def challenge(self, ctx, opponent: discord.Member, bet: int):
@@ -459,35 +872,413 @@ class Economy(commands.Cog):
             await ctx.send("Both players need to have pets to battle!")
             return
 
-        if bet > self.bank[user_id]['wallet'] or bet > self.bank[opponent_id]['wallet']:
-            await ctx.send("Both players need to have enough money for the bet!")
+        if bet <= 0:
+            await ctx.send("The bet must be positive!")
             return
 
         # Battle logic
         user_pet = self.pets[user_id]
         opponent_pet = self.pets[opponent_id]
-        
-        user_power = user_pet['strength'] * random.uniform(0.8, 1.2)
-        opponent_power = opponent_pet['strength'] * random.uniform(0.8, 1.2)
-
-        # Determine winner
-        if user_power > opponent_power:
-            self.bank[user_id]['wallet'] += bet
-            self.bank[opponent_id]['wallet'] -= bet
-            winner = ctx.author
-        else:
-            self.bank[opponent_id]['wallet'] += bet
-            self.bank[user_id]['wallet'] -= bet
-            winner = opponent
 
-        self.save_bank()
-        
+        try:
+            enough_money = (bet <= self.get_balance(user_id)['wallet']
+                            and bet <= self.get_balance(opponent_id)['wallet'])
+            if enough_money:
+                user_power = rules.pet_power(user_pet['strength'])
+                opponent_power = rules.pet_power(opponent_pet['strength'])
+
+                # Determine winner
+                if user_power > opponent_power:
+                    self.transactions.transfer(opponent_id, user_id, bet)
+                    winner = ctx.author
+                else:
+                    self.transactions.transfer(user_id, opponent_id, bet)
+                    winner = opponent
+        except TransactionError:
+            await ctx.send(f"The winner's wallet can't hold more than ${ledger.MAX_BALANCE:,}! The battle was called off.")
+            return
+
+        if not enough_money:
+            await ctx.send("Both players need to have enough money for the bet!")
+            return
+
         embed = discord.Embed(title="🐾 Pet Battle", color=discord.Color.purple())
         embed.add_field(name=f"{ctx.author.name}'s Pet", value=f"Power: {user_power:.2f}", inline=True)
         embed.add_field(name=f"{opponent.name}'s Pet", value=f"Power: {opponent_power:.2f}", inline=True)
         embed.add_field(name="Winner", value=f"{winner.name} wins ${bet}!", inline=False)
         await ctx.send(embed=embed)
 
+    @commands.command(name='tournament', help='Pet tournaments: tournament [open <fee> | join | leave | bet @member <amount> | start | cancel | bracket [page]]')
+    async def tournament(self, ctx, action=None, arg=None, amount: int = None):
+        guild_id = ctx.guild.id
+        user_id = str(ctx.author.id)
+        signup = self.tournaments.get(guild_id)
+        action = (action or 'status').lower()
+        is_admin = ctx.author.guild_permissions.administrator
+
+        if action == 'bracket':
+            await self.show_bracket(ctx, int(arg) if arg and arg.isdigit() else 1)
+            return
+
+        if action == 'open':
+            if not is_admin:
+                await ctx.send("❌ Only admins can open a tournament!")
+                return
+            if signup is not None:
+                await ctx.send("❌ A tournament is already open in this server!")
+                return
+            fee = int(arg) if arg and arg.isdigit() else 0
+            self.tournaments[guild_id] = TournamentSignup(fee, ctx.author.id)
+            await ctx.send(f"🏟️ Pet tournament open! Entry fee ${fee:,}. "
+                           f"Join with `!tournament join`, bet with `!tournament bet @member <amount>`.")
+            return
+
+        if signup is None:
+            await ctx.send("There's no tournament open. An admin can start one with `!tournament open <fee>`.")
+            return
+
+        if action == 'status':
+            embed = discord.Embed(title="🏟️ Pet Tournament", color=discord.Color.purple())
+            embed.add_field(name="Entry Fee", value=f"${signup.entry_fee:,}", inline=True)
+            embed.add_field(name="Entrants", value=f"{len(signup.entrants):,}", inline=True)
+            embed.add_field(name="Bet Pool", value=f"${signup.bet_pool:,} ({len(signup.bets):,} bets)", inline=True)
+            await ctx.send(embed=embed)
+        elif action == 'join':
+            if user_id not in self.pets:
+                await ctx.send("You need a pet to enter! Use `!pet buy <type>` to get one.")
+                return
+            if self.get_balance(user_id)['wallet'] < signup.entry_fee:
+                await ctx.send(f"You need ${signup.entry_fee:,} in your wallet to enter!")
+                return
+            signup.entrants[user_id] = ctx.author.display_name
+            await ctx.send(f"{ctx.author.display_name}'s {self.pets[user_id]['type']} entered the tournament! "
+                           f"({len(signup.entrants):,} entrants)")
+        elif action == 'leave':
+            if signup.entrants.pop(user_id, None) is None:
+                await ctx.send("You're not in this tournament!")
+                return
+            await ctx.send("You left the tournament.")
+        elif action == 'bet':
+            try:
+                member = await commands.MemberConverter().convert(ctx, arg or '')
+            except commands.BadArgument:
+                await ctx.send("Usage: `!tournament bet @member <amount>`")
+                return
+            if str(member.id) not in signup.entrants:
+                await ctx.send(f"{member.display_name} isn't in the tournament!")
+                return
+            if amount is None or amount <= 0:
+                await ctx.send("The bet must be positive!")
+                return
+            if self.get_balance(user_id)['wallet'] < amount:
+                await ctx.send("You don't have enough money for that bet!")
+                return
+            # One bet per user; betting again replaces it
+            signup.bets[user_id] = (str(member.id), amount)
+            await ctx.send(f"You bet ${amount:,} on {member.display_name}. Bet pool: ${signup.bet_pool:,}")
+        elif action in ('start', 'cancel'):
+            if not is_admin and ctx.author.id != signup.host_id:
+                await ctx.send("❌ Only the host or an admin can do that!")
+                return
+            if action == 'cancel':
+                del self.tournaments[guild_id]
+                await ctx.send("The tournament was cancelled. No money changed hands.")
+                return
+            await self.run_tournament(ctx, signup)
+        else:
+            await ctx.send("Usage: `!tournament [open <fee> | join | leave | bet @member <amount> | start | cancel | bracket [page]]`")
+
+    async def run_tournament(self, ctx, signup):
+        """Simulate the bracket and settle fees, prizes and bets in one transaction"""
+        fee = signup.entry_fee
+        start = time.perf_counter()
+        try:
+            with self.transactions.begin() as txn:
+                # Entry fees and bets are only taken now, so check them against current balances
+                entrants = [uid for uid in signup.entrants if uid in self.pets and txn.balance(uid) >= fee]
+                if len(entrants) < 2:
+                    raise TransactionError("at least two entrants with a pet and the entry fee are needed")
+                bets = {
+                    bettor: (pick, bet) for bettor, (pick, bet) in signup.bets.items()
+                    if pick in entrants and txn.balance(bettor) - (fee if bettor in entrants else 0) >= bet
+                }
+                bracket = simulate_bracket(entrants, [self.pets[uid]['strength'] for uid in entrants])
+                deltas = settlement(bracket, fee, bets)
+                for uid, delta in deltas.items():
+                    txn.credit(uid, delta)
+        except TransactionError as e:
+            await ctx.send(f"❌ The tournament couldn't start: {e}. It's still open.")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        del self.tournaments[ctx.guild.id]
+        names = dict(signup.entrants)
+        self.brackets[ctx.guild.id] = (bracket, names)
+        champion, runner_up = bracket.champion, bracket.runner_up
+        winnings = deltas.get(champion, 0) + fee
+
+        embed = discord.Embed(title="🏆 Tournament Results", color=discord.Color.gold())
+        embed.add_field(name="Champion", value=f"{names[champion]} (+${winnings:,})", inline=True)
+        embed.add_field(name="Runner-up", value=f"{names[runner_up]} (+${deltas.get(runner_up, 0) + fee:,})", inline=True)
+        embed.add_field(name="Entrants", value=f"{len(bracket.entrants):,}", inline=True)
+        winners = [bettor for bettor, (pick, _) in bets.items() if pick == champion]
+        if winners:
+            embed.add_field(name="Bets", value=f"{len(winners):,} of {len(bets):,} bettors split ${sum(b for _, b in bets.values()):,}", inline=False)
+        elif bets:
+            embed.add_field(name="Bets", value="Nobody backed the champion, so all bets are void", inline=False)
+        embed.set_footer(text=f"{bracket.matches:,} matches in {elapsed_ms:.1f}ms • !tournament bracket [page]")
+        await ctx.send(embed=embed)
+        await self.show_bracket(ctx, 1)
+
+    async def show_bracket(self, ctx, page):
+        """Show the last tournament's matches, final first"""
+        if ctx.guild.id not in self.brackets:
+            await ctx.send("No tournament has been played in this server yet!")
+            return
+        bracket, names = self.brackets[ctx.guild.id]
+        lines = bracket.match_lines(names)
+        per_page = 10
+        total_pages = (len(lines) + per_page - 1) // per_page
+        page = max(1, min(page, total_pages))
+        start = (page - 1) * per_page
+
+        embed = discord.Embed(title="🏟️ Tournament Bracket", color=discord.Color.purple())
+        embed.description = "\n".join(lines[start:start + per_page])
+        embed.set_footer(text=f"Page {page}/{total_pages}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='stocks', help='Stock market: stocks [buy|sell <symbol> <shares> | chart <symbol> [1m|1h]]')
+    async def stocks(self, ctx, action=None, symbol=None, arg=None):
+        action = (action or 'list').lower()
+        if action == 'list':
+            await self.show_stocks(ctx)
+            return
+        if action not in ('buy', 'sell', 'chart'):
+            await ctx.send("Usage: `!stocks [buy|sell <symbol> <shares> | chart <symbol> [1m|1h]]`")
+            return
+        symbol = (symbol or '').upper()
+        if symbol not in self.exchange.index:
+            await ctx.send(f"Unknown symbol! Listed: {', '.join(self.exchange.symbols)}")
+            return
+        if action == 'chart':
+            await self.show_chart(ctx, symbol, (arg or '1m').lower())
+            return
+        if not arg or not arg.isdigit() or int(arg) <= 0:
+            await ctx.send("Please enter a positive number of shares!")
+            return
+        if action == 'buy':
+            await self.buy_shares(ctx, str(ctx.author.id), symbol, int(arg))
+        else:
+            await self.sell_shares(ctx, str(ctx.author.id), symbol, int(arg))
+
+    async def show_stocks(self, ctx):
+        embed = discord.Embed(title="📊 Stock Market", color=discord.Color.blue())
+        for symbol in self.exchange.symbols:
+            change = self.exchange.change(symbol, self.exchange.minute, 60)
+            arrow = "📈" if change >= 0 else "📉"
+            embed.add_field(name=symbol, value=f"${self.exchange.price(symbol):,.2f}\n{arrow} {change * 100:+.2f}% (1h)",
+                            inline=True)
+        embed.set_footer(text=f"Prices move every {self.stock_tick:g}s. Trade with !stocks buy/sell <symbol> <shares>")
+        await ctx.send(embed=embed)
+
+    async def show_chart(self, ctx, symbol, period):
+        series = {'1m': self.exchange.minute, '1h': self.exchange.hour}.get(period)
+        if series is None:
+            await ctx.send("Chart period must be `1m` or `1h`!")
+            return
+        candles = series.recent(self.exchange.index[symbol], 10)
+        if not candles:
+            await ctx.send(f"No {period} candles for {symbol} yet!")
+            return
+        time_format = '%H:%M' if period == '1m' else '%d %H:00'
+        lines = [f"{'Time':<8} {'Open':>9} {'High':>9} {'Low':>9} {'Close':>9} {'Vol':>7}"]
+        for start, open_, high, low, close, volume in candles:
+            lines.append(f"{time.strftime(time_format, time.gmtime(start)):<8} {open_:>9,.2f} {high:>9,.2f} "
+                         f"{low:>9,.2f} {close:>9,.2f} {volume:>7,}")
+        embed = discord.Embed(title=f"📊 {symbol} {period} Candles (UTC)", color=discord.Color.blue())
+        embed.description = "```\n" + "\n".join(lines) + "\n```"
+        await ctx.send(embed=embed)
+
+    async def buy_shares(self, ctx, user_id, symbol, shares):
+        cost, _ = self.exchange.quote(symbol, shares)
+        held = self.exchange.holdings.get(user_id, self.exchange.index[symbol])
+        if not ledger.fits(cost) or not ledger.fits(held + shares):
+            await ctx.send("That order is too large!")
+            return
+        try:
+            self.transactions.debit(user_id, cost)
+        except TransactionError:
+            await ctx.send(f"You need ${cost:,} in your wallet for {shares:,} {symbol}!")
+            return
+        held = self.record_trade(user_id, symbol, shares)
+        await ctx.send(f"📈 Bought {shares:,} {symbol} for ${cost:,}. You now hold {held:,} {symbol}.")
+
+    async def sell_shares(self, ctx, user_id, symbol, shares):
+        held = self.exchange.holdings.get(user_id, self.exchange.index[symbol])
+        if held < shares:
+            await ctx.send(f"You only have {held:,} {symbol}!")
+            return
+        _, proceeds = self.exchange.quote(symbol, shares)
+        # Take the shares first so a second sell can't spend them while we wait
+        self.record_trade(user_id, symbol, -shares)
+        try:
+            self.transactions.credit(user_id, proceeds)
+        except TransactionError:
+            self.record_trade(user_id, symbol, shares)
+            await ctx.send("Your wallet can't hold that much money!")
+            return
+        await ctx.send(f"📉 Sold {shares:,} {symbol} for ${proceeds:,}. You have {held - shares:,} {symbol} left.")
+
+    def record_trade(self, user_id, symbol, delta):
+        """Apply a filled trade to the exchange and the persisted portfolio"""
+        held = self.exchange.trade(user_id, symbol, delta)
+        positions = self.portfolios.setdefault(user_id, {})
+        if held:
+            positions[symbol] = held
+        else:
+            positions.pop(symbol, None)
+            if not positions:
+                del self.portfolios[user_id]
+        self.save_portfolio(user_id)
+        return held
+
+    @commands.command(name='portfolio', help='Show your stock holdings')
+    async def portfolio(self, ctx, member: discord.Member = None):
+        member = member or ctx.author
+        positions = self.exchange.portfolio(str(member.id))
+        if not positions:
+            await ctx.send(f"{member.name} doesn't own any stocks!")
+            return
+        embed = discord.Embed(title=f"💼 {member.name}'s Portfolio", color=discord.Color.blue())
+        for symbol, shares, value in positions[:25]:
+            embed.add_field(name=symbol, value=f"{shares:,} × ${self.exchange.price(symbol):,.2f}\n= ${value:,.0f}",
+                            inline=True)
+        embed.set_footer(text=f"Total value: ${self.exchange.value(str(member.id)):,.0f}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='stocktop', help='Show the most valuable stock portfolios')
+    async def stocktop(self, ctx, page: int = 1):
+        """Portfolio leaderboard, ranked in one batch from the values of the last tick"""
+        ranked = len(self.exchange.ranking())
+        if not ranked:
+            await ctx.send("No one owns any stocks yet!")
+            return
+
+        per_page = 10
+        total_pages = (ranked + per_page - 1) // per_page
+        page = max(1, min(page, total_pages))
+        start = (page - 1) * per_page
+
+        embed = discord.Embed(title="💼 Top Portfolios", color=discord.Color.blue())
+        for i, (user_id, value) in enumerate(self.exchange.top(start, per_page), start + 1):
+            user = self.bot.get_user(int(user_id))
+            name = user.name if user else f"Unknown ({user_id})"
+            embed.add_field(name=f"{i}. {name}", value=f"${value:,.0f}", inline=False)
+        embed.set_footer(text=f"Page {page}/{total_pages}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='lottery', help='Ticket lottery: lottery [buy <tickets> | draw | history | verify <round>]')
+    async def lottery(self, ctx, action=None, arg: int = None):
+        guild_id = str(ctx.guild.id)
+        user_id = str(ctx.author.id)
+        lottery = self.lotteries.get(guild_id) or Lottery()
+        action = (action or 'status').lower()
+
+        if action == 'status':
+            held = lottery.tickets(user_id)
+            embed = discord.Embed(title=f"🎟️ Lottery Round {lottery.round:,}", color=discord.Color.gold())
+            embed.add_field(name="Pot", value=f"${lottery.pot:,}", inline=True)
+            embed.add_field(name="Tickets Sold", value=f"{lottery.total:,} ({lottery.players:,} players)", inline=True)
+            embed.add_field(name="Your Tickets", value=f"{held:,}", inline=True)
+            if held:
+                embed.add_field(name="Your Odds", value=f"{held / lottery.total * 100:.2f}%", inline=True)
+            embed.set_footer(text=f"Tickets cost ${rules.LOTTERY_TICKET_PRICE:,} each. Buy with !lottery buy <tickets>")
+            await ctx.send(embed=embed)
+        elif action == 'buy':
+            await self.buy_tickets(ctx, guild_id, user_id, 1 if arg is None else arg)
+        elif action == 'draw':
+            if not ctx.author.guild_permissions.administrator:
+                await ctx.send("❌ Only admins can draw the lottery!")
+                return
+            await self.draw_lottery(ctx, guild_id)
+        elif action == 'history':
+            await self.show_lottery_history(ctx, lottery)
+        elif action == 'verify':
+            draw = next((past for past in lottery.history if past['round'] == arg), None)
+            if draw is None:
+                await ctx.send("That draw isn't in the recorded history!")
+                return
+            status = "✅ matches" if verify_draw(draw) else "❌ does NOT match"
+            last = draw['offset'] + draw['tickets'] - 1
+            await ctx.send(f"Round {draw['round']:,}: seed `{draw['seed']}` picks ticket #{draw['ticket']:,} of "
+                           f"{draw['total']:,}, and <@{draw['winner']}> held tickets #{draw['offset']:,}-#{last:,} "
+                           f"(ticket counts digest `{draw['digest']}`). This {status} the recorded winner.")
+        else:
+            await ctx.send("Usage: `!lottery [buy <tickets> | draw | history | verify <round>]`")
+
+    async def buy_tickets(self, ctx, guild_id, user_id, count):
+        if count <= 0:
+            await ctx.send("You need to buy at least one ticket!")
+            return
+        cost = count * rules.LOTTERY_TICKET_PRICE
+        lottery = self.lotteries.get(guild_id)
+        if not ledger.fits(cost + (lottery.pot if lottery else 0)):
+            await ctx.send("That would put too much money in the pot!")
+            return
+        try:
+            self.transactions.debit(user_id, cost)
+        except TransactionError:
+            await ctx.send(f"You need ${cost:,} in your wallet for {count:,} tickets!")
+            return
+
+        lottery = self.lotteries.setdefault(guild_id, Lottery())
+        lottery.buy(user_id, count, cost)
+        self.save_lottery(guild_id)
+        held = lottery.tickets(user_id)
+        await ctx.send(f"🎟️ You bought {count:,} tickets for ${cost:,}! You hold {held:,} of {lottery.total:,} "
+                       f"({held / lottery.total * 100:.2f}%). Pot: ${lottery.pot:,}")
+
+    async def draw_lottery(self, ctx, guild_id):
+        """Draw the winner and pay out the pot; the seed is recorded so the draw can be verified"""
+        lottery = self.lotteries.get(guild_id)
+        if lottery is None or not lottery.total:
+            await ctx.send("No tickets have been sold this round!")
+            return
+        # Drawing doesn't await, so no ticket bought meanwhile can land in the drawn round
+        draw = lottery.draw(keep=rules.LOTTERY_HISTORY)
+        winner = draw['winner']
+        try:
+            self.transactions.credit(winner, draw['pot'])
+        except TransactionError:
+            # The winner's wallet can't hold the pot; it carries over instead of vanishing
+            lottery.pot += draw['pot']
+            draw['rolled_over'] = True
+        self.save_lottery(guild_id)
+        self.persistence.request_flush()
+
+        embed = discord.Embed(title=f"🎉 Lottery Round {draw['round']:,} Winner!", color=discord.Color.gold())
+        embed.description = f"<@{winner}> won with ticket #{draw['ticket']:,} of {draw['total']:,}!"
+        if draw.get('rolled_over'):
+            embed.add_field(name="Pot", value=f"${draw['pot']:,} (rolled over, the winner's wallet is full)", inline=True)
+        else:
+            embed.add_field(name="Prize", value=f"${draw['pot']:,}", inline=True)
+        embed.add_field(name="Players", value=f"{draw['players']:,}", inline=True)
+        embed.set_footer(text=f"Seed {draw['seed']}. Check it with !lottery verify {draw['round']}")
+        await ctx.send(embed=embed)
+
+    async def show_lottery_history(self, ctx, lottery):
+        if not lottery.history:
+            await ctx.send("No lottery has been drawn in this server yet!")
+            return
+        embed = discord.Embed(title="🎟️ Lottery History", color=discord.Color.gold())
+        embed.description = "\n".join(
+            f"**Round {draw['round']:,}:** <@{draw['winner']}> won ${draw['pot']:,}"
+            f"{' (rolled over)' if draw.get('rolled_over') else ''} "
+            f"(ticket #{draw['ticket']:,} of {draw['total']:,}, seed `{draw['seed']}`)"
+            for draw in reversed(lottery.history)
+        )
+        await ctx.send(embed=embed)
+
     @commands.command(name='pet', help='View or buy pets')
     async def pet(self, ctx, action=None, pet_type=None):
         user_id = str(ctx.author.id)
@@ -514,8 +1305,8 @@ class Economy(commands.Cog):
                 'type': pet_type,
                 'strength': random.randint(50, 100)
             }
-            self.save_bank()
-            self.save_pets()
+            self.save_bank(user_id)
+            self.save_pets(user_id)
             await ctx.send(f"You bought a {pet_type} pet!")
 
     @commands.command(name='stats', help='View your stats')
@@ -566,8 +1357,8 @@ class Economy(commands.Cog):
         user_id = str(ctx.author.id)
         user_stats = self.initialize_user_stats(user_id)
         
-        if user_stats['work_count'] < 150:
-            remaining = 150 - user_stats['work_count']
+        if user_stats['work_count'] < rules.ADVANCE_WORK_COUNT:
+            remaining = rules.ADVANCE_WORK_COUNT - user_stats['work_count']
             await ctx.send(f"❌ You need {remaining} more works to unlock advanced work!")
             return
             
@@ -604,9 +1395,13 @@ class Economy(commands.Cog):
         if user_id not in self.bank:
             self.bank[user_id] = {"wallet": 0, "bank": 0}
 
+        if amount > ledger.headroom(self.bank[user_id]["wallet"]):
+            await ctx.send(f"❌ A wallet can't hold more than ${ledger.MAX_BALANCE:,}!")
+            return
+
         # Add money to user's wallet
         self.bank[user_id]["wallet"] += amount
-        self.save_bank()
+        self.save_bank(user_id)
 
         embed = discord.Embed(
             title="💰 Money Given",
@@ -656,7 +1451,7 @@ class Economy(commands.Cog):
 
         # Remove money from user's wallet
         self.bank[user_id]["wallet"] -= amount
-        self.save_bank()
+        self.save_bank(user_id)
 
         embed = discord.Embed(
             title="💸 Money Removed",
@@ -681,16 +1476,169 @@ class Economy(commands.Cog):
         elif isinstance(error, commands.BadArgument):
             await ctx.send("❌ Invalid arguments! Usage: !removemoney @user <amount>")
 
+    async def resolve_bulk_targets(self, ctx, targets, since):
+        """Members for a bulk command, or None after telling the user why there are none"""
+        if not targets and since is None:
+            await ctx.send(f"❌ Usage: !{ctx.command.name} <amount> [@role|@member ...] [since:YYYY-MM-DD]")
+            return None
+        active_ids = None
+        if since is not None:
+            # Activity is tracked by the leveling cog
+            leveling = self.bot.get_cog('Leveling')
+            if leveling is None:
+                await ctx.send("❌ Activity filters need the leveling cog to be loaded!")
+                return None
+            active_ids = leveling.active_since(str(ctx.guild.id), since)
+        members = resolve_targets(ctx.guild, targets, active_ids)
+        if not members:
+            await ctx.send("❌ No members matched!")
+            return None
+        return members
+
+    @commands.command(name='bulkgivemoney', help='[Owner Only] Give money to roles, members or everyone active since a date')
+    @commands.has_guild_permissions(administrator=True)
+    async def bulkgivemoney(self, ctx, amount: int, targets: commands.Greedy[Union[discord.Member, discord.Role]],
+                            since: Optional[ActiveSince] = None):
+        """Give money to many members in one transaction (Owner Only)"""
+        if ctx.author.id != ctx.guild.owner_id:
+            await ctx.send("❌ Only the server owner can use this command!")
+            return
+
+        if amount <= 0:
+            await ctx.send("❌ Please enter a positive amount!")
+            return
+
+        members = await self.resolve_bulk_targets(ctx, targets, since)
+        if members is None:
+            return
+
+        # Every wallet is credited in one transaction and journaled with one write
+        user_ids = [str(member.id) for member in members]
+        try:
+            with self.transactions.begin() as txn:
+                for user_id in user_ids:
+                    txn.credit(user_id, amount)
+        except TransactionError:
+            await ctx.send(f"❌ That would push a wallet past ${ledger.MAX_BALANCE:,}! Nobody was paid.")
+            return
+
+        embed = discord.Embed(
+            title="💰 Money Given",
+            description=f"Successfully given ${amount:,} to {len(members):,} members",
+            color=discord.Color.green()
+        )
+        embed.add_field(name="Total", value=f"${amount * len(members):,}", inline=True)
+        embed.set_footer(text=f"Given by {ctx.author.name}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='bulkremovemoney', help='[Owner Only] Remove money from roles, members or everyone active since a date')
+    @commands.has_guild_permissions(administrator=True)
+    async def bulkremovemoney(self, ctx, amount: int, targets: commands.Greedy[Union[discord.Member, discord.Role]],
+                              since: Optional[ActiveSince] = None):
+        """Remove money from many members in one transaction (Owner Only)"""
+        if ctx.author.id != ctx.guild.owner_id:
+            await ctx.send("❌ Only the server owner can use this command!")
+            return
+
+        if amount <= 0:
+            await ctx.send("❌ Please enter a positive amount!")
+            return
+
+        members = await self.resolve_bulk_targets(ctx, targets, since)
+        if members is None:
+            return
+
+        # Members with less than the amount lose what they have
+        user_ids = [str(member.id) for member in members]
+        removed = 0
+        short = 0
+        with self.transactions.begin() as txn:
+            for user_id in user_ids:
+                taken = min(amount, max(txn.balance(user_id), 0))
+                if taken < amount:
+                    short += 1
+                if taken:
+                    txn.debit(user_id, taken)
+                    removed += taken
+
+        embed = discord.Embed(
+            title="💸 Money Removed",
+            description=f"Successfully removed up to ${amount:,} from {len(members):,} members",
+            color=discord.Color.red()
+        )
+        embed.add_field(name="Total", value=f"${removed:,}", inline=True)
+        embed.add_field(name="Short of the Amount", value=f"{short:,}", inline=True)
+        embed.set_footer(text=f"Removed by {ctx.author.name}")
+        await ctx.send(embed=embed)
+
+    @bulkgivemoney.error
+    @bulkremovemoney.error
+    async def bulk_money_error(self, ctx, error):
+        if isinstance(error, commands.MissingPermissions):
+            await ctx.send("❌ You don't have permission to use this command!")
+        elif isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send(f"❌ Usage: !{ctx.command.name} <amount> [@role|@member ...] [since:YYYY-MM-DD]")
+        elif isinstance(error, commands.BadArgument):
+            await ctx.send(f"❌ {error}")
+
+    @commands.command(name='storagestats', help='[Admin] Show economy persistence stats')
+    @commands.has_permissions(administrator=True)
+    async def storagestats(self, ctx):
+        """Show write-behind flush statistics"""
+        stats = self.persistence.stats
+        embed = discord.Embed(title="💾 Economy Storage", color=discord.Color.blue())
+        embed.add_field(name="Flushes", value=f"{stats['flushes']:,}", inline=True)
+        embed.add_field(name="Pending Writes", value=f"{self.persistence.pending:,}", inline=True)
+        embed.add_field(name="Errors", value=f"{stats['errors']:,}", inline=True)
+        embed.add_field(name="Writes Requested", value=f"{stats['writes_requested']:,}", inline=True)
+        embed.add_field(name="Writes Coalesced", value=f"{stats['writes_coalesced']:,}", inline=True)
+        embed.add_field(name="Load Time", value=f"{self.load_time_ms:.1f}ms", inline=True)
+        embed.add_field(
+            name="Flush Latency",
+            value=f"Last: {stats['last_flush_ms']:.1f}ms\nWorst: {stats['max_flush_ms']:.1f}ms",
+            inline=True
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name='interest', help='[Admin] Show the last interest and wealth tax run')
+    @commands.has_permissions(administrator=True)
+    async def interest(self, ctx):
+        """Show statistics for the last interest run"""
+        result = self.last_interest
+        embed = discord.Embed(title="🏦 Interest & Wealth Tax", color=discord.Color.gold())
+        embed.add_field(
+            name="Rates",
+            value=f"Interest: {self.interest_rate * 100:g}% of bank\n"
+                  f"Tax: {self.wealth_tax_rate * 100:g}% of wallet above ${self.wealth_tax_threshold:,}",
+            inline=False
+        )
+        if result is None:
+            embed.add_field(name="Last Run", value="No run yet", inline=False)
+        else:
+            embed.add_field(name="Accounts Touched", value=f"{result.touched:,} of {result.accounts:,}", inline=True)
+            embed.add_field(name="Money Created", value=f"${result.created:,}", inline=True)
+            embed.add_field(name="Money Destroyed", value=f"${result.destroyed:,}", inline=True)
+            embed.add_field(
+                name="Runtime",
+                value=f"Compute: {result.compute_ms:.1f}ms\nApply: {result.apply_ms:.1f}ms",
+                inline=True
+            )
+        await ctx.send(embed=embed)
+
     @commands.command(name='bankrob')
-    @commands.cooldown(1, 3600, commands.BucketType.guild)  # Once per hour per server
     async def bankrob(self, ctx, target: discord.Member):
         """Start a bank robbery (requires 5 people)"""
+        remaining = self.cooldowns.remaining('bankrob', ctx.guild.id)
+        if remaining > 0:
+            await ctx.send(f"❌ A bank robbery was recently attempted! Try again in {int(remaining / 60)} minutes!")
+            return
+
         if ctx.author == target:
             await ctx.send("❌ You can't rob yourself!")
             return
 
         target_id = str(target.id)
-        if target_id not in self.bank or self.bank[target_id]["bank"] < 1000:
+        if target_id not in self.bank or self.bank[target_id]["bank"] < rules.HEIST_MIN_TARGET_BANK:
             await ctx.send("❌ This user doesn't have enough money in their bank to rob!")
             return
 
@@ -707,89 +1655,173 @@ class Economy(commands.Cog):
         embed.add_field(name="Join Cost", value="$1,000")
         embed.add_field(name="Time Limit", value="30 minutes", inline=False)
         
-        heist_message = await ctx.send(embed=embed)
-        await heist_message.add_reaction("💰")
-
-        # Wait for reactions
-        joined_users = set()
-        joined_users.add(ctx.author.id)  # Add the initiator
-
-        def check(reaction, user):
-            if user.bot or user == target or user.id in joined_users:
-                return False
-            return str(reaction.emoji) == "💰" and reaction.message.id == heist_message.id
-
+        # Reserved before the first await, so a second !bankrob arriving while
+        # this one is sending sees the cooldown
+        guild_id = str(ctx.guild.id)
+        self.trigger_heist_cooldown(guild_id, time.time() + rules.HEIST_COOLDOWN)
+        try:
+            heist_message = await ctx.send(embed=embed)
+        except discord.HTTPException:
+            self.clear_heist_cooldown(guild_id)  # No heist was announced
+            raise
+
+        # The heist lives on as a persisted record; reactions and the deadline
+        # drive it from here, so it survives a restart
+        message_id = str(heist_message.id)
+        self.heists[message_id] = HeistRecord(
+            guild_id=ctx.guild.id,
+            channel_id=ctx.channel.id,
+            target_id=target_id,
+            crew=[str(ctx.author.id)],  # The initiator
+            state=HeistRecord.GATHERING,
+            expires_at=time.time() + rules.HEIST_GATHER_SECONDS
+        )
+        self.save_heists(message_id)
+        self.track_heist(message_id)
         try:
-            while len(joined_users) < 5:
-                reaction, user = await self.bot.wait_for('reaction_add', timeout=1800.0, check=check)  # 30 minutes timeout
-                user_id = str(user.id)
-                
-                # Check if user has enough money to join
-                if user_id not in self.bank or self.bank[user_id]["wallet"] < 1000:
-                    await ctx.send(f"{user.mention} doesn't have enough money to join the heist!")
-                    continue
+            await heist_message.add_reaction("💰")
+        except discord.HTTPException as e:
+            print(f"Couldn't add the heist reaction: {e}")  # Members can still react themselves
+
+    def trigger_heist_cooldown(self, guild_id, until):
+        """Start a guild's bankrob cooldown, persisted as a wall-clock expiry"""
+        remaining = until - time.time()
+        if remaining <= 0:
+            if self.heist_cooldowns.pop(guild_id, None) is not None:
+                self.persistence.mark_dirty('heist_cooldowns', guild_id)
+            return
+        self.cooldowns.trigger('bankrob', int(guild_id), ttl=remaining)
+        if self.heist_cooldowns.get(guild_id) != until:
+            self.heist_cooldowns[guild_id] = until
+            self.persistence.mark_dirty('heist_cooldowns', guild_id)
+
+    def clear_heist_cooldown(self, guild_id):
+        """End a guild's bankrob cooldown early"""
+        self.cooldowns.reset('bankrob', int(guild_id))
+        if self.heist_cooldowns.pop(guild_id, None) is not None:
+            self.persistence.mark_dirty('heist_cooldowns', guild_id)
+
+    def resume_heists(self):
+        """Re-arm persisted heists and cooldowns after a restart; overdue ones fire at once"""
+        for guild_id, until in list(self.heist_cooldowns.items()):
+            self.trigger_heist_cooldown(guild_id, until)
+        for message_id in list(self.heists):
+            self.track_heist(message_id)
+
+    def track_heist(self, message_id):
+        heist = self.heists[message_id]
+        if heist.state == HeistRecord.GATHERING:
+            self.reactions.register(int(message_id), self.on_heist_reaction)
+        self.timers.schedule(('heist', message_id), heist.expires_at, lambda: self.advance_heist(message_id))
+
+    def untrack_heist(self, message_id):
+        self.reactions.unregister(int(message_id))
+        self.timers.cancel(('heist', message_id))
+
+    def end_heist(self, message_id):
+        self.untrack_heist(message_id)
+        del self.heists[message_id]
+        self.save_heists(message_id)
+
+    async def heist_channel(self, heist):
+        await self.bot.wait_until_ready()
+        return self.bot.get_channel(heist.channel_id)
+
+    async def on_heist_reaction(self, payload):
+        """A reaction on a gathering heist's message: add the user to the crew"""
+        message_id = str(payload.message_id)
+        heist = self.heists.get(message_id)
+        if heist is None or heist.state != HeistRecord.GATHERING or str(payload.emoji) != "💰":
+            return
+        user_id = str(payload.user_id)
+        if (payload.member is not None and payload.member.bot) or user_id == heist.target_id or user_id in heist.crew:
+            return
 
-                joined_users.add(user.id)
-                await ctx.send(f"{user.mention} joined the heist! ({len(joined_users)}/5 people)")
+        # Check if user has enough money to join
+        if user_id not in self.bank or self.bank[user_id]["wallet"] < rules.HEIST_JOIN_COST:
+            channel = await self.heist_channel(heist)
+            if channel is not None:
+                await channel.send(f"<@{user_id}> doesn't have enough money to join the heist!")
+            return
 
-        except asyncio.TimeoutError:
-            await ctx.send("❌ Not enough people joined the heist in time! The heist has been cancelled.")
+        # The crew is updated before any await, so simultaneous reactions can't overfill it
+        heist.crew.append(user_id)
+        full = len(heist.crew) >= rules.HEIST_CREW_SIZE
+        if full:
+            heist.state = HeistRecord.STARTING
+            heist.expires_at = time.time() + rules.HEIST_START_DELAY
+            self.untrack_heist(message_id)
+            self.track_heist(message_id)
+        self.save_heists(message_id)
+
+        channel = await self.heist_channel(heist)
+        if channel is not None:
+            await channel.send(f"<@{user_id}> joined the heist! ({len(heist.crew)}/5 people)")
+            if full:
+                await channel.send("🏃‍♂️ The heist is starting...")
+
+    async def advance_heist(self, message_id):
+        """A heist's deadline: call it off if the crew is short, otherwise settle it"""
+        heist = self.heists.get(message_id)
+        if heist is None:
             return
+        if heist.state == HeistRecord.GATHERING:
+            self.end_heist(message_id)
+            channel = await self.heist_channel(heist)
+            if channel is not None:
+                await channel.send("❌ Not enough people joined the heist in time! The heist has been cancelled.")
+            return
+        await self.settle_heist(message_id, heist)
 
-        # Start the heist
-        await ctx.send("🏃‍♂️ The heist is starting...")
-        await asyncio.sleep(3)
+    async def settle_heist(self, message_id, heist):
+        target_id = heist.target_id
+        crew = list(heist.crew)
 
-        # Calculate success (50% chance)
-        success = random.random() < 0.5
+        # Settle every leg at once. Join costs are checked now, not when people
+        # joined, since wallets may have changed while the crew gathered.
+        try:
+            with self.transactions.begin() as txn:
+                if any(txn.balance(user_id) < rules.HEIST_JOIN_COST for user_id in crew):
+                    raise TransactionError("crew member can't cover the join cost")
+                for user_id in crew:
+                    txn.debit(user_id, rules.HEIST_JOIN_COST)  # Deduct join cost
+
+                # 50% chance of success; loot is 20-40% of target's bank
+                success, total_loot, share = rules.heist_outcome(txn.balance(target_id, 'bank'), len(crew))
+                if success:
+                    # Remove money from target and give it to participants
+                    txn.debit(target_id, total_loot, 'bank')
+                    for user_id in crew:
+                        txn.credit(user_id, share)
+        except TransactionError:
+            self.end_heist(message_id)
+            channel = await self.heist_channel(heist)
+            if channel is not None:
+                await channel.send("❌ Someone in the crew can no longer cover the $1,000 join cost! The heist has been called off.")
+            return
+        self.end_heist(message_id)
 
+        channel = await self.heist_channel(heist)
+        if channel is None:
+            return
         if success:
-            # Calculate loot (20-40% of target's bank)
-            loot_percentage = random.uniform(0.2, 0.4)
-            total_loot = int(self.bank[target_id]["bank"] * loot_percentage)
-            share = total_loot // len(joined_users)
-
-            # Remove money from target
-            self.bank[target_id]["bank"] -= total_loot
-
-            # Give money to participants
-            for user_id in joined_users:
-                user_id = str(user_id)
-                self.bank[user_id]["wallet"] += share
-                self.bank[user_id]["wallet"] -= 1000  # Deduct join cost
-
-            self.save_bank()
-
             # Success embed
             success_embed = discord.Embed(
                 title="🎉 Heist Successful!",
-                description=f"The crew successfully robbed ${total_loot:,} from {target.mention}'s bank!\n"
+                description=f"The crew successfully robbed ${total_loot:,} from <@{target_id}>'s bank!\n"
                            f"Each participant got ${share:,}!",
                 color=discord.Color.green()
             )
-            await ctx.send(embed=success_embed)
+            await channel.send(embed=success_embed)
 
         else:
-            # Deduct join cost from participants
-            for user_id in joined_users:
-                user_id = str(user_id)
-                self.bank[user_id]["wallet"] -= 1000
-
-            self.save_bank()
-
             # Failure embed
             fail_embed = discord.Embed(
                 title="❌ Heist Failed!",
                 description="The police caught the crew! Everyone lost their $1,000 join cost!",
                 color=discord.Color.red()
             )
-            await ctx.send(embed=fail_embed)
-
-    @bankrob.error
-    async def bankrob_error(self, ctx, error):
-        if isinstance(error, commands.CommandOnCooldown):
-            minutes = int(error.retry_after / 60)
-            await ctx.send(f"❌ A bank robbery was recently attempted! Try again in {minutes} minutes!")
+            await channel.send(embed=fail_embed)
 
 async def setup(bot):
     """Setup function for the economy cog"""
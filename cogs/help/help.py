@@ -58,16 +58,32 @@ class HelpCog(commands.Cog):
         
         # Economy Commands
         economy_commands = """
-        **Basic Commands:**
         `!balance` - Check your wallet and bank balance
+        `!baltop [page]` - View the richest users
         `!work <job>` - Work at a specific job
         `!deposit <amount>` - Deposit money into your bank
         `!withdraw <amount>` - Withdraw money from your bank
         `!gamble <amount>` - Gamble your money
+        `!market buy/sell <item> <qty> <price>` - Trade job items with other players
+        `!market depth <item>` / `!market orders` / `!market cancel <id>` - Order book, your orders, cancel
         `!stats` - View your levels and progress
         `!bankrob` - Rob someones bank. Requires 5 people.
-        
+        `!tournament [open|join|bet|start|bracket]` - Pet tournaments with side bets
+        `!lottery [buy <tickets>|history|verify <round>]` - Lottery drawn in proportion to tickets held
+        `!stocks [buy|sell <symbol> <shares>|chart <symbol> [1m|1h]]` - Trade simulated stocks
+        `!portfolio [@member]` / `!stocktop [page]` - Stock holdings and the top portfolios
+        """
+        embed.add_field(name="💰 Economy", value=economy_commands, inline=False)
 
+        # Split across fields: an embed field holds at most 1024 characters
+        economy_admin_commands = """
+        `!givemoney @member <amount>` / `!removemoney @member <amount>` - Adjust one wallet (Admin)
+        `!bulkgivemoney <amount> [@role|@member ...] [since:YYYY-MM-DD]` - Give money to many members (Admin)
+        `!bulkremovemoney <amount> [@role|@member ...] [since:YYYY-MM-DD]` - Take money from many members (Admin)
+        """
+        embed.add_field(name="💰 Economy Admin", value=economy_admin_commands, inline=False)
+
+        economy_systems = """
         **Jobs System:**
         • All jobs start at $200-500 base salary
         • Level up every 15 jobs
@@ -80,14 +96,19 @@ class HelpCog(commands.Cog):
         • Each level increases win chance by 1%
         • Maximum win chance: 60% (Level 80)
         """
-        embed.add_field(name="💰 Economy", value=economy_commands, inline=False)
+        embed.add_field(name="💰 Jobs & Gambling", value=economy_systems, inline=False)
 
         # Leveling Commands
         leveling_commands = """
         `!rank` - Check your rank
         `!leaderboard` - View leaderboard
         `!givexp` - Give XP (Admin)
+        `!bulkgivexp <amount> [@role|@member ...] [since:YYYY-MM-DD]` - Give XP to many members (Admin)
         `!resetxp` - Reset XP (Admin)
+        `!levelrole [add <level> @role|remove <level>|stack on|off]` - Roles granted at levels (Admin)
+        `!syncroles` - Give existing members their level roles (Admin)
+        `!xpmultiplier [channel #channel <x>|role @role <x>|boost <x> <minutes>|boost off]` - XP multipliers (Admin)
+        • Chatting and time in voice (unmuted, not AFK) both earn XP
         """
         embed.add_field(name="⭐ Leveling", value=leveling_commands, inline=False)
         
@@ -165,6 +186,8 @@ class HelpCog(commands.Cog):
         market = """
         `!market` - View available items
         `!market sell <item>` - Sell items for money
+        `!market buy/sell <item> <qty> <price>` - Trade job items with other players
+        `!market depth <item>` / `!market orders` / `!market cancel <id>` - Order book, your orders, cancel
         • Items are obtained from jobs (10% chance)
         • Sell prices range from $100-500
         """
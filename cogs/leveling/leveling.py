@@ -1,40 +1,214 @@
 import discord
 from discord.ext import commands
 import json
+import logging
 import random
 import asyncio
-import datetime
-from typing import Dict, Optional
+import time
+from typing import Dict, Optional, Set, Union
 import os
+from utils.cooldowns import get_cooldown_store
+from utils.level_curve import LevelCurve
+from utils.level_roles import RewardTable, RoleEditQueue
+from utils.persistence import LazyShardedStore, ShardedJSONBackend, WriteBehind, atomic_write_json
+from utils.ranking import RankIndex
+from utils.records import LevelRecord, RecordTable
+from utils.targets import ActiveSince, resolve_targets
+from utils.voice_xp import VoiceSessions, voice_eligible
+from utils.xp_filter import MessageFilter
+from utils.xp_multipliers import MAX_MULTIPLIER, XPMultipliers, parse_multiplier
+
+logger = logging.getLogger(__name__)
 
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.levels_file = 'levels.json'
-        self.levels: Dict[str, Dict[str, int]] = self.load_levels()
-        self.xp_cooldown = {}
+        self.levels_file = 'levels.json'  # Legacy single-file store, split into shards on first run
+        self.levels_dir = 'levels'
+        # One file per guild; only guilds that changed are rewritten, in batches
+        self.persistence = WriteBehind(
+            ShardedJSONBackend(self.levels_dir, legacy_file=self.levels_file),
+            interval=float(os.getenv('LEVELING_FLUSH_INTERVAL', 10)),
+            max_dirty=int(os.getenv('LEVELING_FLUSH_THRESHOLD', 500)),
+            name='leveling'
+        )
+        self.rank_indexes: Dict[str, RankIndex] = {}  # Built per guild on first use
+        self.levels = self.load_levels()
+        self.eviction_task = None
         self.xp_rate = 15  # XP gained per message
         self.cooldown_time = 60  # Cooldown in seconds
+        self.xp_cooldown = get_cooldown_store(bot)
+        self.xp_cooldown.configure('xp', self.cooldown_time)
+        self.curve = LevelCurve()  # Precomputed cumulative XP thresholds
+        # Repeated or low-effort messages earn nothing, even off cooldown
+        self.message_filter = MessageFilter(
+            window=int(os.getenv('LEVELING_FINGERPRINT_WINDOW', 20)),
+            max_users=int(os.getenv('LEVELING_FINGERPRINT_USERS', 10000)),
+            min_length=int(os.getenv('LEVELING_MIN_MESSAGE_LENGTH', 5)),
+            min_entropy=float(os.getenv('LEVELING_MIN_MESSAGE_ENTROPY', 2.0)),
+            entropy_ratio=float(os.getenv('LEVELING_MESSAGE_ENTROPY_RATIO', 0.75))
+        )
+
+        # Voice XP accrues per eligible minute; sessions are opened and closed
+        # by voice state updates and credited in bulk by a periodic sweep
+        self.voice_xp_rate = float(os.getenv('LEVELING_VOICE_XP_PER_MINUTE', 5))
+        self.voice_sweep_interval = float(os.getenv('LEVELING_VOICE_SWEEP_INTERVAL', 300))
+        self.voice_sessions = VoiceSessions(seconds_per_point=60 / self.voice_xp_rate)
+        self.voice_task = None
+
+        # Roles granted at configured levels, as a sorted threshold table per guild
+        self.level_roles_file = 'level_roles.json'
+        self.level_roles = self.load_level_roles()
+        self.reward_tables: Dict[str, RewardTable] = {
+            guild_id: RewardTable.from_config(config) for guild_id, config in self.level_roles.items()
+        }
+        self.role_queue = RoleEditQueue(bot, edits_per_minute=float(os.getenv('LEVELING_ROLE_EDITS_PER_MINUTE', 40)))
+
+        # Channel, role and boost multipliers, compiled per guild whenever the config changes
+        self.xp_multipliers_file = 'xp_multipliers.json'
+        self.xp_multipliers = self.load_xp_multipliers()
+        self.compiled_multipliers: Dict[str, XPMultipliers] = {
+            guild_id: XPMultipliers(config) for guild_id, config in self.xp_multipliers.items()
+        }
+
+    async def cog_load(self):
+        self.persistence.start()
+        # The biggest guilds would otherwise be read on the event loop by their first message
+        await self.levels.preload(int(os.getenv('LEVELING_PRELOAD_GUILDS', 50)))
+        self.voice_task = asyncio.create_task(self.voice_sweep_loop())
+        self.eviction_task = asyncio.create_task(self.eviction_loop())
+
+    async def cog_unload(self):
+        for task in (self.voice_task, self.eviction_task):
+            if task is not None:
+                task.cancel()
+        # Credit time in voice so far; sessions are reopened from voice states on the next ready
+        await self.credit_voice(self.voice_sessions.sweep(time.time()))
+        self.role_queue.stop()  # Anything still queued is picked up by the next !syncroles
+        await self.persistence.stop()
+
+    def load_levels(self) -> LazyShardedStore:
+        # Guild tables (including ones assigned later as plain dicts) hold slotted LevelRecords.
+        # Each guild's shard is read when the guild is first touched and dropped again
+        # (after any pending write) once idle or when too many guilds are loaded.
+        return LazyShardedStore(
+            self.persistence, 'levels', convert=self.new_guild_table,
+            max_loaded=int(os.getenv('LEVELING_MAX_LOADED_GUILDS', 500)),
+            idle_seconds=float(os.getenv('LEVELING_GUILD_IDLE_SECONDS', 1800)),
+            on_evict=self.guild_evicted
+        )
+
+    def guild_evicted(self, guild_id: str):
+        """Drop what was built for a guild whose levels were unloaded"""
+        self.rank_indexes.pop(guild_id, None)
+        multipliers = self.compiled_multipliers.get(guild_id)
+        if multipliers is not None:
+            multipliers.clear_members()
+
+    def load_level_roles(self) -> Dict[str, dict]:
+        try:
+            with open(self.level_roles_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_level_roles(self, guild_id: str):
+        """Write the reward config (rarely changed, so written straight away) and rebuild the guild's table"""
+        atomic_write_json(self.level_roles_file, self.level_roles)
+        config = self.level_roles.get(guild_id)
+        if config and config.get('rewards'):
+            self.reward_tables[guild_id] = RewardTable.from_config(config)
+        else:
+            self.reward_tables.pop(guild_id, None)
+
+    def queue_reward_roles(self, guild_id: str, user_id: str, old_level: int, new_level: int):
+        """Queue role changes if a level change crossed one of the guild's reward levels"""
+        table = self.reward_tables.get(guild_id)
+        if not table or not table.crossed(old_level, new_level):
+            return
+        add, remove = table.changes(new_level)
+        self.role_queue.enqueue(int(guild_id), int(user_id), add, remove)
 
-    def load_levels(self) -> Dict[str, Dict[str, int]]:
-        if os.path.exists(self.levels_file):
-            with open(self.levels_file, 'r') as f:
+    def load_xp_multipliers(self) -> Dict[str, dict]:
+        try:
+            with open(self.xp_multipliers_file, 'r') as f:
                 return json.load(f)
-        return {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_xp_multipliers(self, guild_id: str):
+        """Write the multiplier config and recompile the guild's lookup"""
+        atomic_write_json(self.xp_multipliers_file, self.xp_multipliers)
+        config = self.xp_multipliers.get(guild_id)
+        if config and (config.get('channels') or config.get('roles') or config.get('boost')):
+            self.compiled_multipliers[guild_id] = XPMultipliers(config)
+        else:
+            self.compiled_multipliers.pop(guild_id, None)
+
+    @staticmethod
+    def new_guild_table(members: dict) -> RecordTable:
+        table = RecordTable(LevelRecord.from_dict)
+        table.update(members)  # Converted as the guild loads, so no member stays a raw dict
+        return table
 
-    def save_levels(self):
-        with open(self.levels_file, 'w') as f:
-            json.dump(self.levels, f, indent=4)
+    def save_levels(self, *guild_ids: str):
+        # Marks guilds dirty; the background task writes their shards
+        self.persistence.mark_dirty('levels', *guild_ids)
 
     def get_level_xp(self, level: int) -> int:
-        return 5 * (level ** 2) + 50 * level + 100
+        return self.curve.level_xp(level)
+
+    def get_total_xp(self, level: int) -> int:
+        return self.curve.xp_for_level(level)
 
     def get_level_from_xp(self, xp: int) -> int:
-        level = 0
-        while xp >= self.get_level_xp(level):
-            xp -= self.get_level_xp(level)
-            level += 1
-        return level
+        return self.curve.level_from_xp(xp)
+
+    def get_rank_index(self, guild_id: str) -> RankIndex:
+        # Sorted once per guild, then kept up to date by update_rank
+        index = self.rank_indexes.get(guild_id)
+        if index is None:
+            members = self.levels.get(guild_id, {})
+            index = RankIndex((user_id, data["xp"]) for user_id, data in members.items())
+            self.rank_indexes[guild_id] = index
+        return index
+
+    def update_rank(self, guild_id: str, user_id: str):
+        index = self.rank_indexes.get(guild_id)
+        if index is not None:
+            index.update(user_id, self.levels[guild_id][user_id]["xp"])
+
+    def active_since(self, guild_id: str, since: int) -> Set[str]:
+        """Members of a guild who gained XP at or after the unix time ``since``"""
+        members = self.levels.get(guild_id, {})
+        return {user_id for user_id, data in members.items() if data.get("last_active", 0) >= since}
+
+    def award_xp(self, guild_id: str, user_id: str, amount: int) -> Optional[int]:
+        """Add XP to a member; returns their new level if they levelled up."""
+        if guild_id not in self.levels:
+            self.levels[guild_id] = {}
+        if user_id not in self.levels[guild_id]:
+            self.levels[guild_id][user_id] = {"xp": 0, "level": 0, "messages": 0}
+
+        data = self.levels[guild_id][user_id]
+        data["xp"] += amount
+        data["last_active"] = int(time.time())
+        self.update_rank(guild_id, user_id)
+
+        new_level = self.get_level_from_xp(data["xp"])
+        if new_level > data["level"]:
+            self.queue_reward_roles(guild_id, user_id, data["level"], new_level)
+            data["level"] = new_level
+            return new_level
+        return None
+
+    async def announce_level_up(self, channel, mention: str, level: int):
+        embed = discord.Embed(
+            title="🎉 Level Up!",
+            description=f"{mention} has reached level {level}!",
+            color=discord.Color.green()
+        )
+        await channel.send(embed=embed)
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -42,41 +216,111 @@ class Leveling(commands.Cog):
             return
 
         # Check cooldown
-        user_id = str(message.author.id)
+        if self.xp_cooldown.remaining('xp', message.author.id):
+            return
+
         guild_id = str(message.guild.id)
-        current_time = datetime.datetime.now().timestamp()
+        amount = self.xp_rate
+        multipliers = self.compiled_multipliers.get(guild_id)
+        if multipliers is not None:
+            amount = round(amount * multipliers.for_message(message.channel, message.author, time.time()))
+            if not amount:
+                return  # e.g. a 0x spam channel
+
+        # Filtered messages don't start the cooldown, so the next real message still counts
+        if self.message_filter.check(message.author.id, message.content):
+            return
 
-        if user_id in self.xp_cooldown:
-            if current_time - self.xp_cooldown[user_id] < self.cooldown_time:
-                return
+        self.xp_cooldown.trigger('xp', message.author.id)
+        user_id = str(message.author.id)
 
-        self.xp_cooldown[user_id] = current_time
+        # Add XP and check for level up
+        new_level = self.award_xp(guild_id, user_id, amount)
+        self.levels[guild_id][user_id]["messages"] += 1
+        self.save_levels(guild_id)
 
-        # Initialize user data if not exists
-        if guild_id not in self.levels:
-            self.levels[guild_id] = {}
-        if user_id not in self.levels[guild_id]:
-            self.levels[guild_id][user_id] = {"xp": 0, "level": 0, "messages": 0}
+        if new_level is not None:
+            await self.announce_level_up(message.channel, message.author.mention, new_level)
 
-        # Add XP
-        self.levels[guild_id][user_id]["xp"] += self.xp_rate
-        self.levels[guild_id][user_id]["messages"] += 1
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        multipliers = self.compiled_multipliers.get(str(after.guild.id))
+        if multipliers is not None and multipliers.roles and before.roles != after.roles:
+            multipliers.member_changed(after.id)
 
-        # Check for level up
-        current_xp = self.levels[guild_id][user_id]["xp"]
-        current_level = self.levels[guild_id][user_id]["level"]
-        new_level = self.get_level_from_xp(current_xp)
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        guild_id = str(role.guild.id)
+        config = self.xp_multipliers.get(guild_id)
+        if config and config.get('roles', {}).pop(str(role.id), None) is not None:
+            self.save_xp_multipliers(guild_id)
 
-        if new_level > current_level:
-            self.levels[guild_id][user_id]["level"] = new_level
-            embed = discord.Embed(
-                title="🎉 Level Up!",
-                description=f"{message.author.mention} has reached level {new_level}!",
-                color=discord.Color.green()
-            )
-            await message.channel.send(embed=embed)
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        if member.bot:
+            return
+        key = (str(member.guild.id), str(member.id))
+        now = time.time()
+        if voice_eligible(after, member.guild.afk_channel):
+            self.voice_sessions.open(key, after.channel.id, now)
+        elif key in self.voice_sessions:
+            await self.credit_voice([(key, self.voice_sessions.close(key, now))])
 
-        self.save_levels()
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Match open sessions to who is actually in voice, e.g. after a restart or reconnect"""
+        now = time.time()
+        present = set()
+        for guild in self.bot.guilds:
+            for channel in guild.voice_channels + guild.stage_channels:
+                for user_id, state in channel.voice_states.items():
+                    member = guild.get_member(user_id)
+                    if member is None or member.bot or not voice_eligible(state, guild.afk_channel):
+                        continue
+                    key = (str(guild.id), str(user_id))
+                    present.add(key)
+                    self.voice_sessions.open(key, channel.id, now)
+        gone = [key for key in self.voice_sessions.keys() if key not in present]
+        await self.credit_voice([(key, self.voice_sessions.close(key, now)) for key in gone])
+
+    async def eviction_loop(self):
+        # Guilds are also evicted after each flush; this catches idle ones when nothing is being written
+        while True:
+            await asyncio.sleep(60)
+            self.levels.evict()
+
+    async def voice_sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.voice_sweep_interval)
+            try:
+                await self.credit_voice(self.voice_sessions.sweep(time.time()))
+            except Exception:
+                logger.exception("Voice XP sweep failed")
+
+    async def credit_voice(self, credits):
+        """Award XP for credited voice time, saving each guild once, then announce level-ups"""
+        guild_ids = set()
+        level_ups = []
+        for (guild_id, user_id), (points, seconds, channel_id) in credits:
+            if not points:
+                continue
+            new_level = self.award_xp(guild_id, user_id, points)
+            self.levels[guild_id][user_id]["voice_seconds"] += int(seconds)
+            guild_ids.add(guild_id)
+            if new_level is not None:
+                level_ups.append((channel_id, user_id, new_level))
+        if guild_ids:
+            self.save_levels(*guild_ids)
+
+        # Voice channels have a text chat, so the announcement goes where the member was
+        for channel_id, user_id, new_level in level_ups:
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+            try:
+                await self.announce_level_up(channel, f"<@{user_id}>", new_level)
+            except discord.HTTPException:
+                pass
 
     @commands.command(name='rank')
     async def rank(self, ctx, member: Optional[discord.Member] = None):
@@ -93,9 +337,12 @@ class Leveling(commands.Cog):
         current_xp = user_data["xp"]
         current_level = user_data["level"]
         messages = user_data["messages"]
+        voice_minutes = user_data["voice_seconds"] // 60
+        index = self.get_rank_index(guild_id)
+        position = index.rank(user_id)
 
         # Calculate progress to next level
-        xp_for_current_level = sum(self.get_level_xp(i) for i in range(current_level))
+        xp_for_current_level = self.get_total_xp(current_level)
         xp_to_next_level = self.get_level_xp(current_level)
         current_level_xp = current_xp - xp_for_current_level
         progress = (current_level_xp / xp_to_next_level) * 100
@@ -110,35 +357,37 @@ class Leveling(commands.Cog):
         embed.add_field(name="Level", value=current_level, inline=True)
         embed.add_field(name="Total XP", value=current_xp, inline=True)
         embed.add_field(name="Messages", value=messages, inline=True)
+        embed.add_field(name="Voice Time", value=f"{voice_minutes // 60}h {voice_minutes % 60}m", inline=True)
+        embed.add_field(name="Rank", value=f"#{position:,} of {len(index):,}", inline=True)
         embed.add_field(name=f"Progress to Level {current_level + 1}", value=f"{bar} {progress:.1f}%", inline=False)
 
         await ctx.send(embed=embed)
 
     @commands.command(name='leaderboard', aliases=['lb'])
-    async def leaderboard(self, ctx):
+    async def leaderboard(self, ctx, page: int = 1):
         """Show the server's XP leaderboard"""
         guild_id = str(ctx.guild.id)
-        if guild_id not in self.levels:
+        if guild_id not in self.levels or not self.levels[guild_id]:
             await ctx.send("No one has earned XP yet!")
             return
 
-        # Sort users by XP
-        sorted_users = sorted(
-            self.levels[guild_id].items(),
-            key=lambda x: (x[1]["level"], x[1]["xp"]),
-            reverse=True
-        )
+        index = self.get_rank_index(guild_id)
+        per_page = 10
+        total_pages = (len(index) + per_page - 1) // per_page
+        page = max(1, min(page, total_pages))
 
         embed = discord.Embed(title=f"🏆 {ctx.guild.name} Leaderboard", color=discord.Color.gold())
-        
-        # Add top 10 users to embed
-        for i, (user_id, data) in enumerate(sorted_users[:10], 1):
+
+        # Add this page's users to embed
+        start = (page - 1) * per_page
+        for i, (user_id, _) in enumerate(index.page(start, per_page), start + 1):
+            data = self.levels[guild_id][user_id]
             member = ctx.guild.get_member(int(user_id))
-            if member:
-                name = member.name
-                value = f"Level: {data['level']} | XP: {data['xp']} | Messages: {data['messages']}"
-                embed.add_field(name=f"{i}. {name}", value=value, inline=False)
+            name = member.name if member else f"Unknown ({user_id})"
+            value = f"Level: {data['level']} | XP: {data['xp']} | Messages: {data['messages']}"
+            embed.add_field(name=f"{i}. {name}", value=value, inline=False)
 
+        embed.set_footer(text=f"Page {page}/{total_pages}")
         await ctx.send(embed=embed)
 
     @commands.command(name='givexp')
@@ -159,11 +408,208 @@ class Leveling(commands.Cog):
 
         self.levels[guild_id][user_id]["xp"] += amount
         new_level = self.get_level_from_xp(self.levels[guild_id][user_id]["xp"])
+        self.queue_reward_roles(guild_id, user_id, self.levels[guild_id][user_id]["level"], new_level)
         self.levels[guild_id][user_id]["level"] = new_level
-        self.save_levels()
+        self.update_rank(guild_id, user_id)
+        self.save_levels(guild_id)
 
         await ctx.send(f"Gave {amount} XP to {member.name}!")
 
+    @commands.command(name='bulkgivexp')
+    @commands.has_permissions(administrator=True)
+    async def bulk_give_xp(self, ctx, amount: int, targets: commands.Greedy[Union[discord.Member, discord.Role]],
+                           since: Optional[ActiveSince] = None):
+        """Give XP to roles, members or everyone active since a date (Admin only)"""
+        if amount <= 0:
+            await ctx.send("Amount must be positive!")
+            return
+        if not targets and since is None:
+            await ctx.send("Usage: !bulkgivexp <amount> [@role|@member ...] [since:YYYY-MM-DD]")
+            return
+
+        guild_id = str(ctx.guild.id)
+        active_ids = self.active_since(guild_id, since) if since is not None else None
+        members = resolve_targets(ctx.guild, targets, active_ids)
+        if not members:
+            await ctx.send("No members matched!")
+            return
+
+        if guild_id not in self.levels:
+            self.levels[guild_id] = {}
+        guild_levels = self.levels[guild_id]
+        level_ups = 0
+        for member in members:
+            user_id = str(member.id)
+            if user_id not in guild_levels:
+                guild_levels[user_id] = {"xp": 0, "level": 0, "messages": 0}
+            data = guild_levels[user_id]
+            data["xp"] += amount
+            new_level = self.get_level_from_xp(data["xp"])
+            if new_level > data["level"]:
+                level_ups += 1
+                self.queue_reward_roles(guild_id, user_id, data["level"], new_level)
+            data["level"] = new_level
+            self.update_rank(guild_id, user_id)
+        self.save_levels(guild_id)
+
+        embed = discord.Embed(title="⭐ XP Given", color=discord.Color.green())
+        embed.add_field(name="Members", value=f"{len(members):,}", inline=True)
+        embed.add_field(name="XP Each", value=f"{amount:,}", inline=True)
+        embed.add_field(name="Level Ups", value=f"{level_ups:,}", inline=True)
+        embed.set_footer(text=f"Given by {ctx.author.name}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='levelrole')
+    @commands.has_permissions(administrator=True)
+    async def level_role(self, ctx, action: str = 'list', arg: Optional[str] = None, role: Optional[discord.Role] = None):
+        """Configure roles granted at levels: levelrole [add <level> @role | remove <level> | stack on|off | list] (Admin only)"""
+        guild_id = str(ctx.guild.id)
+        config = self.level_roles.get(guild_id, {"rewards": {}, "stack": True})
+        action = action.lower()
+        level = int(arg) if arg and arg.isdigit() else None
+
+        if action == 'add':
+            if level is None or level <= 0 or role is None:
+                await ctx.send("Usage: !levelrole add <level> @role")
+                return
+            if role.managed or role.is_default() or role >= ctx.guild.me.top_role:
+                await ctx.send("I can't assign that role! It must be below my highest role and not managed by an integration.")
+                return
+            config["rewards"][str(level)] = role.id
+            self.level_roles[guild_id] = config
+            self.save_level_roles(guild_id)
+            await ctx.send(f"Members reaching level {level} will get {role.name}. Run `!syncroles` to apply it to existing members.")
+        elif action == 'remove':
+            if config["rewards"].pop(str(level), None) is None:
+                await ctx.send("There's no role reward at that level!")
+                return
+            self.save_level_roles(guild_id)
+            await ctx.send(f"Removed the level {level} role reward. Members keep roles they already have.")
+        elif action == 'stack':
+            setting = (arg or '').lower()
+            if setting not in ('on', 'off'):
+                await ctx.send("Usage: !levelrole stack on|off")
+                return
+            config["stack"] = setting == 'on'
+            self.level_roles[guild_id] = config
+            self.save_level_roles(guild_id)
+            if config["stack"]:
+                await ctx.send("Members will keep every reward role up to their level.")
+            else:
+                await ctx.send("Members will only keep their highest reward role; lower tiers are removed.")
+        else:
+            table = self.reward_tables.get(guild_id)
+            if not table:
+                await ctx.send("No level roles are set up. Add one with `!levelrole add <level> @role`.")
+                return
+            lines = []
+            for reward_level, role_id in zip(table.levels, table.roles):
+                reward_role = ctx.guild.get_role(role_id)
+                lines.append(f"Level {reward_level}: {reward_role.mention if reward_role else f'Deleted role ({role_id})'}")
+            embed = discord.Embed(title="🏅 Level Roles", description="\n".join(lines), color=discord.Color.gold())
+            embed.set_footer(text="Roles stack" if table.stack else "Only the highest role is kept")
+            await ctx.send(embed=embed)
+
+    @commands.command(name='syncroles')
+    @commands.has_permissions(administrator=True)
+    async def sync_roles(self, ctx):
+        """Give every member the level roles they should have (Admin only)"""
+        guild_id = str(ctx.guild.id)
+        table = self.reward_tables.get(guild_id)
+        if not table:
+            await ctx.send("No level roles are set up. Add one with `!levelrole add <level> @role`.")
+            return
+
+        guild_levels = self.levels.get(guild_id, {})
+        members = ctx.guild.members
+        queued = 0
+        batch_size = 500
+        for start in range(0, len(members), batch_size):
+            for member in members[start:start + batch_size]:
+                if member.bot:
+                    continue
+                data = guild_levels.get(str(member.id))
+                add, remove = table.changes(data["level"] if data else 0)
+                current = {role.id for role in member.roles}
+                add, remove = add - current, remove & current
+                if add or remove:
+                    self.role_queue.enqueue(ctx.guild.id, member.id, add, remove)
+                    queued += 1
+            await asyncio.sleep(0)  # Let other events through between batches
+
+        if not queued:
+            await ctx.send("Everyone already has the right level roles!")
+            return
+        minutes = self.role_queue.eta(ctx.guild.id) / 60
+        await ctx.send(f"Queued role updates for {queued:,} members. "
+                       f"They're applied at a rate Discord allows, which will take about {minutes:.0f} minutes.")
+
+    @commands.command(name='xpmultiplier')
+    @commands.has_permissions(administrator=True)
+    async def xp_multiplier(self, ctx, action: str = 'list', target: Optional[str] = None, value: Optional[str] = None):
+        """Set XP multipliers: xpmultiplier [channel #channel <x> | role @role <x> | boost <x> <minutes> | boost off | list] (Admin only)"""
+        guild_id = str(ctx.guild.id)
+        config = self.xp_multipliers.get(guild_id, {"channels": {}, "roles": {}})
+        action = action.lower()
+
+        if action in ('channel', 'role'):
+            converter = commands.GuildChannelConverter() if action == 'channel' else commands.RoleConverter()
+            try:
+                found = await converter.convert(ctx, target or '')
+            except commands.BadArgument:
+                await ctx.send(f"Usage: !xpmultiplier {action} {'#channel' if action == 'channel' else '@role'} <multiplier>")
+                return
+            multiplier = parse_multiplier(value)
+            if multiplier is None:
+                await ctx.send(f"The multiplier must be a number from 0 to {MAX_MULTIPLIER:g}!")
+                return
+            entries = config.setdefault(action + 's', {})
+            if multiplier == 1:
+                entries.pop(str(found.id), None)
+            else:
+                entries[str(found.id)] = multiplier
+            self.xp_multipliers[guild_id] = config
+            self.save_xp_multipliers(guild_id)
+            if action == 'channel':
+                await ctx.send(f"Messages in {found.mention} now earn {multiplier:g}x XP.")
+            else:
+                await ctx.send(f"Members with {found.name} now earn {multiplier:g}x XP. "
+                               f"Members with several boosted roles get the largest multiplier.")
+        elif action == 'boost':
+            if (target or '').lower() == 'off':
+                if config.pop('boost', None) is None:
+                    await ctx.send("There's no XP boost running!")
+                    return
+                self.save_xp_multipliers(guild_id)
+                await ctx.send("Ended the XP boost.")
+                return
+            multiplier = parse_multiplier(target)
+            minutes = int(value) if value and value.isdigit() else 0
+            if multiplier is None or minutes <= 0:
+                await ctx.send(f"Usage: !xpmultiplier boost <multiplier up to {MAX_MULTIPLIER:g}> <minutes>")
+                return
+            config['boost'] = {"multiplier": multiplier, "ends": time.time() + minutes * 60}
+            self.xp_multipliers[guild_id] = config
+            self.save_xp_multipliers(guild_id)
+            await ctx.send(f"🚀 XP boost! Everyone earns {multiplier:g}x XP for the next {minutes} minutes!")
+        else:
+            multipliers = self.compiled_multipliers.get(guild_id)
+            if multipliers is None:
+                await ctx.send(f"No XP multipliers are set. Every message earns {self.xp_rate} XP.")
+                return
+            embed = discord.Embed(title="⚡ XP Multipliers", color=discord.Color.blue())
+            channels = [f"{getattr(ctx.guild.get_channel(channel_id), 'mention', f'Deleted channel ({channel_id})')}: {m:g}x"
+                        for channel_id, m in multipliers.channels.items()]
+            roles = [f"{getattr(ctx.guild.get_role(role_id), 'mention', f'Deleted role ({role_id})')}: {m:g}x"
+                     for role_id, m in multipliers.roles.items()]
+            embed.add_field(name="Channels", value="\n".join(channels) or "None", inline=False)
+            embed.add_field(name="Roles", value="\n".join(roles) or "None", inline=False)
+            if multipliers.boost_active(time.time()):
+                minutes = (multipliers.boost_ends - time.time()) / 60
+                embed.add_field(name="Boost", value=f"{multipliers.boost:g}x for {minutes:.0f} more minutes", inline=False)
+            embed.set_footer(text=f"Base rate: {self.xp_rate} XP per message")
+            await ctx.send(embed=embed)
+
     @commands.command(name='resetxp')
     @commands.has_permissions(administrator=True)
     async def reset_xp(self, ctx, member: Optional[discord.Member] = None):
@@ -174,13 +620,35 @@ class Leveling(commands.Cog):
             user_id = str(member.id)
             if guild_id in self.levels and user_id in self.levels[guild_id]:
                 self.levels[guild_id][user_id] = {"xp": 0, "level": 0, "messages": 0}
+                self.update_rank(guild_id, user_id)
                 await ctx.send(f"Reset XP for {member.name}")
         else:
             if guild_id in self.levels:
                 self.levels[guild_id] = {}
+                self.rank_indexes.pop(guild_id, None)
                 await ctx.send("Reset XP for the entire server")
 
-        self.save_levels()
+        self.save_levels(guild_id)
+
+    @commands.command(name='levelstats')
+    @commands.has_permissions(administrator=True)
+    async def level_stats(self, ctx):
+        """Show leveling persistence stats (Admin only)"""
+        stats = self.persistence.stats
+        per_flush = stats['writes_requested'] / stats['flushes'] if stats['flushes'] else 0
+        embed = discord.Embed(title="💾 Leveling Storage", color=discord.Color.blue())
+        embed.add_field(name="Flushes", value=f"{stats['flushes']:,}", inline=True)
+        embed.add_field(name="Pending Messages", value=f"{self.persistence.pending:,}", inline=True)
+        embed.add_field(name="Messages per Flush", value=f"Last: {stats['last_flush_writes']:,}\nAverage: {per_flush:.1f}", inline=True)
+        embed.add_field(name="Flush Time", value=f"Last: {stats['last_flush_ms']:.1f}ms\nWorst: {stats['max_flush_ms']:.1f}ms", inline=True)
+        embed.add_field(name="Errors", value=f"{stats['errors']:,}", inline=True)
+        cache = self.levels.stats
+        embed.add_field(name="Guilds Loaded", value=f"{len(self.levels):,} (max {self.levels.max_loaded:,})\n"
+                                                    f"Loads: {cache['loads']:,} | Evictions: {cache['evictions']:,}", inline=True)
+        filtered = self.message_filter.stats
+        embed.add_field(name="Messages Filtered", value=f"Repeated: {filtered['repeated']:,}\n"
+                                                        f"Trivial: {filtered['trivial']:,}", inline=True)
+        await ctx.send(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(Leveling(bot))
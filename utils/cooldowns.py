@@ -0,0 +1,83 @@
+"""Cooldown tracking shared by cogs.
+
+Each bucket maps a key (usually a user id) to the monotonic time its cooldown
+ends, plus a min-heap of the same expiries. Every call pops a few expired
+entries off the heap, so memory stays proportional to the keys that are still
+cooling down instead of every user who ever triggered one.
+"""
+import heapq
+import time
+from typing import Dict, List, Tuple
+
+
+class _Bucket:
+    __slots__ = ('ttl', 'expires', 'heap')
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.expires: Dict = {}
+        self.heap: List[Tuple[float, object]] = []
+
+
+class CooldownStore:
+    """Named cooldown buckets with per-bucket TTLs and lazy expiry."""
+
+    def __init__(self, clock=time.monotonic, sweep_batch: int = 32):
+        self.clock = clock
+        self.sweep_batch = sweep_batch
+        self._buckets: Dict[str, _Bucket] = {}
+
+    def configure(self, bucket: str, ttl: float):
+        """Create ``bucket`` (or change its default TTL)."""
+        if bucket in self._buckets:
+            self._buckets[bucket].ttl = ttl
+        else:
+            self._buckets[bucket] = _Bucket(ttl)
+
+    def _sweep(self, bucket: _Bucket, now: float):
+        heap, expires = bucket.heap, bucket.expires
+        for _ in range(self.sweep_batch):
+            if not heap or heap[0][0] > now:
+                break
+            expiry, key = heapq.heappop(heap)
+            # Skip heap entries left behind when a key was re-triggered
+            if expires.get(key) == expiry:
+                del expires[key]
+        # Re-triggered keys leave stale heap entries behind; rebuild when they dominate
+        if len(heap) > 2 * len(expires) + 64:
+            bucket.heap = [(expiry, key) for key, expiry in expires.items()]
+            heapq.heapify(bucket.heap)
+
+    def remaining(self, bucket: str, key) -> float:
+        """Seconds until ``key`` may act again in ``bucket`` (0 when ready)."""
+        state = self._buckets[bucket]
+        now = self.clock()
+        self._sweep(state, now)
+        expiry = state.expires.get(key)
+        if expiry is None or expiry <= now:
+            return 0.0
+        return expiry - now
+
+    def trigger(self, bucket: str, key, ttl: float = None):
+        """Start ``key``'s cooldown, using the bucket's TTL unless ``ttl`` is given."""
+        state = self._buckets[bucket]
+        now = self.clock()
+        self._sweep(state, now)
+        expiry = now + (state.ttl if ttl is None else ttl)
+        state.expires[key] = expiry
+        heapq.heappush(state.heap, (expiry, key))
+
+    def reset(self, bucket: str, key):
+        self._buckets[bucket].expires.pop(key, None)
+
+    def __len__(self) -> int:
+        return sum(len(state.expires) for state in self._buckets.values())
+
+
+def get_cooldown_store(bot) -> CooldownStore:
+    """The bot-wide store, created on first use so every cog shares it."""
+    store = getattr(bot, 'cooldown_store', None)
+    if store is None:
+        store = CooldownStore()
+        bot.cooldown_store = store
+    return store
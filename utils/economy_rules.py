@@ -0,0 +1,109 @@
+"""Game rules for the Economy cog.
+
+Payout formulas, odds and constants live here rather than inline in the
+commands so the offline simulator (``benchmarks/economy_sim.py``) balances
+against exactly what the bot runs. Functions that roll dice take the random
+source as ``rng`` (anything with ``random``/``randint``/``uniform``).
+"""
+import random
+from typing import Tuple
+
+JOBS = {
+    'fireman': {'base_salary': (200, 500)},
+    'police': {'base_salary': (200, 500)},
+    'doctor': {'base_salary': (200, 500)},
+    'nurse': {'base_salary': (200, 500)},
+    'teacher': {'base_salary': (200, 500)},
+    'chef': {'base_salary': (200, 500)}
+}
+
+GENERIC_WORK_PAY = (100, 1000)  # `!work` without a job
+JOBS_PER_LEVEL = 15
+SALARY_PER_LEVEL = 100
+ITEM_DROP_CHANCE = 0.1
+ADVANCE_WORK_COUNT = 150        # Works needed for double pay
+
+GAMBLES_PER_LEVEL = 8
+BASE_WIN_CHANCE = 50            # Percent
+WIN_CHANCE_PER_LEVEL = 1
+MAX_WIN_CHANCE = 60
+
+ROB_SUCCESS_CHANCE = 0.4
+ROB_MIN_TARGET_WALLET = 100
+ROB_MAX_STOLEN = 1000
+ROB_FINE = (200, 1000)
+
+HEIST_CREW_SIZE = 5
+HEIST_JOIN_COST = 1000
+HEIST_MIN_TARGET_BANK = 1000
+HEIST_SUCCESS_CHANCE = 0.5
+HEIST_LOOT_SHARE = (0.2, 0.4)
+HEIST_GATHER_SECONDS = 1800     # Time to gather a crew
+HEIST_START_DELAY = 3           # Pause between a full crew and the outcome
+HEIST_COOLDOWN = 3600           # Per guild
+
+PET_POWER_ROLL = (0.8, 1.2)
+TOURNAMENT_CHAMPION_SHARE = 0.7  # Of the entry fee pool; the runner-up gets the rest
+
+LOTTERY_TICKET_PRICE = 100
+LOTTERY_HISTORY = 10            # Past draws kept per guild, each with its winner's ticket range and a counts digest
+
+# Listed stocks: starting price, hourly drift and hourly volatility
+STOCKS = {
+    'FIRE': {'price': 120.0, 'drift': 0.0005, 'volatility': 0.02},
+    'COPS': {'price': 95.0, 'drift': 0.0003, 'volatility': 0.015},
+    'MEDS': {'price': 240.0, 'drift': 0.0008, 'volatility': 0.025},
+    'CARE': {'price': 60.0, 'drift': 0.0004, 'volatility': 0.018},
+    'EDU': {'price': 45.0, 'drift': 0.0002, 'volatility': 0.012},
+    'CHEF': {'price': 30.0, 'drift': 0.0, 'volatility': 0.03},
+    'PETS': {'price': 15.0, 'drift': 0.001, 'volatility': 0.05},
+    'BANK': {'price': 500.0, 'drift': 0.0006, 'volatility': 0.01},
+}
+
+
+def job_level(job_count: int) -> int:
+    return (job_count // JOBS_PER_LEVEL) + 1
+
+
+def salary_range(job: str, level: int) -> Tuple[int, int]:
+    base_min, base_max = JOBS[job]['base_salary']
+    level_bonus = (level - 1) * SALARY_PER_LEVEL
+    return (base_min + level_bonus, base_max + level_bonus)
+
+
+def gamble_level(gamble_count: int) -> int:
+    return (gamble_count // GAMBLES_PER_LEVEL) + 1
+
+
+def gamble_win_chance(level: int) -> int:
+    """Win chance in percent for a gambling level."""
+    return min(BASE_WIN_CHANCE + (level - 1) * WIN_CHANCE_PER_LEVEL, MAX_WIN_CHANCE)
+
+
+def work_pay(job, job_count: int, work_count: int, rng=random) -> int:
+    if job:
+        amount = rng.randint(*salary_range(job, job_level(job_count)))
+    else:
+        amount = rng.randint(*GENERIC_WORK_PAY)
+    if work_count >= ADVANCE_WORK_COUNT:
+        amount *= 2
+    return amount
+
+
+def rob_outcome(target_wallet: int, rng=random) -> Tuple[int, int]:
+    """``(stolen, fine)`` for a robbery; exactly one of them is non-zero."""
+    if rng.random() < ROB_SUCCESS_CHANCE:
+        return rng.randint(1, min(target_wallet, ROB_MAX_STOLEN)), 0
+    return 0, rng.randint(*ROB_FINE)
+
+
+def heist_outcome(target_bank: int, crew_size: int, rng=random) -> Tuple[bool, int, int]:
+    """``(success, total_loot, share)`` for a heist on ``target_bank``."""
+    if rng.random() >= HEIST_SUCCESS_CHANCE:
+        return False, 0, 0
+    total_loot = int(target_bank * rng.uniform(*HEIST_LOOT_SHARE))
+    return True, total_loot, total_loot // crew_size
+
+
+def pet_power(strength: int, rng=random) -> float:
+    return strength * rng.uniform(*PET_POWER_ROLL)
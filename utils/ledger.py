@@ -0,0 +1,98 @@
+"""Bounds for wallet and bank balances.
+
+Every balance stays within ``±MAX_BALANCE``, which is small enough that an
+account's wallet + bank still fits in a signed 64-bit integer. Balances can
+then go into NumPy int64 columns and SQLite INTEGER values as they are.
+
+Money moving between players (transactions, deposits, admin grants) is
+rejected if a balance would cross the limit, so nothing is lost halfway
+through a transfer. Money the game creates (work pay, winnings, interest)
+saturates at the limit instead.
+
+Stores written before the limit existed may hold larger values.
+``BankRecord`` clamps them when it upgrades a record, and running this
+module clamps a whole store in one go::
+
+    python -m utils.ledger bank.json
+    python -m utils.ledger economy.db
+"""
+import json
+import sys
+from typing import List
+
+MAX_BALANCE = 2 ** 62 - 1
+BALANCE_FIELDS = ('wallet', 'bank')
+
+
+def clamp_balance(value: int) -> int:
+    """Saturate ``value`` to the balance limit."""
+    if value > MAX_BALANCE:
+        return MAX_BALANCE
+    if value < -MAX_BALANCE:
+        return -MAX_BALANCE
+    return value
+
+
+def fits(value: int) -> bool:
+    return -MAX_BALANCE <= value <= MAX_BALANCE
+
+
+def headroom(balance: int) -> int:
+    """How much more ``balance`` can take before hitting the limit."""
+    return max(MAX_BALANCE - balance, 0)
+
+
+def clamp_account(data: dict) -> dict:
+    """Clamp the balances of a stored account dict in place."""
+    for field in BALANCE_FIELDS:
+        value = data.get(field)
+        if isinstance(value, int) and not fits(value):
+            data[field] = clamp_balance(value)
+    return data
+
+
+def clamp_store(bank: dict) -> List[str]:
+    """Clamp every account in a raw bank store; returns the ids that changed."""
+    changed = []
+    for user_id, account in bank.items():
+        if any(isinstance(account.get(field), int) and not fits(account[field]) for field in BALANCE_FIELDS):
+            clamp_account(account)
+            changed.append(user_id)
+    return changed
+
+
+def migrate(path: str) -> List[str]:
+    """Clamp the bank store in a JSON file or SQLite database in place."""
+    if path.endswith('.db'):
+        from utils.sqlite_backend import SQLiteBackend
+        backend = SQLiteBackend(path, ['bank'])
+        bank = backend.load('bank')
+        changed = clamp_store(bank)
+        if changed:
+            backend.write('bank', {user_id: bank[user_id] for user_id in changed}, set(changed))
+        backend.close()
+        return changed
+
+    from utils.persistence import atomic_write_json
+    with open(path, 'r') as f:
+        bank = json.load(f)
+    changed = clamp_store(bank)
+    if changed:
+        atomic_write_json(path, bank)
+    return changed
+
+
+def main(argv):
+    if not argv:
+        print("Usage: python -m utils.ledger <bank.json|economy.db> ...")
+        return 1
+    for path in argv:
+        changed = migrate(path)
+        print(f"{path}: clamped {len(changed)} account(s) to ±{MAX_BALANCE:,}")
+        for user_id in changed:
+            print(f"  {user_id}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
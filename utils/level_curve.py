@@ -0,0 +1,77 @@
+"""XP curve lookups for the Leveling cog.
+
+A level curve is defined by the XP needed to clear each level. ``LevelCurve``
+keeps a table of cumulative thresholds (``thresholds[L]`` is the total XP
+needed to reach level ``L``) so converting XP to a level is a single bisect
+instead of a walk over every level.
+"""
+from bisect import bisect_right
+from typing import Callable, List, Optional
+
+
+def default_level_xp(level: int) -> int:
+    """XP needed to go from ``level`` to ``level + 1``."""
+    return 5 * (level ** 2) + 50 * level + 100
+
+
+def default_total_xp(level: int) -> int:
+    """Closed form of ``sum(default_level_xp(i) for i in range(level))``."""
+    return 5 * (level - 1) * level * (2 * level - 1) // 6 + 25 * level * (level - 1) + 100 * level
+
+
+class LevelCurve:
+    """Cumulative XP table with bisect lookup.
+
+    Custom curves only need ``level_xp``; the table grows on demand. When a
+    closed-form ``total_xp`` is known, XP beyond the table is resolved with a
+    binary search over it instead of growing the table without bound.
+    """
+
+    def __init__(self, level_xp: Callable[[int], int] = default_level_xp,
+                 total_xp: Optional[Callable[[int], int]] = default_total_xp,
+                 table_size: int = 1000):
+        self.level_xp = level_xp
+        self.total_xp = total_xp
+        self.thresholds: List[int] = [0]
+        self.extend(table_size)
+
+    @property
+    def max_level(self) -> int:
+        return len(self.thresholds) - 1
+
+    def extend(self, levels: int):
+        """Append ``levels`` more thresholds to the table."""
+        total = self.thresholds[-1]
+        for level in range(self.max_level, self.max_level + levels):
+            total += self.level_xp(level)
+            self.thresholds.append(total)
+
+    def xp_for_level(self, level: int) -> int:
+        """Total XP needed to reach ``level``."""
+        if level <= self.max_level:
+            return self.thresholds[level]
+        if self.total_xp is not None:
+            return self.total_xp(level)
+        self.extend(level - self.max_level)
+        return self.thresholds[level]
+
+    def level_from_xp(self, xp: int) -> int:
+        """Highest level whose threshold is at most ``xp``."""
+        if xp < self.thresholds[-1]:
+            return bisect_right(self.thresholds, xp) - 1
+        if self.total_xp is None:
+            while xp >= self.thresholds[-1]:
+                self.extend(self.max_level)
+            return bisect_right(self.thresholds, xp) - 1
+
+        # Past the table: bracket the level, then binary search the closed form
+        low, high = self.max_level, self.max_level * 2
+        while self.total_xp(high) <= xp:
+            low, high = high, high * 2
+        while high - low > 1:
+            mid = (low + high) // 2
+            if self.total_xp(mid) <= xp:
+                low = mid
+            else:
+                high = mid
+        return low
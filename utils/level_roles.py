@@ -0,0 +1,186 @@
+"""Roles granted at configured levels, and the queue that applies them.
+
+``RewardTable`` keeps a guild's reward levels sorted, so a level-up finds
+out whether it crossed any threshold with a bisect; level-ups between
+thresholds cost nothing more. With ``stack`` on, members keep every reward
+role up to their level; with it off, only the highest one, and lower tiers
+are removed.
+
+``RoleEditQueue`` applies the changes. Pending edits are merged per member
+(adding a role cancels a pending removal of it, and vice versa), and each
+reward role is added or removed on its own, so roles given or taken by
+anyone else in the meantime are never overwritten. Each guild drains its
+own queue through a token bucket, so a level-up burst or a full
+``!syncroles`` backfill stays under Discord's per-guild rate limit instead
+of running into 429s. Whether a change is still needed is checked against
+the member's cached roles right before the request, after any wait.
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import discord
+
+log = logging.getLogger(__name__)
+
+
+class RewardTable:
+    """A guild's reward roles ordered by the level that grants them."""
+
+    def __init__(self, rewards: Dict[int, int], stack: bool = True):
+        ordered = sorted(rewards.items())
+        self.levels: List[int] = [level for level, _ in ordered]
+        self.roles: List[int] = [role_id for _, role_id in ordered]
+        self.role_ids: Set[int] = set(self.roles)
+        self.stack = stack
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'RewardTable':
+        """From the stored ``{"rewards": {"<level>": role_id}, "stack": bool}`` form."""
+        return cls({int(level): role_id for level, role_id in config.get('rewards', {}).items()},
+                   config.get('stack', True))
+
+    def __bool__(self) -> bool:
+        return bool(self.levels)
+
+    def crossed(self, old_level: int, new_level: int) -> bool:
+        """Whether going from ``old_level`` to ``new_level`` passed a reward level."""
+        return bisect_right(self.levels, old_level) != bisect_right(self.levels, new_level)
+
+    def changes(self, level: int) -> Tuple[Set[int], Set[int]]:
+        """``(roles to hold, roles to drop)`` for a member at ``level``."""
+        earned = bisect_right(self.levels, level)
+        if not earned:
+            return set(), set()
+        if self.stack:
+            return set(self.roles[:earned]), set()
+        top = self.roles[earned - 1]
+        return {top}, set(self.roles[:earned - 1]) - {top}
+
+
+class _TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def delay(self) -> float:
+        """Take a token; returns how long to wait before using it."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RoleEditQueue:
+    """Merged, rate-limited role edits, drained by one task per guild."""
+
+    def __init__(self, bot, edits_per_minute: float = 40, burst: int = 5):
+        self.bot = bot
+        self.edits_per_minute = edits_per_minute
+        self.burst = burst
+        # guild id -> member id -> [roles to add, roles to remove], oldest first
+        self._pending: Dict[int, 'OrderedDict[int, List[Set[int]]]'] = {}
+        self._buckets: Dict[int, _TokenBucket] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.stats = {'queued': 0, 'merged': 0, 'edits': 0, 'skipped': 0, 'errors': 0}
+
+    def pending(self, guild_id: Optional[int] = None) -> int:
+        if guild_id is not None:
+            return len(self._pending.get(guild_id, ()))
+        return sum(len(members) for members in self._pending.values())
+
+    def eta(self, guild_id: int) -> float:
+        """Seconds until the guild's queue is drained at the configured rate (one request per role change)."""
+        changes = sum(len(add) + len(remove) for add, remove in self._pending.get(guild_id, {}).values())
+        return max(changes - self.burst, 0) * 60 / self.edits_per_minute
+
+    def enqueue(self, guild_id: int, member_id: int, add: Iterable[int] = (), remove: Iterable[int] = ()):
+        members = self._pending.setdefault(guild_id, OrderedDict())
+        edit = members.get(member_id)
+        if edit is None:
+            edit = members[member_id] = [set(), set()]
+            self.stats['queued'] += 1
+        else:
+            self.stats['merged'] += 1
+        # The latest request for a role wins
+        for role_id in add:
+            edit[0].add(role_id)
+            edit[1].discard(role_id)
+        for role_id in remove:
+            edit[1].add(role_id)
+            edit[0].discard(role_id)
+        self._ensure_worker(guild_id)
+
+    def _requeue(self, guild_id: int, member_id: int, changes: List[Tuple[int, bool]]):
+        """Put back changes that weren't made, unless a newer request for the same role was queued since."""
+        members = self._pending.setdefault(guild_id, OrderedDict())
+        edit = members.setdefault(member_id, [set(), set()])
+        for role_id, grant in changes:
+            if role_id not in edit[0] and role_id not in edit[1]:
+                edit[0 if grant else 1].add(role_id)
+
+    def _still_needed(self, guild_id: int, member_id: int, role_id: int, grant: bool):
+        """``(member, role)`` if the member still lacks (or still holds) the role, else None."""
+        guild = self.bot.get_guild(guild_id)
+        member = guild.get_member(member_id) if guild is not None else None
+        role = guild.get_role(role_id) if member is not None else None
+        if role is None or role.is_default() or (member.get_role(role_id) is not None) == grant:
+            return None
+        return member, role
+
+    def _ensure_worker(self, guild_id: int):
+        worker = self._workers.get(guild_id)
+        if worker is None or worker.done():
+            self._workers[guild_id] = asyncio.get_running_loop().create_task(self._drain(guild_id))
+
+    async def _drain(self, guild_id: int):
+        bucket = self._buckets.get(guild_id)
+        if bucket is None:
+            bucket = self._buckets[guild_id] = _TokenBucket(self.edits_per_minute / 60, self.burst)
+        members = self._pending[guild_id]
+        while members:
+            member_id, (add, remove) = members.popitem(last=False)
+            changes = [(role_id, True) for role_id in add] + [(role_id, False) for role_id in remove]
+            for i, (role_id, grant) in enumerate(changes):
+                # Changes that became no-ops cost no token and no API call
+                target = self._still_needed(guild_id, member_id, role_id, grant)
+                if target is None:
+                    self.stats['skipped'] += 1
+                    continue
+                wait = bucket.delay()
+                if wait:
+                    await asyncio.sleep(wait)
+                    target = self._still_needed(guild_id, member_id, role_id, grant)
+                    if target is None:
+                        self.stats['skipped'] += 1
+                        continue
+                member, role = target
+                try:
+                    if grant:
+                        await member.add_roles(role, reason="Level role rewards")
+                    else:
+                        await member.remove_roles(role, reason="Level role rewards")
+                    self.stats['edits'] += 1
+                except discord.RateLimited as e:
+                    self._requeue(guild_id, member_id, changes[i:])
+                    await asyncio.sleep(e.retry_after)
+                    break
+                except discord.HTTPException as e:
+                    self.stats['errors'] += 1
+                    log.warning("Role change for %s in guild %s failed: %s", member_id, guild_id, e)
+        del self._pending[guild_id]
+        self._workers.pop(guild_id, None)
+
+    def stop(self):
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
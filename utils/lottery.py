@@ -0,0 +1,213 @@
+"""Ticket lotteries where the winner is drawn in proportion to tickets held.
+
+Tickets are never stored one by one: each player has a ticket count, and a
+Fenwick (binary indexed) tree over those counts gives prefix sums. Buying
+tickets is a point update and drawing maps a random ticket number to its
+owner by descending the tree, so both are O(log n) in the number of players
+however many millions of tickets were sold.
+
+A draw records its seed, the ticket total, the winner's range of ticket
+numbers and a digest of everyone's ticket counts, so drawing stays a tree
+lookup and the record stays the same size however many players there were.
+``verify_draw`` checks the pick from the record alone; given the round's
+counts, ``replay`` recomputes the winner and checks the counts against the
+digest. The digest is a sum of per-player hashes, kept up to date as
+tickets are bought.
+"""
+import hashlib
+import random
+import secrets
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class FenwickTree:
+    """Prefix sums over a growable array of non-negative counts."""
+
+    def __init__(self, counts: Sequence[int] = ()):
+        self._counts: List[int] = list(counts)
+        self._build(max(len(self._counts), 1))
+
+    def _build(self, capacity: int):
+        # Power-of-two capacity keeps find() a plain bit descent
+        size = 1 << (capacity - 1).bit_length()
+        tree = [0] * (size + 1)
+        tree[1:len(self._counts) + 1] = self._counts
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._size = size
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __getitem__(self, index: int) -> int:
+        return self._counts[index]
+
+    def append(self, count: int = 0) -> int:
+        """Add a slot and return its index. Amortized O(log n)."""
+        self._counts.append(0)
+        if len(self._counts) > self._size:
+            self._build(len(self._counts))
+        index = len(self._counts) - 1
+        if count:
+            self.add(index, count)
+        return index
+
+    def add(self, index: int, delta: int):
+        self._counts[index] += delta
+        i = index + 1
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int) -> int:
+        """Sum of the counts before ``index``."""
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    @property
+    def total(self) -> int:
+        return self._tree[self._size]
+
+    def find(self, target: int) -> int:
+        """Index of the slot holding the ``target``-th unit (0-based)."""
+        if not 0 <= target < self.total:
+            raise IndexError(target)
+        index = 0
+        step = self._size
+        while step:
+            nxt = index + step
+            if self._tree[nxt] <= target:
+                index = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return index
+
+
+def winning_ticket(seed: int, total: int) -> int:
+    return random.Random(seed).randrange(total)
+
+
+_DIGEST_MASK = (1 << 64) - 1
+
+
+def _entry_hash(user_id: str, count: int) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{user_id}:{count}".encode(), digest_size=8).digest(), 'big')
+
+
+def entries_digest(entries: Sequence[Sequence]) -> str:
+    """Digest of ``(user_id, tickets)`` pairs, independent of their order."""
+    return f"{sum(_entry_hash(user_id, count) for user_id, count in entries) & _DIGEST_MASK:016x}"
+
+
+class Lottery:
+    """One guild's running lottery: ticket counts, the pot and past draws."""
+
+    def __init__(self, entries: Sequence[Tuple[str, int]] = (), pot: int = 0,
+                 round_number: int = 1, history: Optional[List[dict]] = None):
+        self._players: List[str] = [user_id for user_id, _ in entries]
+        self._index: Dict[str, int] = {user_id: i for i, user_id in enumerate(self._players)}
+        self._tickets = FenwickTree([count for _, count in entries])
+        self._digest = sum(_entry_hash(user_id, count) for user_id, count in entries) & _DIGEST_MASK
+        self.pot = pot
+        self.round = round_number
+        self.history: List[dict] = history or []
+
+    @property
+    def total(self) -> int:
+        return self._tickets.total
+
+    @property
+    def players(self) -> int:
+        return len(self._players)
+
+    def tickets(self, user_id: str) -> int:
+        index = self._index.get(user_id)
+        return self._tickets[index] if index is not None else 0
+
+    def buy(self, user_id: str, count: int, cost: int):
+        if count <= 0:
+            raise ValueError("Ticket count must be positive")
+        index = self._index.get(user_id)
+        if index is None:
+            index = self._index[user_id] = self._tickets.append()
+            self._players.append(user_id)
+            old_hash = 0
+        else:
+            old_hash = _entry_hash(user_id, self._tickets[index])
+        self._tickets.add(index, count)
+        self._digest = (self._digest - old_hash + _entry_hash(user_id, self._tickets[index])) & _DIGEST_MASK
+        self.pot += cost
+
+    def owner(self, ticket: int) -> str:
+        return self._players[self._tickets.find(ticket)]
+
+    @property
+    def digest(self) -> str:
+        return f"{self._digest:016x}"
+
+    def entries(self) -> List[List]:
+        """``[user_id, tickets]`` pairs in the order players first bought in."""
+        return [[user_id, self._tickets[i]] for i, user_id in enumerate(self._players)]
+
+    def draw(self, seed: Optional[int] = None, keep: int = 10) -> dict:
+        """Pick a winner, record the draw and start the next round.
+
+        The caller pays out ``draw['pot']`` to ``draw['winner']``.
+        """
+        if not self.total:
+            raise ValueError("No tickets have been sold")
+        seed = secrets.randbits(63) if seed is None else seed
+        ticket = winning_ticket(seed, self.total)
+        index = self._tickets.find(ticket)
+        result = {
+            'round': self.round,
+            'seed': seed,
+            'ticket': ticket,
+            'total': self.total,
+            'winner': self._players[index],
+            'offset': self._tickets.prefix(index),  # The winner holds tickets offset..offset + tickets - 1
+            'tickets': self._tickets[index],
+            'players': len(self._players),
+            'digest': self.digest,
+            'pot': self.pot,
+            'drawn_at': time.time(),
+        }
+        self.history = (self.history + [result])[-keep:] if keep > 0 else []
+        self._players, self._index, self._tickets = [], {}, FenwickTree()
+        self.pot = 0
+        self.round += 1
+        return result
+
+    def to_dict(self) -> dict:
+        return {'round': self.round, 'pot': self.pot, 'entries': self.entries(), 'history': list(self.history)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Lottery':
+        return cls([tuple(entry) for entry in data.get('entries', ())], data.get('pot', 0),
+                   data.get('round', 1), data.get('history'))
+
+
+def verify_draw(draw: dict) -> bool:
+    """Whether the recorded seed picks the recorded ticket, and that ticket is in the winner's range."""
+    if winning_ticket(draw['seed'], draw['total']) != draw['ticket']:
+        return False
+    return draw['offset'] <= draw['ticket'] < draw['offset'] + draw['tickets']
+
+
+def replay(draw: dict, entries: Sequence[Sequence]) -> str:
+    """Recompute a recorded draw's winner from its seed and the round's ticket counts.
+
+    ``entries`` are the round's ``(user_id, tickets)`` pairs in purchase
+    order; they must match the recorded digest.
+    """
+    if entries_digest(entries) != draw['digest']:
+        raise ValueError("Ticket counts don't match the draw's digest")
+    lottery = Lottery([tuple(entry) for entry in entries])
+    return lottery.owner(winning_ticket(draw['seed'], lottery.total))
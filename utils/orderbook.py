@@ -0,0 +1,170 @@
+"""Per-item limit order books with price-time priority.
+
+Each side of a book is a binary heap of ``(price key, order id)`` entries,
+so adding a resting order is O(log n). Order ids increase monotonically and
+double as the time priority: among orders at the same price the older one
+(lower id) fills first. A new order first trades against the best opposite
+orders while prices cross, always at the resting order's price, and any
+remainder rests on the book.
+
+Cancels only remove the order from ``orders``; its heap entry is dropped
+lazily when it reaches the top, and a side is rebuilt once most of its
+entries are dead. The book holds no money or items itself; the caller
+escrows them when an order is placed and settles the returned fills.
+"""
+import heapq
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+BUY = 'buy'
+SELL = 'sell'
+
+
+class Order:
+    """A limit order; ``qty`` is what is still open."""
+
+    __slots__ = ('order_id', 'user_id', 'side', 'price', 'qty')
+
+    def __init__(self, order_id: int, user_id: str, side: str, price: int, qty: int):
+        self.order_id = order_id
+        self.user_id = user_id
+        self.side = side
+        self.price = price
+        self.qty = qty
+
+    def to_dict(self) -> dict:
+        return {"id": self.order_id, "user": self.user_id, "side": self.side,
+                "price": self.price, "qty": self.qty}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Order':
+        return cls(data["id"], data["user"], data["side"], data["price"], data["qty"])
+
+    def __repr__(self):
+        return f"Order({self.to_dict()!r})"
+
+
+class Fill(NamedTuple):
+    """One trade between a resting (maker) order and an incoming order."""
+    maker_id: int
+    maker_user: str
+    price: int
+    qty: int
+
+
+class OrderBook:
+    """Bids and asks for one item."""
+
+    def __init__(self, item: str):
+        self.item = item
+        self.orders: Dict[int, Order] = {}  # Open orders, oldest first
+        self._bids: List[Tuple[int, int]] = []  # (-price, id): highest price first
+        self._asks: List[Tuple[int, int]] = []  # (price, id): lowest price first
+        self._dead = {BUY: 0, SELL: 0}  # Heap entries left behind by cancels
+        self.last_id = 0  # Highest order id ever submitted, so ids are never reused
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def _heap(self, side: str) -> list:
+        return self._bids if side == BUY else self._asks
+
+    def _push(self, order: Order):
+        key = -order.price if order.side == BUY else order.price
+        heapq.heappush(self._heap(order.side), (key, order.order_id))
+
+    def _top(self, side: str) -> Optional[Order]:
+        # Drop entries for cancelled orders on the way
+        heap = self._heap(side)
+        while heap:
+            order = self.orders.get(heap[0][1])
+            if order is not None:
+                return order
+            heapq.heappop(heap)
+            self._dead[side] -= 1
+        return None
+
+    def best_bid(self) -> Optional[Order]:
+        return self._top(BUY)
+
+    def best_ask(self) -> Optional[Order]:
+        return self._top(SELL)
+
+    def submit(self, order: Order) -> List[Fill]:
+        """Match ``order`` against the book; any unfilled quantity rests on it."""
+        fills = []
+        self.last_id = max(self.last_id, order.order_id)
+        if order.side == BUY:
+            opposite = SELL
+            crosses = lambda best: best.price <= order.price
+        else:
+            opposite = BUY
+            crosses = lambda best: best.price >= order.price
+
+        while order.qty:
+            best = self._top(opposite)
+            if best is None or not crosses(best):
+                break
+            qty = min(order.qty, best.qty)
+            fills.append(Fill(best.order_id, best.user_id, best.price, qty))
+            order.qty -= qty
+            best.qty -= qty
+            if not best.qty:
+                del self.orders[best.order_id]
+                heapq.heappop(self._heap(opposite))
+
+        if order.qty:
+            self.orders[order.order_id] = order
+            self._push(order)
+        return fills
+
+    def revert(self, order: Order, fills: List[Fill]):
+        """Undo the ``submit(order)`` that returned ``fills``.
+
+        The makers get their quantity back (fully filled ones are put back on
+        the book with their old ids, so they keep their time priority) and
+        ``order`` leaves the book with its original quantity.
+        """
+        self.cancel(order.order_id)
+        opposite = SELL if order.side == BUY else BUY
+        for fill in fills:
+            maker = self.orders.get(fill.maker_id)
+            if maker is None:
+                maker = self.orders[fill.maker_id] = Order(fill.maker_id, fill.maker_user, opposite, fill.price, 0)
+                self._push(maker)
+            maker.qty += fill.qty
+            order.qty += fill.qty
+
+    def cancel(self, order_id: int) -> Optional[Order]:
+        """Remove an open order and return it, or None if it isn't open."""
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            self._dead[order.side] += 1
+            heap = self._heap(order.side)
+            if self._dead[order.side] > 64 and self._dead[order.side] * 2 > len(heap):
+                heap[:] = [entry for entry in heap if entry[1] in self.orders]
+                heapq.heapify(heap)
+                self._dead[order.side] = 0
+        return order
+
+    def depth(self, levels: int = 10) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """Top ``levels`` price levels per side as ``(price, total qty)``, best first."""
+        bids: Dict[int, int] = {}
+        asks: Dict[int, int] = {}
+        for order in self.orders.values():
+            book = bids if order.side == BUY else asks
+            book[order.price] = book.get(order.price, 0) + order.qty
+        return (heapq.nlargest(levels, bids.items()), heapq.nsmallest(levels, asks.items()))
+
+    def to_dict(self) -> dict:
+        return {"last_id": self.last_id, "orders": [order.to_dict() for order in self.orders.values()]}
+
+    @classmethod
+    def from_dict(cls, item: str, data: dict) -> 'OrderBook':
+        book = cls(item)
+        book.last_id = data.get("last_id", 0)
+        for stored in data.get("orders", []):
+            order = Order.from_dict(stored)
+            book.orders[order.order_id] = order
+            book._push(order)
+            book.last_id = max(book.last_id, order.order_id)
+        return book
@@ -0,0 +1,515 @@
+"""Write-behind persistence for the bot's JSON data stores.
+
+Cogs keep their data in plain dicts and call ``mark_dirty`` after a mutation
+instead of rewriting the file themselves. A background task coalesces those
+marks and flushes each dirty store at most once per interval, or sooner once
+enough mutations have piled up. Disk I/O runs on a single worker thread,
+so flushes are ordered and never block the event loop; the event loop only
+copies the records that were marked dirty.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from utils.records import copy_record
+
+logger = logging.getLogger(__name__)
+
+# Marker stored in a dirty-key set when the whole store has to be written
+ALL_KEYS = None
+
+
+def atomic_write_json(path: str, data, indent: Optional[int] = 4):
+    """Write JSON to a temp file and rename it over ``path``.
+
+    A crash mid-write leaves the previous file intact instead of a truncated one.
+    """
+    atomic_write_text(path, json.dumps(data, indent=indent))
+
+
+def atomic_write_text(path: str, text: str):
+    """Write ``text`` to a temp file and rename it over ``path``."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _record_json(value) -> str:
+    """One top-level value of a store as it appears in the store's indented JSON file."""
+    # Nested one level inside the file's top-level object; JSON strings never contain raw newlines
+    return json.dumps(value, indent=4).replace('\n', '\n    ')
+
+
+class JSONFileBackend:
+    """Keeps every store in its own JSON file, rewritten in full on flush.
+
+    The writer thread keeps the JSON text of every record between flushes,
+    so a flush only copies and serializes the records marked dirty and
+    joins the cached text of the rest.
+    """
+
+    def __init__(self, paths: Dict[str, str]):
+        self.paths = dict(paths)
+        self._fragments: Dict[str, Dict[str, str]] = {}  # Per store: key -> serialized value
+
+    def load(self, name: str) -> dict:
+        path = self.paths[name]
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            atomic_write_json(path, {})
+            return {}
+
+    def snapshot(self, name: str, data: dict, keys: Set):
+        # Runs on the event loop: copy the dirty records one level deep so the
+        # writer thread never iterates a dict that a command is mutating. The
+        # store's first flush, or a whole-store mark, copies everything.
+        if name not in self._fragments or ALL_KEYS in keys:
+            return True, {key: copy_record(value) for key, value in data.items()}
+        # None marks a key that was removed from the store
+        return False, {key: copy_record(data[key]) if key in data else None for key in keys}
+
+    def write(self, name: str, snapshot, keys: Set):
+        # Flushes are serialized by WriteBehind, so only one write touches the cache at a time
+        replace, records = snapshot
+        fragments = {} if replace else self._fragments[name]
+        for key, value in records.items():
+            if value is None:
+                fragments.pop(key, None)
+            else:
+                fragments[key] = _record_json(value)
+        # The same layout json.dump(..., indent=4) produces
+        body = ',\n'.join(f'    {json.dumps(str(key))}: {text}' for key, text in fragments.items())
+        atomic_write_text(self.paths[name], '{\n' + body + '\n}' if body else '{}')
+        self._fragments[name] = fragments
+
+    def close(self):
+        pass
+
+
+class ShardedJSONBackend:
+    """Keeps each top-level key of a store in its own JSON file.
+
+    Used for per-guild data: a flush only rewrites the shards whose keys were
+    marked dirty. If the shard directory does not exist yet, ``legacy_file``
+    (the old single-file store) is split into shards on first load.
+    """
+
+    def __init__(self, directory: str, legacy_file: Optional[str] = None):
+        self.directory = directory
+        self.legacy_file = legacy_file
+
+    def _shard_path(self, key: str) -> str:
+        if not str(key).isdigit():
+            raise ValueError(f"Invalid shard key: {key!r}")
+        return os.path.join(self.directory, f"{key}.json")
+
+    def prepare(self):
+        """Create the shard directory, splitting ``legacy_file`` into it on first run."""
+        if os.path.isdir(self.directory):
+            return
+        os.makedirs(self.directory)
+        if self.legacy_file and os.path.exists(self.legacy_file):
+            with open(self.legacy_file, 'r') as f:
+                data = json.load(f)
+            self.write(None, data, {ALL_KEYS})
+
+    def load(self, name: str) -> dict:
+        self.prepare()
+        data = {}
+        for filename in os.listdir(self.directory):
+            key, ext = os.path.splitext(filename)
+            if ext != '.json' or not key.isdigit():
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), 'r') as f:
+                    data[key] = json.load(f)
+            except json.JSONDecodeError:
+                logger.warning("Skipping unreadable shard %s", filename)
+        return data
+
+    def largest_shards(self, limit: int) -> List[str]:
+        """Keys of the ``limit`` biggest shards on disk, biggest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        sizes = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                key, ext = os.path.splitext(entry.name)
+                if ext == '.json' and key.isdigit():
+                    sizes.append((entry.stat().st_size, key))
+        return [key for _, key in heapq.nlargest(limit, sizes)]
+
+    def load_shards(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """The shards that exist among ``keys``."""
+        shards = {}
+        for key in keys:
+            data = self.load_shard(key)
+            if data is not None:
+                shards[key] = data
+        return shards
+
+    def load_shard(self, key: str) -> Optional[dict]:
+        """One shard's data, or None if it has never been written."""
+        try:
+            with open(self._shard_path(key), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            logger.warning("Skipping unreadable shard %s", key)
+            return None
+
+    def snapshot(self, name: str, data: dict, keys: Set) -> dict:
+        data = getattr(data, 'tables', data)  # Loaded shards of a LazyShardedStore
+        if ALL_KEYS in keys:
+            keys = data.keys()
+        # None marks a shard whose key was removed from the store
+        return {
+            key: {sub: copy_record(value) for sub, value in data[key].items()} if key in data else None
+            for key in keys
+        }
+
+    def write(self, name: str, snapshot: dict, keys: Set):
+        for key, shard in snapshot.items():
+            path = self._shard_path(key)
+            if shard is None:
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                atomic_write_json(path, shard)
+
+    def close(self):
+        pass
+
+
+class WriteBehind:
+    """Coalesces store mutations and flushes them from a background task.
+
+    ``interval`` is the longest a mutation waits before it reaches the
+    backend; ``max_dirty`` mutations trigger an early flush.
+    """
+
+    def __init__(self, backend, interval: float = 5.0, max_dirty: int = 200, name: str = 'storage'):
+        self.backend = backend
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self.name = name
+        self._stores: Dict[str, dict] = {}
+        self._dirty: Dict[str, Set] = {}
+        self._in_flight: Dict[str, Set] = {}  # Keys snapshotted by the flush still being written
+        self._hooks: Dict[str, tuple] = {}
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'{name}-writer')
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.stats = {
+            'flushes': 0,
+            'writes_requested': 0,
+            'writes_coalesced': 0,
+            'last_flush_writes': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'errors': 0,
+        }
+
+    def run_sync(self, func, *args):
+        """Run ``func`` on the writer thread and wait for the result."""
+        return self._executor.submit(func, *args).result()
+
+    async def run(self, func, *args):
+        """Run ``func`` on the writer thread without blocking the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def load(self, name: str, wrap: Optional[Callable[[dict], dict]] = None) -> dict:
+        """Load a store through the backend and start tracking it.
+
+        ``wrap`` converts the loaded dict (e.g. into a ``RecordTable``); the
+        wrapped object is what gets tracked and returned.
+        """
+        data = self.run_sync(self.backend.load, name)
+        if wrap is not None:
+            data = wrap(data)
+        self._stores[name] = data
+        return data
+
+    def track(self, name: str, data):
+        """Start tracking a store the caller loads itself, e.g. one shard at a time."""
+        self._stores[name] = data
+        return data
+
+    def is_dirty(self, name: str, key) -> bool:
+        """Whether ``key`` has changes that haven't reached the backend yet."""
+        for marks in (self._dirty.get(name), self._in_flight.get(name)):
+            if marks and (key in marks or ALL_KEYS in marks):
+                return True
+        return False
+
+    def mark_dirty(self, name: str, *keys):
+        """Record that ``keys`` (or the whole store) changed."""
+        dirty = self._dirty.setdefault(name, set())
+        if keys:
+            dirty.update(keys)
+        else:
+            dirty.add(ALL_KEYS)
+        self._pending += 1
+        self.stats['writes_requested'] += 1
+        if self._wakeup is not None and self._pending >= self.max_dirty:
+            self._wakeup.set()
+
+    def request_flush(self):
+        """Wake the flush task without waiting for the interval."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def set_flush_hooks(self, name: str, before=None, after=None):
+        """Register callbacks run on the event loop around a store's flush.
+
+        ``before(keys)`` runs right before the store is snapshotted and returns
+        the dirty keys to write; ``after()`` runs once the write succeeded.
+        """
+        self._hooks[name] = (before, after)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _write_batches(self, batches):
+        for name, snapshot, keys in batches:
+            self.backend.write(name, snapshot, keys)
+
+    async def flush(self):
+        """Write every dirty store now."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+            pending, self._pending = self._pending, 0
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            self._in_flight = dirty
+            try:
+                batches = []
+                for name, keys in dirty.items():
+                    before, _ = self._hooks.get(name, (None, None))
+                    if before is not None:
+                        keys = before(keys)
+                        dirty[name] = keys
+                    batches.append((name, self.backend.snapshot(name, self._stores[name], keys), keys))
+                await loop.run_in_executor(self._executor, self._write_batches, batches)
+            except Exception:
+                # Put the marks back so the next flush retries them
+                for name, keys in dirty.items():
+                    self._dirty.setdefault(name, set()).update(keys)
+                self._pending += pending
+                self.stats['errors'] += 1
+                logger.exception("%s: flush failed", self.name)
+                return
+            finally:
+                self._in_flight = {}
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            for name in dirty:
+                _, after = self._hooks.get(name, (None, None))
+                if after is not None:
+                    after()
+            self.stats['flushes'] += 1
+            self.stats['writes_coalesced'] += max(0, pending - len(batches))
+            self.stats['last_flush_writes'] = pending
+            self.stats['last_flush_ms'] = elapsed_ms
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed_ms)
+            logger.debug("%s: flushed %d store(s) for %d write(s) in %.1fms",
+                         self.name, len(batches), pending, elapsed_ms)
+
+    async def _run(self):
+        # Checked rather than relying on cancel(): a cancel that lands while
+        # the wakeup event is already set can be swallowed by wait_for
+        while self._task is asyncio.current_task():
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # flush() restores its marks on failure; keep the task alive for the next interval
+                logger.exception("%s: flush task error", self.name)
+
+    def start(self):
+        """Start the background flush task on the running loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task, write anything still dirty and release the backend."""
+        if self._task is not None:
+            task, self._task = self._task, None
+            self._wakeup.set()
+            await task
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.backend.close)
+        self._executor.shutdown(wait=True)
+
+
+class LazyShardedStore:
+    """A sharded store whose shards are loaded on first access and evicted when idle.
+
+    Behaves like the dict of per-key tables the cog used to load up front:
+    ``key in store`` and ``store[key]`` read the key's shard the first time,
+    and assigned tables are converted with ``convert``. Only loaded shards
+    are held in memory, so startup and resident size don't grow with keys
+    nobody touches.
+
+    ``evict()`` drops shards idle for ``idle_seconds``, and least recently
+    used shards beyond ``max_loaded``. A shard with unwritten changes is
+    never dropped; its flush is requested and it is evicted after the write.
+    Loading past the cap schedules an eviction for the next loop iteration,
+    so the table just loaded stays valid until the current callback yields.
+
+    A shard is otherwise read on the event loop the first time its key is
+    touched, so ``preload`` reads the biggest ones up front on the writer
+    thread. Keys found to have no shard are remembered, so touching them
+    again doesn't go back to the disk.
+    """
+
+    MAX_MISSING = 10000
+
+    def __init__(self, persistence: WriteBehind, name: str, convert: Callable[[dict], dict],
+                 max_loaded: int = 500, idle_seconds: float = 1800,
+                 on_evict: Optional[Callable[[str], None]] = None, clock=time.monotonic):
+        self.persistence = persistence
+        self.backend = persistence.backend
+        self.name = name
+        self.convert = convert
+        self.max_loaded = max_loaded
+        self.idle_seconds = idle_seconds
+        self.on_evict = on_evict
+        self.clock = clock
+        # Loaded tables; flushes read these directly, so a write isn't a use
+        self.tables: Dict[str, dict] = {}
+        self._last_used: 'OrderedDict[str, float]' = OrderedDict()  # Least recently used first
+        self._evict_scheduled = False
+        self._missing: Set[str] = set()  # Keys known to have no shard
+        self.stats = {'loads': 0, 'misses': 0, 'evictions': 0, 'preloaded': 0}
+        persistence.run_sync(self.backend.prepare)
+        persistence.track(name, self)
+        persistence.set_flush_hooks(name, after=self.evict)
+
+    def _touch(self, key: str):
+        self._last_used[key] = self.clock()
+        self._last_used.move_to_end(key)
+
+    def _table(self, key: str):
+        table = self.tables.get(key)
+        if table is None:
+            if key in self._missing:
+                self.stats['misses'] += 1
+                return None
+            data = self.backend.load_shard(key) if str(key).isdigit() else None
+            if data is None:
+                self.stats['misses'] += 1
+                if len(self._missing) >= self.MAX_MISSING:
+                    self._missing.clear()
+                self._missing.add(key)
+                return None
+            table = self.tables[key] = self.convert(data)
+            self.stats['loads'] += 1
+            self._schedule_evict()
+        self._touch(key)
+        return table
+
+    def __contains__(self, key) -> bool:
+        return self._table(key) is not None
+
+    def __getitem__(self, key):
+        table = self._table(key)
+        if table is None:
+            raise KeyError(key)
+        return table
+
+    def get(self, key, default=None):
+        table = self._table(key)
+        return table if table is not None else default
+
+    def __setitem__(self, key, value):
+        if type(value) is dict:
+            value = self.convert(value)
+        self.tables[key] = value
+        self._missing.discard(key)
+        self._touch(key)
+        self._schedule_evict()
+
+    def _load_converted(self, keys):
+        return {key: self.convert(data) for key, data in self.backend.load_shards(keys).items()}
+
+    async def preload(self, limit: int) -> int:
+        """Read and convert the ``limit`` biggest shards (at most ``max_loaded``) on the writer thread.
+
+        Keys already loaded are left alone. Returns how many shards were added.
+        """
+        limit = min(limit, self.max_loaded)
+        if limit <= 0:
+            return 0
+        keys = await self.persistence.run(self.backend.largest_shards, limit)
+        shards = await self.persistence.run(self._load_converted, keys)
+        added = 0
+        for key in reversed(keys):  # Biggest ends up most recently used
+            if key in shards and key not in self.tables:
+                self.tables[key] = shards[key]
+                self._touch(key)
+                added += 1
+        self.stats['preloaded'] += added
+        self._schedule_evict()
+        return added
+
+    def keys(self):
+        """Keys of the loaded shards; the others are unchanged on disk."""
+        return self.tables.keys()
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def _schedule_evict(self):
+        if len(self.tables) > self.max_loaded and not self._evict_scheduled:
+            # Not right away: the caller is about to change the table it just
+            # loaded, and marks it dirty before it next awaits
+            self._evict_scheduled = True
+            asyncio.get_running_loop().call_soon(self.evict)
+
+    def evict(self) -> int:
+        """Drop idle and least recently used shards that have been written out."""
+        self._evict_scheduled = False
+        now = self.clock()
+        evicted = 0
+        waiting = False
+        for key, last_used in list(self._last_used.items()):
+            if len(self.tables) <= self.max_loaded and now - last_used < self.idle_seconds:
+                break  # Everything after this was used more recently
+            if self.persistence.is_dirty(self.name, key):
+                waiting = True
+                continue
+            del self.tables[key]
+            del self._last_used[key]
+            evicted += 1
+            if self.on_evict is not None:
+                self.on_evict(key)
+        if waiting:
+            self.persistence.request_flush()
+        self.stats['evictions'] += evicted
+        return evicted
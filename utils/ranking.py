@@ -0,0 +1,84 @@
+"""Incrementally maintained rankings.
+
+``RankIndex`` keeps keys ordered by descending score in a ``SortedList`` so a
+score change, a rank lookup and fetching a page of the ranking are all
+O(log n) instead of re-sorting every record per command.
+
+Building an index, or re-sorting it in ``update_many``, sorts runs of
+``SORT_RUN`` entries and merges them. A single sort of a million entries
+holds the GIL for most of a second, which stalls the event loop even when
+the build runs on a worker thread; the merge lets the loop in between.
+"""
+import heapq
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+SORT_RUN = 20_000
+
+
+class RankIndex:
+    """Keys ordered by score, highest first. Ties are broken by key."""
+
+    def __init__(self, items: Iterable[Tuple[Hashable, int]] = ()):
+        self._scores: Dict[Hashable, int] = dict(items)
+        self._order = self._sorted()
+
+    def _sorted(self) -> SortedList:
+        entries = [(-score, key) for key, score in self._scores.items()]
+        runs = [sorted(entries[i:i + SORT_RUN]) for i in range(0, len(entries), SORT_RUN)]
+        # Already in order, so SortedList's own sort is a single pass
+        return SortedList(heapq.merge(*runs))
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, key) -> bool:
+        return key in self._scores
+
+    def score(self, key) -> Optional[int]:
+        return self._scores.get(key)
+
+    def update(self, key, score: int):
+        """Set ``key``'s score, moving it to its new position."""
+        old = self._scores.get(key)
+        if old == score:
+            return
+        if old is not None:
+            self._order.remove((-old, key))
+        self._scores[key] = score
+        self._order.add((-score, key))
+
+    def update_many(self, items: Iterable[Tuple[Hashable, int]]):
+        """Set several scores at once, e.g. after an interest run touched most accounts.
+
+        Past a quarter of the index, re-sorting everything once is cheaper
+        than moving the keys one at a time.
+        """
+        items = list(items)
+        if len(items) * 4 < len(self._scores):
+            for key, score in items:
+                self.update(key, score)
+            return
+        self._scores.update(items)
+        self._order = self._sorted()
+
+    def remove(self, key):
+        old = self._scores.pop(key, None)
+        if old is not None:
+            self._order.remove((-old, key))
+
+    def clear(self):
+        self._scores.clear()
+        self._order.clear()
+
+    def rank(self, key) -> Optional[int]:
+        """1-based position of ``key``, or None if it is not ranked."""
+        score = self._scores.get(key)
+        if score is None:
+            return None
+        return self._order.index((-score, key)) + 1
+
+    def page(self, start: int, count: int) -> List[Tuple[Hashable, int]]:
+        """``count`` entries starting at 0-based position ``start``."""
+        return [(key, -neg) for neg, key in self._order.islice(start, start + count)]
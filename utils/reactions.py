@@ -0,0 +1,48 @@
+"""Raw reaction routing shared by cogs.
+
+``bot.wait_for('reaction_add', check=...)`` runs every waiter's check on
+every reaction in every guild, and only sees messages still in the cache.
+The dispatcher instead listens to ``on_raw_reaction_add`` once and looks up
+the handler registered for the reacted message, so each event costs one
+dict lookup however many messages are being watched, and watches work on
+messages sent before a restart.
+"""
+from typing import Awaitable, Callable, Dict
+
+import discord
+
+Handler = Callable[[discord.RawReactionActionEvent], Awaitable[None]]
+
+
+class ReactionDispatcher:
+    """Routes raw reaction-add events to per-message handlers."""
+
+    def __init__(self):
+        self._handlers: Dict[int, Handler] = {}
+
+    def register(self, message_id: int, handler: Handler):
+        self._handlers[message_id] = handler
+
+    def unregister(self, message_id: int):
+        self._handlers.pop(message_id, None)
+
+    def __contains__(self, message_id: int) -> bool:
+        return message_id in self._handlers
+
+    def __len__(self) -> int:
+        return len(self._handlers)
+
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        handler = self._handlers.get(payload.message_id)
+        if handler is not None:
+            await handler(payload)
+
+
+def get_reaction_dispatcher(bot) -> ReactionDispatcher:
+    """The bot-wide dispatcher, registered as a listener on first use."""
+    dispatcher = getattr(bot, 'reaction_dispatcher', None)
+    if dispatcher is None:
+        dispatcher = ReactionDispatcher()
+        bot.add_listener(dispatcher.on_raw_reaction_add, 'on_raw_reaction_add')
+        bot.reaction_dispatcher = dispatcher
+    return dispatcher
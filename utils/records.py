@@ -0,0 +1,253 @@
+"""Compact in-memory records for per-user data.
+
+Commands index user data like dicts (``self.bank[user_id]["wallet"]``). A
+``Record`` keeps that API but stores its fields in ``__slots__``, which costs
+a fraction of a dict per user. Keys outside a record's fields (e.g. stats for
+a job added later) go to a small overflow dict created on demand.
+
+Stored records carry a schema version (``_v``). Loading does no per-user
+work on the event loop: ``RecordTable`` starts out holding the raw dicts it
+was built from, upgrades each one to the current schema the first time it is
+accessed, and ``convert_all`` upgrades the rest in batches off the loop
+right after the cog loads, so no raw dicts remain at steady state. Fields
+that are missing from old data resolve to their defaults instead of being
+written out.
+
+``RecordTable`` is the user-id -> record mapping. It also converts plain
+dicts assigned into it, so existing code like ``self.bank[uid] = {"wallet": 0,
+"bank": 0}`` keeps working.
+"""
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from utils.ledger import clamp_account, clamp_balance
+
+VERSION_KEY = '_v'
+
+
+class Record:
+    """Dict-like record with a fixed set of slotted fields."""
+
+    __slots__ = ('_extra',)
+    FIELDS: Tuple[str, ...] = ()
+    _FIELD_SET = frozenset()
+    SCHEMA_VERSION = 1
+    # version -> function upgrading a stored dict from that version to the next
+    MIGRATIONS: Dict[int, Callable[[dict], dict]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+
+    def __init__(self, **values):
+        self._extra = None
+        for field in self.FIELDS:
+            setattr(self, field, values.pop(field, 0))
+        if values:
+            self._extra = values
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Record':
+        """Build a record from stored data, upgrading it from older schema versions."""
+        data = dict(data)
+        version = data.pop(VERSION_KEY, 0)
+        while version < cls.SCHEMA_VERSION:
+            migrate = cls.MIGRATIONS.get(version)
+            if migrate is not None:
+                data = migrate(data)
+            version += 1
+        return cls(**data)
+
+    def default_for(self, key):
+        """Virtual value for a missing key; raises KeyError if there is none."""
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        if key in self._FIELD_SET:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        return self.default_for(key)
+
+    def __setitem__(self, key, value):
+        if key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key) -> bool:
+        return key in self._FIELD_SET or (self._extra is not None and key in self._extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> Iterator[str]:
+        yield from self.FIELDS
+        if self._extra:
+            yield from self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return len(self.FIELDS) + (len(self._extra) if self._extra else 0)
+
+    def items(self):
+        return ((key, self[key]) for key in self.keys())
+
+    def to_dict(self) -> dict:
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        if self._extra:
+            data.update(self._extra)
+        data[VERSION_KEY] = self.SCHEMA_VERSION
+        return data
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class BankRecord(Record):
+    """Wallet and bank balances; assignments saturate at the ledger limit."""
+
+    __slots__ = ('_wallet', '_bank')
+    FIELDS = ('wallet', 'bank')
+    SCHEMA_VERSION = 2
+    MIGRATIONS = {1: clamp_account}  # v2 bounds balances to int64
+
+    @property
+    def wallet(self) -> int:
+        return self._wallet
+
+    @wallet.setter
+    def wallet(self, value: int):
+        self._wallet = clamp_balance(value)
+
+    @property
+    def bank(self) -> int:
+        return self._bank
+
+    @bank.setter
+    def bank(self, value: int):
+        self._bank = clamp_balance(value)
+
+
+class StatsRecord(Record):
+    __slots__ = ('work_count', 'gamble_count', 'gamble_wins', 'fireman_count', 'police_count',
+                 'doctor_count', 'nurse_count', 'teacher_count', 'chef_count')
+    FIELDS = __slots__
+
+    def default_for(self, key):
+        # Counters for jobs added after a record was stored start at zero
+        if key.endswith('_count'):
+            return 0
+        raise KeyError(key)
+
+
+class LevelRecord(Record):
+    __slots__ = ('xp', 'level', 'messages', 'last_active', 'voice_seconds')
+    FIELDS = __slots__  # last_active: unix time of the last XP gain, 0 if unknown
+
+
+class HeistRecord(Record):
+    """A bank heist in progress, keyed by the id of its announcement message.
+
+    ``gathering`` heists collect crew until ``expires_at`` and are then
+    called off; a full crew moves the heist to ``starting``, and it is
+    settled when ``expires_at`` comes round again.
+    """
+
+    __slots__ = ('guild_id', 'channel_id', 'target_id', 'crew', 'state', 'expires_at')
+    FIELDS = __slots__
+    GATHERING = 'gathering'
+    STARTING = 'starting'
+
+    def to_dict(self) -> dict:
+        data = super().to_dict()
+        data['crew'] = list(self.crew)  # Snapshots must not share the live list
+        return data
+
+
+class RecordTable(dict):
+    """Mapping that converts plain dict values with ``convert``.
+
+    Values passed to the constructor are kept as-is and converted on first
+    access or by ``convert_all``; values assigned later are converted
+    immediately. Until ``convert_all`` has run, iterating ``items()``/
+    ``values()`` may yield raw dicts, which support the same read API.
+    """
+
+    def __init__(self, convert: Callable[[dict], object], data: Dict = None):
+        super().__init__()
+        self.convert = convert
+        if data:
+            super().update(data)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if type(value) is dict:
+            value = self.convert(value)
+            super().__setitem__(key, value)
+        return value
+
+    def get(self, key, default=None):
+        # One lookup instead of a membership test plus __getitem__; this is on every balance read
+        value = dict.get(self, key, default)
+        if type(value) is dict and value is not default:
+            value = self.convert(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        if type(value) is dict:
+            value = self.convert(value)
+        super().__setitem__(key, value)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def _convert_batch(self, entries: List[Tuple[object, dict]]) -> List[Tuple[object, dict, object]]:
+        convert = self.convert
+        return [(key, raw, convert(raw)) for key, raw in entries]
+
+    async def convert_all(self, run, batch_size: int = 50_000) -> int:
+        """Convert every value still held as a raw dict; returns how many were converted.
+
+        ``run`` runs a function off the event loop and returns its result
+        (e.g. ``WriteBehind.run``). Only swapping the records in happens on
+        the loop, and entries converted or replaced there in the meantime
+        are left alone.
+        """
+        pending = [(key, value) for key, value in dict.items(self) if type(value) is dict]
+        converted = 0
+        for start in range(0, len(pending), batch_size):
+            batch = await run(self._convert_batch, pending[start:start + batch_size])
+            for key, raw, record in batch:
+                if dict.get(self, key) is raw:
+                    dict.__setitem__(self, key, record)
+                    converted += 1
+        return converted
+
+
+def copy_record(value):
+    """Plain-dict copy of a record or dict for serialization."""
+    if isinstance(value, dict):
+        return dict(value)
+    to_dict = getattr(value, 'to_dict', None)
+    return to_dict() if to_dict is not None else value
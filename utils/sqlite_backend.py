@@ -0,0 +1,115 @@
+"""SQLite storage backend for ``WriteBehind``.
+
+Each store lives in its own table of ``(key, data)`` rows where ``data`` is
+the record's JSON. Flushes upsert only the rows that were marked dirty, so the
+cost of a write depends on how much changed rather than on how many users
+exist. The database runs in WAL mode and the connection is owned by the
+``WriteBehind`` writer thread: every method here is called from that thread.
+
+Run as a module to import existing JSON files into a database::
+
+    python -m utils.sqlite_backend economy.db bank=bank.json stats=stats.json
+"""
+import json
+import os
+import sqlite3
+import sys
+from typing import Dict, Iterable, Optional, Set
+
+from utils.persistence import ALL_KEYS
+from utils.records import copy_record
+
+
+class SQLiteBackend:
+    """Stores one table per store and writes dirty rows as single upserts.
+
+    If ``json_paths`` is given and the database file does not exist yet, the
+    JSON files are imported the first time the database is opened.
+    """
+
+    def __init__(self, path: str, stores: Iterable[str], json_paths: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.stores = set(stores)
+        self.json_paths = dict(json_paths or {})
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            fresh = not os.path.exists(self.path)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            for store in self.stores:
+                self._conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{store}" (key TEXT PRIMARY KEY, data TEXT NOT NULL)'
+                )
+            self._conn.commit()
+            if fresh and self.json_paths:
+                self.import_json(self.json_paths)
+        return self._conn
+
+    def _table(self, name: str) -> str:
+        if name not in self.stores:
+            raise KeyError(f"Unknown store: {name}")
+        return f'"{name}"'
+
+    def load(self, name: str) -> dict:
+        rows = self.conn.execute(f'SELECT key, data FROM {self._table(name)}')
+        return {key: json.loads(data) for key, data in rows}
+
+    def snapshot(self, name: str, data: dict, keys: Set) -> dict:
+        if ALL_KEYS in keys:
+            keys = data.keys()
+        # None marks a row that was removed from the store
+        return {key: copy_record(data[key]) if key in data else None for key in keys}
+
+    def write(self, name: str, snapshot: dict, keys: Set):
+        table = self._table(name)
+        upserts = [(key, json.dumps(value)) for key, value in snapshot.items() if value is not None]
+        deletes = [(key,) for key, value in snapshot.items() if value is None]
+        with self.conn:
+            if ALL_KEYS in keys:
+                self.conn.execute(f'DELETE FROM {table}')
+            self.conn.executemany(
+                f'INSERT INTO {table} (key, data) VALUES (?, ?) '
+                f'ON CONFLICT(key) DO UPDATE SET data = excluded.data',
+                upserts
+            )
+            if deletes:
+                self.conn.executemany(f'DELETE FROM {table} WHERE key = ?', deletes)
+
+    def import_json(self, paths: Dict[str, str]) -> Dict[str, int]:
+        """Copy JSON files into their tables, replacing existing rows. Returns rows per store."""
+        counts = {}
+        for name, path in paths.items():
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = {}
+            self.write(name, data, {ALL_KEYS})
+            counts[name] = len(data)
+        return counts
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def main(argv):
+    if len(argv) < 2:
+        print("Usage: python -m utils.sqlite_backend <database> <store>=<file.json> ...")
+        return 1
+    paths = dict(arg.split('=', 1) for arg in argv[1:])
+    backend = SQLiteBackend(argv[0], paths)
+    counts = backend.import_json(paths)
+    backend.close()
+    for name, count in counts.items():
+        print(f"Imported {count} rows into {name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,230 @@
+"""Simulated stock exchange for the Economy cog.
+
+Prices for every listed symbol advance together in one vectorized step: a
+geometric random walk with per-symbol drift and volatility. Each tick also
+folds the new prices into 1-minute and 1-hour OHLC candles, kept in
+fixed-size ring buffers, and revalues every holder's portfolio at once.
+
+Holdings are stored column-wise, one row per (holder, symbol) position, so
+valuing 100k portfolios is a gather and a ``bincount`` rather than a Python
+loop. ``!portfolio`` and the stock leaderboard read the values cached by
+the last tick.
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SECONDS_PER_HOUR = 3600
+
+
+class CandleSeries:
+    """OHLC candles of one period for every symbol, newest ``capacity`` kept."""
+
+    def __init__(self, period: int, capacity: int, symbols: int):
+        self.period = period
+        self.capacity = capacity
+        self.open = np.zeros((capacity, symbols))
+        self.high = np.zeros((capacity, symbols))
+        self.low = np.zeros((capacity, symbols))
+        self.close = np.zeros((capacity, symbols))
+        self.volume = np.zeros((capacity, symbols), dtype=np.int64)
+        self.starts = np.zeros(capacity, dtype=np.int64)
+        self.head = -1
+        self.count = 0
+
+    def update(self, now: float, prices: np.ndarray):
+        """Fold a price print for every symbol into the current candle."""
+        bucket = int(now // self.period) * self.period
+        if self.head < 0 or bucket != self.starts[self.head]:
+            self.head = (self.head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.starts[self.head] = bucket
+            self.open[self.head] = prices
+            self.high[self.head] = prices
+            self.low[self.head] = prices
+            self.volume[self.head] = 0
+        else:
+            np.maximum(self.high[self.head], prices, out=self.high[self.head])
+            np.minimum(self.low[self.head], prices, out=self.low[self.head])
+        self.close[self.head] = prices
+
+    def add_volume(self, symbol: int, shares: int):
+        if self.head >= 0:
+            self.volume[self.head, symbol] += shares
+
+    def recent(self, symbol: int, count: int) -> List[Tuple[int, float, float, float, float, int]]:
+        """Up to ``count`` ``(start, open, high, low, close, volume)`` candles, oldest first."""
+        count = min(count, self.count)
+        rows = [(self.head - i) % self.capacity for i in range(count - 1, -1, -1)]
+        return [(int(self.starts[r]), float(self.open[r, symbol]), float(self.high[r, symbol]),
+                 float(self.low[r, symbol]), float(self.close[r, symbol]), int(self.volume[r, symbol]))
+                for r in rows]
+
+
+class Holdings:
+    """Share counts as parallel (holder, symbol, shares) columns."""
+
+    def __init__(self, capacity: int = 1024):
+        self.holders: List[str] = []
+        self._holder_index: Dict[str, int] = {}
+        self._rows: List[Dict[int, int]] = []  # Per holder: symbol -> row
+        self.holder = np.zeros(capacity, dtype=np.int64)
+        self.symbol = np.zeros(capacity, dtype=np.int64)
+        self.shares = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+
+    def holder_index(self, user_id: str) -> int:
+        index = self._holder_index.get(user_id)
+        if index is None:
+            index = self._holder_index[user_id] = len(self.holders)
+            self.holders.append(user_id)
+            self._rows.append({})
+        return index
+
+    def find(self, user_id: str) -> Optional[int]:
+        return self._holder_index.get(user_id)
+
+    def get(self, user_id: str, symbol: int) -> int:
+        holder = self._holder_index.get(user_id)
+        row = self._rows[holder].get(symbol) if holder is not None else None
+        return int(self.shares[row]) if row is not None else 0
+
+    def add(self, user_id: str, symbol: int, delta: int) -> int:
+        """Change a position by ``delta`` shares and return the new count."""
+        holder = self.holder_index(user_id)
+        row = self._rows[holder].get(symbol)
+        if row is None:
+            if self.size == len(self.shares):
+                self._grow()
+            row = self._rows[holder][symbol] = self.size
+            self.holder[row] = holder
+            self.symbol[row] = symbol
+            self.size += 1
+        # Emptied positions keep their row; they value to zero
+        self.shares[row] += delta
+        return int(self.shares[row])
+
+    def _grow(self):
+        capacity = len(self.shares) * 2
+        for name in ('holder', 'symbol', 'shares'):
+            column = np.zeros(capacity, dtype=np.int64)
+            column[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, column)
+
+    def positions(self, user_id: str) -> List[Tuple[int, int]]:
+        """``(symbol, shares)`` for a holder's non-empty positions."""
+        holder = self._holder_index.get(user_id)
+        if holder is None:
+            return []
+        return [(symbol, int(self.shares[row])) for symbol, row in self._rows[holder].items() if self.shares[row]]
+
+    def value(self, prices: np.ndarray) -> np.ndarray:
+        """Market value of every holder's portfolio, indexed like ``holders``."""
+        n = self.size
+        return np.bincount(self.holder[:n], weights=self.shares[:n] * prices[self.symbol[:n]],
+                           minlength=len(self.holders))
+
+
+class Exchange:
+    """Listed symbols, their prices and candles, and everyone's holdings."""
+
+    def __init__(self, listings: Dict[str, dict], now: Optional[float] = None,
+                 minute_candles: int = 120, hour_candles: int = 168):
+        self.symbols: List[str] = list(listings)
+        self.index: Dict[str, int] = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.prices = np.array([listings[s]['price'] for s in self.symbols], dtype=np.float64)
+        self.drift = np.array([listings[s].get('drift', 0.0) for s in self.symbols], dtype=np.float64)
+        self.volatility = np.array([listings[s].get('volatility', 0.02) for s in self.symbols], dtype=np.float64)
+        self.minute = CandleSeries(60, minute_candles, len(self.symbols))
+        self.hour = CandleSeries(SECONDS_PER_HOUR, hour_candles, len(self.symbols))
+        if now is not None:
+            # Open the first candles so trades before the first tick count towards volume
+            self.minute.update(now, self.prices)
+            self.hour.update(now, self.prices)
+        self.holdings = Holdings()
+        self.values = np.zeros(0)
+        self._ranking = None
+
+    def load_portfolios(self, portfolios: Dict[str, Dict[str, int]]):
+        """Index the persisted ``{user_id: {symbol: shares}}`` store; delisted symbols are skipped."""
+        for user_id, positions in portfolios.items():
+            for symbol, shares in positions.items():
+                if symbol in self.index and shares:
+                    self.holdings.add(user_id, self.index[symbol], shares)
+        self.revalue()
+
+    def tick(self, now: float, dt: float, rng: np.random.Generator):
+        """Advance every price by ``dt`` seconds of random walk and revalue all holdings."""
+        hours = dt / SECONDS_PER_HOUR
+        shocks = rng.standard_normal(len(self.prices))
+        self.prices *= np.exp((self.drift - 0.5 * self.volatility ** 2) * hours
+                              + self.volatility * math.sqrt(hours) * shocks)
+        # Keep a floor so a crashed stock can still recover
+        np.maximum(self.prices, 0.01, out=self.prices)
+        self.minute.update(now, self.prices)
+        self.hour.update(now, self.prices)
+        self.revalue()
+
+    def revalue(self):
+        self.values = self.holdings.value(self.prices)
+        self._ranking = None
+
+    def price(self, symbol: str) -> float:
+        return float(self.prices[self.index[symbol]])
+
+    def quote(self, symbol: str, shares: int) -> Tuple[int, int]:
+        """``(cost to buy, proceeds from selling)`` ``shares`` at the current price, in whole dollars."""
+        amount = self.price(symbol) * shares
+        return math.ceil(amount), math.floor(amount)
+
+    def trade(self, user_id: str, symbol: str, delta: int) -> int:
+        """Apply a filled buy (positive) or sell (negative); returns the new position."""
+        index = self.index[symbol]
+        shares = self.holdings.add(user_id, index, delta)
+        self.minute.add_volume(index, abs(delta))
+        self.hour.add_volume(index, abs(delta))
+        holder = self.holdings.find(user_id)
+        if holder >= len(self.values):
+            self.values = np.append(self.values, np.zeros(holder + 1 - len(self.values)))
+        self.values[holder] += delta * self.prices[index]
+        self._ranking = None
+        return shares
+
+    def portfolio(self, user_id: str) -> List[Tuple[str, int, float]]:
+        """``(symbol, shares, value)`` for each of a holder's positions, largest first."""
+        rows = [(self.symbols[symbol], shares, shares * float(self.prices[symbol]))
+                for symbol, shares in self.holdings.positions(user_id)]
+        return sorted(rows, key=lambda row: -row[2])
+
+    def value(self, user_id: str) -> float:
+        holder = self.holdings.find(user_id)
+        return float(self.values[holder]) if holder is not None and holder < len(self.values) else 0.0
+
+    def ranking(self) -> np.ndarray:
+        """Holder indices with a non-zero portfolio, most valuable first; sorted once per tick."""
+        if self._ranking is None:
+            order = np.argsort(-self.values, kind='stable')
+            self._ranking = order[self.values[order] > 0]
+        return self._ranking
+
+    def top(self, start: int, count: int) -> List[Tuple[str, float]]:
+        ranking = self.ranking()[start:start + count]
+        return [(self.holdings.holders[i], float(self.values[i])) for i in ranking.tolist()]
+
+    def change(self, symbol: str, series: 'CandleSeries', count: int) -> float:
+        """Fractional price change since the open of the ``count``-th most recent candle."""
+        candles = series.recent(self.index[symbol], count)
+        if not candles or not candles[0][1]:
+            return 0.0
+        return self.price(symbol) / candles[0][1] - 1
+
+    def listings(self) -> Dict[str, dict]:
+        """Current prices in the persisted ``{symbol: {'price': ...}}`` form."""
+        return {symbol: {'price': round(price, 4)} for symbol, price in zip(self.symbols, self.prices.tolist())}
+
+
+def merge_listings(defaults: Dict[str, dict], saved: Dict[str, dict]) -> Dict[str, dict]:
+    """Listings from the rules, starting from the last saved price where there is one."""
+    return {symbol: {**listing, 'price': saved.get(symbol, {}).get('price', listing['price'])}
+            for symbol, listing in defaults.items()}
@@ -0,0 +1,55 @@
+"""Target resolution for bulk admin commands.
+
+Bulk commands take any mix of member mentions, role mentions and a
+``since:YYYY-MM-DD`` activity filter. ``resolve_targets`` turns those into a
+de-duplicated member list with a single pass over the guild's member cache,
+instead of one lookup or role scan per target.
+"""
+import datetime
+from typing import Iterable, List, Optional, Set, Union
+
+import discord
+from discord.ext import commands
+
+Target = Union[discord.Member, discord.Role]
+
+
+class ActiveSince(commands.Converter):
+    """Converts ``since:YYYY-MM-DD`` to a UTC unix timestamp."""
+
+    async def convert(self, ctx, argument: str) -> int:
+        if not argument.lower().startswith('since:'):
+            raise commands.BadArgument(f"Expected since:YYYY-MM-DD, got {argument}")
+        try:
+            date = datetime.datetime.strptime(argument[6:], '%Y-%m-%d')
+        except ValueError:
+            raise commands.BadArgument(f"Invalid date {argument[6:]}, use YYYY-MM-DD")
+        return int(date.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def resolve_targets(guild: discord.Guild, targets: Iterable[Target],
+                    active_ids: Optional[Set[str]] = None) -> List[discord.Member]:
+    """Members mentioned directly, holding any mentioned role, or listed in ``active_ids``.
+
+    Bots are skipped and every member appears once. Mentioning ``@everyone``
+    selects every cached member.
+    """
+    members = {}
+    role_ids = set()
+    for target in targets:
+        if isinstance(target, discord.Role):
+            role_ids.add(target.id)
+        else:
+            members[target.id] = target
+
+    everyone = guild.id in role_ids  # The @everyone role shares the guild's id
+    if role_ids or active_ids:
+        for member in guild.members:
+            if member.id in members:
+                continue
+            if (everyone
+                    or (active_ids and str(member.id) in active_ids)
+                    or any(member.get_role(role_id) is not None for role_id in role_ids)):
+                members[member.id] = member
+
+    return [member for member in members.values() if not member.bot]
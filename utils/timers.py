@@ -0,0 +1,107 @@
+"""Deadline timers shared by cogs.
+
+Instead of one sleeping task (or ``wait_for`` timeout) per pending thing,
+every deadline goes into one min-heap served by a single task that sleeps
+until the earliest one. Deadlines are wall-clock unix times, so records that
+persist them can be rescheduled after a restart; anything already overdue
+fires straight away.
+
+Rescheduling or cancelling a key leaves its old heap entry behind; it is
+skipped when it reaches the top.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple
+
+log = logging.getLogger(__name__)
+
+Callback = Callable[[], Awaitable[None]]
+
+
+class TimerHeap:
+    """Runs async callbacks at their deadlines from one background task."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._timers: Dict[Hashable, Tuple[int, Callback]] = {}  # key -> (entry id, callback)
+        self._ids = itertools.count()
+        self._wakeup = None
+        self._task = None
+        self._running = set()  # Callbacks in flight, kept referenced until done
+
+    def schedule(self, key: Hashable, deadline: float, callback: Callback):
+        """Call ``callback()`` at ``deadline``, replacing any timer already set for ``key``."""
+        entry_id = next(self._ids)
+        self._timers[key] = (entry_id, callback)
+        heapq.heappush(self._heap, (deadline, entry_id, key))
+        self._ensure_running()
+        if self._heap[0][1] == entry_id:
+            self._wakeup.set()  # New earliest deadline
+
+    def cancel(self, key: Hashable) -> bool:
+        return self._timers.pop(key, None) is not None
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _next_due(self):
+        # Drop entries for timers that were cancelled or rescheduled
+        while self._heap:
+            deadline, entry_id, key = self._heap[0]
+            timer = self._timers.get(key)
+            if timer is not None and timer[0] == entry_id:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    async def _run(self):
+        # Exits once stop() or a restart replaced this task; see WriteBehind._run
+        while self._task is asyncio.current_task():
+            self._wakeup.clear()
+            deadline = self._next_due()
+            if deadline is None:
+                await self._wakeup.wait()
+                continue
+            delay = deadline - self.clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, key = heapq.heappop(self._heap)
+            _, callback = self._timers.pop(key)
+            task = asyncio.get_running_loop().create_task(callback())
+            self._running.add(task)
+            task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Timer callback failed", exc_info=task.exception())
+
+    def stop(self):
+        if self._task is not None:
+            self._task = None
+            self._wakeup.set()
+
+
+def get_timer_heap(bot) -> TimerHeap:
+    """The bot-wide timer heap, created on first use so every cog shares it."""
+    timers = getattr(bot, 'timer_heap', None)
+    if timers is None:
+        timers = TimerHeap()
+        bot.timer_heap = timers
+    return timers
@@ -0,0 +1,150 @@
+"""Single-elimination pet tournaments simulated a whole round at a time.
+
+Entrants are shuffled into a bracket padded to a power of two; byes are
+spread so that no two byes meet. Each round draws every match's power rolls
+(``strength * uniform(*PET_POWER_ROLL)``, as in ``!challenge``) as one NumPy
+array, so a 1,024-pet bracket is ten vectorized steps rather than 1,023
+separate battles.
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.economy_rules import PET_POWER_ROLL, TOURNAMENT_CHAMPION_SHARE
+
+BYE = -1
+
+
+class RoundResult(NamedTuple):
+    """Entrant indices, power rolls and winners for every match in one round."""
+    left: np.ndarray
+    right: np.ndarray      # BYE where the left entrant advances unopposed
+    left_power: np.ndarray
+    right_power: np.ndarray
+    winners: np.ndarray
+
+
+class Bracket:
+    """The simulated rounds of a tournament, first round first."""
+
+    def __init__(self, entrants: Sequence[str], rounds: List[RoundResult]):
+        self.entrants = list(entrants)
+        self.rounds = rounds
+
+    @property
+    def champion(self) -> str:
+        return self.entrants[int(self.rounds[-1].winners[0])]
+
+    @property
+    def runner_up(self) -> str:
+        final = self.rounds[-1]
+        loser = final.right[0] if final.winners[0] == final.left[0] else final.left[0]
+        return self.entrants[int(loser)]
+
+    @property
+    def matches(self) -> int:
+        return sum(int((result.right != BYE).sum()) for result in self.rounds)
+
+    def match_lines(self, names: Dict[str, str]) -> List[str]:
+        """One line per match played, final first; byes are left out."""
+        lines = []
+        for number in range(len(self.rounds), 0, -1):
+            result = self.rounds[number - 1]
+            title = round_name(len(self.rounds) - number + 1, number)
+            for left, right, left_power, right_power, winner in zip(
+                    result.left.tolist(), result.right.tolist(), result.left_power.tolist(),
+                    result.right_power.tolist(), result.winners.tolist()):
+                if right == BYE:
+                    continue
+                if winner == left:
+                    win, lose, win_power, lose_power = left, right, left_power, right_power
+                else:
+                    win, lose, win_power, lose_power = right, left, right_power, left_power
+                lines.append(f"**{title}:** {names.get(self.entrants[win], self.entrants[win])} ({win_power:.1f}) "
+                             f"def. {names.get(self.entrants[lose], self.entrants[lose])} ({lose_power:.1f})")
+        return lines
+
+
+def round_name(rounds_left: int, number: int) -> str:
+    return {1: "Final", 2: "Semifinal", 3: "Quarterfinal"}.get(rounds_left, f"Round {number}")
+
+
+def seed_bracket(count: int, rng: np.random.Generator) -> np.ndarray:
+    """Shuffled first-round slots padded with byes, at most one bye per match."""
+    size = 1 << (count - 1).bit_length()
+    order = rng.permutation(count)
+    slots = np.full(size, BYE, dtype=np.int64)
+    half = size // 2
+    slots[0::2] = order[:half]
+    slots[1:2 * (count - half):2] = order[half:]
+    return slots
+
+
+def simulate_bracket(entrants: Sequence[str], strengths: Sequence[float],
+                     rng: Optional[np.random.Generator] = None) -> Bracket:
+    """Play out a bracket. As in ``!challenge``, a tie goes to the right-hand pet."""
+    if len(entrants) < 2:
+        raise ValueError("A tournament needs at least two entrants")
+    rng = rng if rng is not None else np.random.default_rng()
+    strengths = np.asarray(strengths, dtype=np.float64)
+    low, high = PET_POWER_ROLL
+
+    slots = seed_bracket(len(entrants), rng)
+    rounds = []
+    while len(slots) > 1:
+        left, right = slots[0::2], slots[1::2]
+        left_power = strengths[left] * rng.uniform(low, high, len(left))
+        right_power = np.where(right != BYE, strengths[right] * rng.uniform(low, high, len(right)), -1.0)
+        winners = np.where(left_power > right_power, left, right)
+        rounds.append(RoundResult(left, right, left_power, right_power, winners))
+        slots = winners
+    return Bracket(entrants, rounds)
+
+
+def settlement(bracket: Bracket, entry_fee: int, bets: Dict[str, Tuple[str, int]]) -> Dict[str, int]:
+    """Net wallet change per user for entry fees, prizes and bets.
+
+    The fee pool goes to the champion and runner-up. Bets are pari-mutuel:
+    everyone who backed the champion splits the whole bet pool in proportion
+    to their stake. If nobody backed the champion, bets are void. No money
+    is created or destroyed.
+    """
+    deltas: Dict[str, int] = {}
+
+    def add(user_id, amount):
+        deltas[user_id] = deltas.get(user_id, 0) + amount
+
+    pool = entry_fee * len(bracket.entrants)
+    for user_id in bracket.entrants:
+        add(user_id, -entry_fee)
+    champion_prize = int(pool * TOURNAMENT_CHAMPION_SHARE)
+    add(bracket.champion, champion_prize)
+    add(bracket.runner_up, pool - champion_prize)
+
+    winning = [(bettor, amount) for bettor, (pick, amount) in bets.items() if pick == bracket.champion]
+    if winning:
+        pot = sum(amount for _, amount in bets.values())
+        staked = sum(amount for _, amount in winning)
+        for bettor, (_, amount) in bets.items():
+            add(bettor, -amount)
+        paid = 0
+        for bettor, amount in winning:
+            share = pot * amount // staked
+            add(bettor, share)
+            paid += share
+        add(winning[0][0], pot - paid)  # Rounding remainder
+    return {user_id: delta for user_id, delta in deltas.items() if delta}
+
+
+class TournamentSignup:
+    """Entrants and side bets collected before a tournament starts."""
+
+    def __init__(self, entry_fee: int, host_id: int):
+        self.entry_fee = entry_fee
+        self.host_id = host_id
+        self.entrants: Dict[str, str] = {}          # user id -> display name, in join order
+        self.bets: Dict[str, Tuple[str, int]] = {}  # bettor id -> (entrant id, amount)
+
+    @property
+    def bet_pool(self) -> int:
+        return sum(amount for _, amount in self.bets.values())
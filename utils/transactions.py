@@ -0,0 +1,181 @@
+"""Atomic multi-account balance transactions.
+
+A transaction stages balance changes and, when its block exits, checks them
+against the invariants (no negative balances, nothing past
+``ledger.MAX_BALANCE``) and applies them together with a single
+``on_commit`` call for persistence. If the block raises or a check fails,
+nothing is applied.
+
+Changes are staged as deltas, and the check and the apply happen in one step
+with nothing awaited in between. On the event loop no other command can run
+during that step, so it needs no lock: a command that awaits inside its
+block can't lose another command's update, because what it staged is added
+to the balances as they are when it commits. Nothing is held while a block
+awaits, so a slow command never holds up others touching the same accounts.
+
+Commands that decide and pay without awaiting use
+``AccountTransactions.credit``, ``debit`` and ``transfer`` instead, which
+check and apply a change to one or two balances straight away without a
+staging ``Transaction``.
+"""
+from typing import Callable, Dict, Tuple
+
+from utils.ledger import MAX_BALANCE
+
+
+class TransactionError(Exception):
+    """Raised when a transaction would break an invariant; nothing is applied."""
+
+
+def _reject(user_id: str, field: str, balance: int):
+    if balance < 0:
+        raise TransactionError(f"{user_id} would have a negative {field} balance")
+    raise TransactionError(f"{user_id} would exceed the {field} balance limit")
+
+
+class Transaction:
+    """Staged balance changes, committed when the ``with`` block exits."""
+
+    __slots__ = ('owner', 'bank', '_deltas')
+
+    def __init__(self, owner: 'AccountTransactions'):
+        self.owner = owner
+        self.bank = owner.bank
+        self._deltas: Dict[Tuple[str, str], int] = {}
+
+    def balance(self, user_id: str, field: str = 'wallet') -> int:
+        """Balance including the changes staged so far."""
+        account = self.bank.get(user_id)
+        current = account[field] if account is not None else 0
+        return current + self._deltas.get((user_id, field), 0)
+
+    def credit(self, user_id: str, amount: int, field: str = 'wallet'):
+        key = (user_id, field)
+        deltas = self._deltas
+        deltas[key] = deltas.get(key, 0) + amount
+
+    def debit(self, user_id: str, amount: int, field: str = 'wallet'):
+        self.credit(user_id, -amount, field)
+
+    def transfer(self, source: str, target: str, amount: int,
+                 source_field: str = 'wallet', target_field: str = 'wallet'):
+        deltas = self._deltas
+        key = (source, source_field)
+        deltas[key] = deltas.get(key, 0) - amount
+        key = (target, target_field)
+        deltas[key] = deltas.get(key, 0) + amount
+
+    def check(self):
+        """Raise ``TransactionError`` if any staged balance would go negative or past the limit."""
+        get = self.bank.get
+        for (user_id, field), delta in self._deltas.items():
+            account = get(user_id)
+            balance = (account[field] if account is not None else 0) + delta
+            if not 0 <= balance <= MAX_BALANCE:
+                _reject(user_id, field, balance)
+
+    def commit(self) -> Tuple[str, ...]:
+        """Check and then apply every staged change; returns the accounts touched.
+
+        Each account is looked up once for both steps. Nothing is applied if
+        the check fails.
+        """
+        bank = self.bank
+        get = bank.get
+        staged = []
+        for (user_id, field), delta in self._deltas.items():
+            account = get(user_id)
+            balance = (account[field] if account is not None else 0) + delta
+            if not 0 <= balance <= MAX_BALANCE:
+                _reject(user_id, field, balance)
+            staged.append((user_id, account, field, balance))
+        touched = {}
+        for user_id, account, field, balance in staged:
+            if account is None:
+                account = get(user_id)  # Opened by an earlier change in this loop
+                if account is None:
+                    bank[user_id] = {"wallet": 0, "bank": 0}
+                    account = bank[user_id]  # The store may have converted it into a record
+            account[field] = balance
+            touched[user_id] = None
+        self._deltas.clear()
+        return tuple(touched)
+
+    def __enter__(self) -> 'Transaction':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        owner = self.owner
+        if exc_type is not None:
+            owner.aborts += 1
+            return False
+        if self._deltas:
+            try:
+                touched = self.commit()
+            except TransactionError:
+                owner.aborts += 1
+                raise
+            owner.on_commit(*touched)
+            owner.commits += 1
+        return False
+
+
+class AccountTransactions:
+    """Hands out transactions over ``bank`` and persists what they commit through ``on_commit``."""
+
+    def __init__(self, bank: dict, on_commit: Callable[..., None]):
+        self.bank = bank
+        self.on_commit = on_commit
+        self.commits = 0
+        self.aborts = 0
+
+    def begin(self) -> Transaction:
+        """A ``Transaction`` that commits when its block exits.
+
+        Used as ``with transactions.begin() as txn``; the block may await.
+        """
+        return Transaction(self)
+
+    def credit(self, user_id: str, amount: int, field: str = 'wallet'):
+        """Add ``amount`` to one balance and persist it, or raise ``TransactionError`` and change nothing."""
+        bank = self.bank
+        account = bank.get(user_id)
+        balance = (account[field] if account is not None else 0) + amount
+        if not 0 <= balance <= MAX_BALANCE:
+            self.aborts += 1
+            _reject(user_id, field, balance)
+        if account is None:
+            bank[user_id] = {"wallet": 0, "bank": 0}
+            account = bank[user_id]
+        account[field] = balance
+        self.on_commit(user_id)
+        self.commits += 1
+
+    def debit(self, user_id: str, amount: int, field: str = 'wallet'):
+        """Take ``amount`` from one balance and persist it, or raise ``TransactionError`` and change nothing."""
+        self.credit(user_id, -amount, field)
+
+    def transfer(self, source: str, target: str, amount: int,
+                 source_field: str = 'wallet', target_field: str = 'wallet'):
+        """Move ``amount`` between two existing balances and persist both, or raise ``TransactionError``."""
+        get = self.bank.get
+        src, dst = get(source), get(target)
+        if src is None or dst is None or (source == target and source_field == target_field):
+            with self.begin() as txn:  # Opens accounts, or nets out to nothing
+                txn.transfer(source, target, amount, source_field, target_field)
+            return
+        src_balance = src[source_field] - amount
+        dst_balance = dst[target_field] + amount
+        if not 0 <= src_balance <= MAX_BALANCE:
+            self.aborts += 1
+            _reject(source, source_field, src_balance)
+        if not 0 <= dst_balance <= MAX_BALANCE:
+            self.aborts += 1
+            _reject(target, target_field, dst_balance)
+        src[source_field] = src_balance
+        dst[target_field] = dst_balance
+        if source == target:
+            self.on_commit(source)
+        else:
+            self.on_commit(source, target)
+        self.commits += 1
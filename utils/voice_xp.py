@@ -0,0 +1,68 @@
+"""Voice-time accounting for the Leveling cog.
+
+Nothing polls the members sitting in voice. A session opens when a voice
+state update makes a member eligible (in a channel that isn't the AFK
+channel, and neither muted nor deafened) and closes when an update makes
+them ineligible; closing credits the time in between. A periodic sweep
+credits every open session up to now in one batch, so long sessions show up
+on the leaderboard without waiting for the member to leave, and a restart
+loses at most one sweep interval.
+
+Time is credited in whole XP points. A sweep keeps the leftover seconds in
+the session, so sweeping often doesn't round time away.
+"""
+from typing import Dict, Hashable, List, Optional, Tuple
+
+Credit = Tuple[int, float, int]  # (XP points, seconds, channel id)
+
+
+def voice_eligible(state, afk_channel) -> bool:
+    """Whether a member in this voice state should be accruing XP."""
+    channel = state.channel
+    if channel is None or (afk_channel is not None and channel.id == afk_channel.id):
+        return False
+    return not (state.self_mute or state.self_deaf or state.mute or state.deaf)
+
+
+class VoiceSessions:
+    """Start times of eligible voice sessions, keyed by (guild id, user id)."""
+
+    def __init__(self, seconds_per_point: float):
+        self.seconds_per_point = seconds_per_point
+        self._open: Dict[Hashable, List] = {}  # key -> [start, channel id]
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._open
+
+    def open(self, key: Hashable, channel_id: int, now: float):
+        """Start a session, or move an open one to another channel without closing it."""
+        session = self._open.get(key)
+        if session is None:
+            self._open[key] = [now, channel_id]
+        else:
+            session[1] = channel_id
+
+    def close(self, key: Hashable, now: float) -> Optional[Credit]:
+        session = self._open.pop(key, None)
+        if session is None:
+            return None
+        start, channel_id = session
+        seconds = max(now - start, 0.0)
+        return int(seconds // self.seconds_per_point), seconds, channel_id
+
+    def sweep(self, now: float) -> List[Tuple[Hashable, Credit]]:
+        """Credit every open session up to ``now``; sessions stay open."""
+        credits = []
+        for key, session in self._open.items():
+            points = int(max(now - session[0], 0.0) // self.seconds_per_point)
+            if points:
+                seconds = points * self.seconds_per_point
+                session[0] += seconds
+                credits.append((key, (points, seconds, session[1])))
+        return credits
+
+    def keys(self):
+        return self._open.keys()
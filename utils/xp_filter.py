@@ -0,0 +1,107 @@
+"""Content checks that keep repeated or trivial messages from earning XP.
+
+The cooldown alone lets a user paste the same text once a minute. Each
+user's last few rewarded messages are remembered as hashes of their
+normalized content (case-folded, whitespace collapsed) in a fixed-size ring
+mirrored by a set, so "seen recently?" is a set lookup and recording a
+message evicts at most one old hash. Only users seen recently are tracked;
+the least recently seen is dropped past ``max_users``.
+
+Messages that are too short, or whose characters carry too little
+information (``aaaaaaa``, ``lol lol lol``), are rejected without touching
+the history. A short message can't reach much entropy even when every
+character differs (five characters top out at log2(5) = 2.32 bits), so the
+entropy floor is ``entropy_ratio`` of that maximum until it reaches
+``min_entropy``. Both checks read a bounded prefix of the message, so the
+work per message doesn't grow with its length.
+"""
+import math
+from collections import Counter, OrderedDict
+from typing import List, Optional, Set
+
+REPEATED = 'repeated'
+TRIVIAL = 'trivial'
+
+
+def normalize(content: str) -> str:
+    return ' '.join(content.casefold().split())
+
+
+def char_entropy(text: str) -> float:
+    """Shannon entropy of ``text``'s characters, in bits per character."""
+    if not text:
+        return 0.0
+    n = len(text)
+    return -sum(count / n * math.log2(count / n) for count in Counter(text).values())
+
+
+class _History:
+    """A user's last ``size`` fingerprints, oldest overwritten first."""
+
+    __slots__ = ('ring', 'seen', 'head')
+
+    def __init__(self, size: int):
+        self.ring: List[Optional[int]] = [None] * size
+        self.seen: Set[int] = set()  # Repeats are rejected before they're added, so the ring has no duplicates
+        self.head = 0
+
+    def add(self, fingerprint: int):
+        self.seen.discard(self.ring[self.head])
+        self.ring[self.head] = fingerprint
+        self.seen.add(fingerprint)
+        self.head = (self.head + 1) % len(self.ring)
+
+
+class MessageFilter:
+    """Rejects messages a user already sent recently and low-effort ones.
+
+    >>> f = MessageFilter()
+    >>> [f.check(1, text) for text in ('hello', 'thanks', 'good game', 'lmaoo', 'sure!')]
+    [None, None, None, None, None]
+    >>> [f.check(1, text) for text in ('aaaaa', 'lolol', 'hahaha', 'lol lol lol', 'hi')]
+    ['trivial', 'trivial', 'trivial', 'trivial', 'trivial']
+    >>> f.check(1, 'Hello')
+    'repeated'
+    """
+
+    def __init__(self, window: int = 20, max_users: int = 10000, min_length: int = 5,
+                 min_entropy: float = 2.0, entropy_ratio: float = 0.75, sample: int = 256):
+        self.window = window
+        self.max_users = max_users
+        self.min_length = min_length
+        self.min_entropy = min_entropy
+        self.entropy_ratio = entropy_ratio
+        self.sample = sample
+        self._histories: 'OrderedDict[object, _History]' = OrderedDict()
+        self.stats = {'checked': 0, REPEATED: 0, TRIVIAL: 0}
+
+    def __len__(self) -> int:
+        return len(self._histories)
+
+    def entropy_floor(self, length: int) -> float:
+        """The entropy a message of ``length`` characters needs, in bits per character."""
+        return min(self.min_entropy, self.entropy_ratio * math.log2(length)) if length > 1 else 0.0
+
+    def check(self, user_id, content: str) -> Optional[str]:
+        """Why the message shouldn't earn XP (``REPEATED``/``TRIVIAL``), or None if it should.
+
+        A message that passes is remembered, so sending it again is rejected.
+        """
+        self.stats['checked'] += 1
+        text = normalize(content[:self.sample * 4])[:self.sample]
+        if len(text) < self.min_length or char_entropy(text) < self.entropy_floor(len(text)):
+            self.stats[TRIVIAL] += 1
+            return TRIVIAL
+        fingerprint = hash(text)
+        history = self._histories.get(user_id)
+        if history is None:
+            history = self._histories[user_id] = _History(self.window)
+            if len(self._histories) > self.max_users:
+                self._histories.popitem(last=False)
+        else:
+            self._histories.move_to_end(user_id)
+            if fingerprint in history.seen:
+                self.stats[REPEATED] += 1
+                return REPEATED
+        history.add(fingerprint)
+        return None
@@ -0,0 +1,83 @@
+"""XP multipliers for the Leveling cog, compiled per guild.
+
+A guild's config sets multipliers for channels (0 in spam channels, 2 in
+event channels), roles, and a timed boost that applies guild-wide:
+
+    {"channels": {"<channel id>": 0.0}, "roles": {"<role id>": 1.5},
+     "boost": {"multiplier": 2.0, "ends": <unix time>}}
+
+``XPMultipliers`` compiles that into int-keyed dicts once, when the config
+changes. A member's role multiplier (the largest among their roles) is
+worked out the first time they earn XP and cached until their roles
+change, so scoring a message is a channel lookup, a member lookup and a
+comparison against the boost's end time. The cache keeps the
+``max_members`` most recently active members.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+
+MAX_MULTIPLIER = 10.0
+
+
+class XPMultipliers:
+    """One guild's multipliers, ready for the message hot path."""
+
+    def __init__(self, config: dict, max_members: int = 5000):
+        self.channels: Dict[int, float] = {int(k): float(v) for k, v in config.get('channels', {}).items()}
+        self.roles: Dict[int, float] = {int(k): float(v) for k, v in config.get('roles', {}).items()}
+        boost = config.get('boost') or {}
+        self.boost = float(boost.get('multiplier', 1.0))
+        self.boost_ends = float(boost.get('ends', 0.0))
+        self.max_members = max_members
+        self._members: 'OrderedDict[int, float]' = OrderedDict()  # member id -> role multiplier, least recent first
+
+    def boost_active(self, now: float) -> bool:
+        return now < self.boost_ends
+
+    def channel_multiplier(self, channel) -> float:
+        multiplier = self.channels.get(channel.id)
+        if multiplier is None:
+            # Threads follow their parent channel
+            multiplier = self.channels.get(getattr(channel, 'parent_id', None), 1.0)
+        return multiplier
+
+    def role_multiplier(self, member) -> float:
+        multiplier = self._members.get(member.id)
+        if multiplier is None:
+            held = [self.roles[role.id] for role in member.roles if role.id in self.roles]
+            multiplier = self._members[member.id] = max(held) if held else 1.0
+            if len(self._members) > self.max_members:
+                self._members.popitem(last=False)
+        else:
+            self._members.move_to_end(member.id)
+        return multiplier
+
+    def for_message(self, channel, member, now: float) -> float:
+        multiplier = self.channel_multiplier(channel)
+        if not multiplier:
+            return 0.0
+        if self.roles:
+            multiplier *= self.role_multiplier(member)
+        if self.boost_ends:
+            if now < self.boost_ends:
+                multiplier *= self.boost
+            else:
+                self.boost, self.boost_ends = 1.0, 0.0
+        return multiplier
+
+    def member_changed(self, member_id: int):
+        """Forget a member's cached role multiplier, e.g. after their roles changed."""
+        self._members.pop(member_id, None)
+
+    def clear_members(self):
+        """Forget every cached role multiplier, e.g. when the guild goes idle."""
+        self._members.clear()
+
+
+def parse_multiplier(text: Optional[str]) -> Optional[float]:
+    """A multiplier like ``2``, ``1.5`` or ``2x``, or None if it isn't one between 0 and ``MAX_MULTIPLIER``."""
+    try:
+        value = float((text or '').lower().rstrip('x×'))
+    except ValueError:
+        return None
+    return value if 0 <= value <= MAX_MULTIPLIER else None